@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Combines the SystemTestsReport.xml files written by runSystemTests.py --shard
+# on several machines into a single report
+VERSION = "1.0"
+
+info = []
+info.append("Merge the SystemTestsReport.xml files given as arguments into one report.")
+info.append("The counts of tests, failures and skipped tests are recomputed and the")
+info.append("total time is the sum of those of the reports. A test that appears in more")
+info.append("than one report is kept once, preferring a run over a skip.")
+
+import optparse
+parser = optparse.OptionParser("Usage: %prog [options] REPORT [REPORT ...]", None,
+                               optparse.Option, VERSION, 'error', ' '.join(info))
+parser.add_option("-o", "--output", dest="output",
+                  help="File to write the merged report to (default=%default)")
+parser.set_defaults(output="SystemTestsReport.xml")
+(options, args) = parser.parse_args()
+if len(args) == 0:
+  parser.error("No reports given")
+
+import sys
+from xml.dom.minidom import parse, getDOMImplementation
+
+def isSkipped(case):
+  return len(case.getElementsByTagName('skipped')) > 0
+
+def isFailure(case):
+  return len(case.getElementsByTagName('failure')) > 0
+
+merged = getDOMImplementation().createDocument(None, 'testsuite', None)
+cases = {} # (classname, name) -> testcase element
+order = []
+total_time = 0.0
+for filename in args:
+  report = parse(filename).documentElement
+  try:
+    total_time += float(report.getAttribute('time'))
+  except ValueError:
+    print "No total time in '%s'" % filename
+  for case in report.getElementsByTagName('testcase'):
+    key = (case.getAttribute('classname'), case.getAttribute('name'))
+    if key in cases:
+      print "%s.%s is in more than one report" % key
+      if not isSkipped(cases[key]) or isSkipped(case):
+        continue
+    else:
+      order.append(key)
+    cases[key] = merged.importNode(case, True)
+
+docEl = merged.documentElement
+for key in order:
+  docEl.appendChild(cases[key])
+failures = len([case for case in cases.values() if isFailure(case)])
+skipped = len([case for case in cases.values() if isSkipped(case)])
+docEl.setAttribute('name', 'SystemTests')
+docEl.setAttribute('tests', str(len(cases)))
+docEl.setAttribute('failures', str(failures))
+docEl.setAttribute('skipped', str(skipped))
+docEl.setAttribute('time', str(total_time))
+
+xml_report = open(options.output, 'w')
+xml_report.write(merged.toxml())
+xml_report.close()
+
+print "%d tests, %d failed, %d skipped in %d reports" % (len(cases), failures, skipped, len(args))
+if failures > 0:
+  sys.exit(1)
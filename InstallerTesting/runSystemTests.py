@@ -15,6 +15,7 @@ info.append("all of the tests that haven't been run will be marked as skipped in
 info.append("full logs.")
 
 import optparse
+import sys
 parser = optparse.OptionParser("Usage: %prog [options]", None,
                                optparse.Option, VERSION, 'error', ' '.join(info))
 parser.add_option("-m", "--mantidpath", dest="mantidpath",
@@ -37,12 +38,108 @@ parser.add_option("", "--showskipped", dest="showskipped", action="store_true",
                   help="List the skipped tests.")
 parser.add_option("", "--archivesearch", dest="archivesearch", action="store_true",
                   help="Turn on archive search for file finder.")
+parser.add_option("-j", "--jobs", dest="jobs", type="int",
+                  help="Number of tests to run at the same time (default=1).")
+parser.add_option("", "--memorylimit", dest="memorylimit", type="float",
+                  help="Memory, in MB, shared out between tests running at the same time. "
+                       "Defaults to the free memory when the run starts.")
+parser.add_option("", "--forkserver", dest="forkserver", action="store_true",
+                  help="Fork each test from a process that has already imported Mantid "
+                       "instead of starting a new interpreter. Not available on Windows. Threads "
+                       "started by Mantid are not copied into the tests, see forkserver.py.")
+parser.add_option("", "--importdiscovery", dest="staticdiscovery", action="store_false",
+                  help="Find the tests by importing the test modules rather than parsing them.")
+parser.add_option("", "--timeout", dest="timeout", type="float",
+                  help="Stop a test after this many seconds unless the test sets its own "
+                       "limit (default=%default). 0 turns off the limit.")
+parser.add_option("", "--history", dest="history",
+                  help="Performance database, see PerformanceMonitoring, holding the runtimes of "
+                       "previous runs. Used to start the longest tests first when running in parallel.")
+parser.add_option("", "--shard", dest="shard",
+                  help="Run only the share i/N of the tests, e.g. 2/4, for running on several "
+                       "machines. Shares are balanced using --history if given. Combine the "
+                       "reports with mergeSystemTestReports.py.")
+parser.add_option("", "--benchmark", dest="benchmark", type="float",
+                  help="Repeat each test until the 95%% confidence interval of its median time "
+                       "is narrower than this percentage, and report the median, MAD, min "
+                       "and 95th percentile.")
+parser.add_option("", "--benchmark-budget", dest="benchmarkbudget", type="float",
+                  help="Stop repeating a test in benchmark mode after this many seconds "
+                       "(default=300).")
+parser.add_option("", "--warmup", dest="warmup", type="int",
+                  help="Number of untimed runs of each test before the timed iterations.")
+parser.add_option("", "--algorithm-ledger", dest="algorithmledger", action="store_true",
+                  help="Record the time and memory taken by each algorithm a test runs and "
+                       "list the algorithms the tests spend the most time in.")
+parser.add_option("", "--profile", dest="profile", metavar="REGEX",
+                  help="Run the tests whose names match REGEX, given as --profile=REGEX, or all "
+                       "tests if it is left out, under cProfile and write a .pstats and a "
+                       "collapsed-stack file for a flame graph for each to logs/TestLogs.")
+parser.add_option("", "--sample", dest="samplinghz", type="float", metavar="HZ",
+                  help="Sample the Python stack of every test HZ times a second of wall time "
+                       "and write the counts as collapsed stacks to logs/TestLogs, also when "
+                       "a test is stopped by the timeout.")
+parser.add_option("", "--memory-interval", dest="memoryinterval", type="float", metavar="SECONDS",
+                  help="Sample the RSS and PSS of each test every SECONDS and report the peak, "
+                       "the time of the peak and the area under the curve.")
+parser.add_option("", "--workspace-inventory", dest="workspaceinventory", action="store_true",
+                  help="List the workspaces each test leaves after each iteration and how their "
+                       "memory changed from the previous iteration.")
+parser.add_option("", "--soak", dest="soak", type="int", metavar="N",
+                  help="Run each selected test N times in one process, clearing the workspaces "
+                       "between runs, and fail it if the time taken or the memory left after "
+                       "clearing grows with each run. The timeout is multiplied by N.")
+parser.add_option("", "--soak-time-slope", dest="soaktimeslope", type="float", metavar="PERCENT",
+                  help="The growth in the time taken per run, as a percentage of the median, "
+                       "above which a soaked test fails (default 1).")
+parser.add_option("", "--soak-memory-slope", dest="soakmemoryslope", type="float", metavar="MB",
+                  help="The growth in memory per run above which a soaked test fails (default 1).")
+parser.add_option("", "--startup-benchmark", dest="startupbenchmark", type="int", metavar="N",
+                  help="Instead of running the tests, start N test processes that only import "
+                       "Mantid and write the statistics of the time taken by each phase of "
+                       "starting up to StartupBenchmarkReport.xml.")
+parser.add_option("", "--trace", dest="trace", action="store_true",
+                  help="Write the timeline of the run, with the phases and timed regions of each "
+                       "test and the memory and CPU used, to SystemTestsTrace.json for "
+                       "chrome://tracing. Use with --memory-interval to show the memory.")
+parser.add_option("", "--incremental", dest="incremental", action="store_true",
+                  help="Do not run the tests that passed in an earlier incremental run when "
+                       "neither the Mantid revision, their source, the helper modules they "
+                       "import, their data and reference files nor the options have changed "
+                       "since. They are reported as cached passes.")
+parser.add_option("", "--cache-expiry", dest="cacheexpiry", type="float", metavar="HOURS",
+                  help="Run a test in incremental mode if its last pass is older than this "
+                       "(default=%default).")
+parser.add_option("", "--stage-dir", dest="stagedir", metavar="DIR",
+                  help="Copy the data and reference files the selected tests need to DIR, "
+                       "e.g. on a local SSD or tmpfs, and search it before the data "
+                       "directories. Copies are kept between runs while their sources are unchanged.")
+parser.add_option("", "--stage-limit", dest="stagelimit", type="float", metavar="MB",
+                  help="The most data to keep in the --stage-dir directory, removing the "
+                       "files least recently needed first (default=%default).")
+parser.add_option("", "--prefetch", dest="prefetch", type="float", metavar="MB",
+                  help="Read the data and reference files of the next tests into the page "
+                       "cache while the current tests run, up to MB at a time.")
+parser.add_option("", "--prefetch-tests", dest="prefetchtests", type="int", metavar="N",
+                  help="The number of tests ahead to read the files of with --prefetch "
+                       "(default=%default).")
 parser.set_defaults(frameworkLoc=DEFAULT_FRAMEWORK_LOC, mantidpath=None, makeprop=True,
-                    loglevel="information")
-(options, args) = parser.parse_args()
+                    loglevel="information", jobs=1, staticdiscovery=True, timeout=3600.,
+                    cacheexpiry=168., stagelimit=10240., prefetchtests=3)
+# --profile on its own profiles every test
+argv = [(arg == '--profile') and '--profile=.' or arg for arg in sys.argv[1:]]
+(options, args) = parser.parse_args(argv)
+
+shard = None
+if options.shard is not None:
+  try:
+    shard = tuple([int(value) for value in options.shard.split('/')])
+  except ValueError:
+    shard = ()
+  if len(shard) != 2 or shard[1] < 1 or not (1 <= shard[0] <= shard[1]):
+    parser.error("--shard must be i/N with 1 <= i <= N, not '%s'" % options.shard)
 
 # import the stress testing framework
-import sys
 import os
 sys.path.append(options.frameworkLoc)
 import stresstesting
@@ -63,14 +160,71 @@ else:
 sys.path.insert(0, mantid_module_path)
 
 mtdconf = stresstesting.MantidFrameworkConfig(mantid_module_path, loglevel=options.loglevel,
-                                              archivesearch=options.archivesearch)
+                                              archivesearch=options.archivesearch,
+                                              stagingDir=options.stagedir, stagingLimitMB=options.stagelimit)
 if options.makeprop:
   mtdconf.config()
 
 # run the tests
 reporter = stresstesting.XmlResultReporter(showSkipped=options.showskipped)
-mgr = stresstesting.TestManager(mtdconf.testDir, output = [reporter],
-                                testsInclude=options.testsInclude, testsExclude=options.testsExclude)
+if options.forkserver:
+  runner = stresstesting.PythonForkServerRunner()
+else:
+  runner = stresstesting.PythonConsoleRunner()
+testOptions = {}
+if options.benchmark is not None:
+  testOptions['benchmarkPrecision'] = options.benchmark
+if options.benchmarkbudget is not None:
+  testOptions['benchmarkTimeBudget'] = options.benchmarkbudget
+if options.warmup is not None:
+  testOptions['warmupIterations'] = options.warmup
+if options.workspaceinventory:
+  testOptions['workspaceInventory'] = True
+if options.soak is not None:
+  testOptions['soakIterations'] = options.soak
+if options.soaktimeslope is not None:
+  testOptions['soakTimeSlope'] = options.soaktimeslope
+if options.soakmemoryslope is not None:
+  testOptions['soakMemorySlope'] = options.soakmemoryslope
+reporters = [reporter]
+if options.algorithmledger:
+  testOptions['algorithmLedger'] = True
+  ledgerReporter = stresstesting.AlgorithmLedgerReporter()
+  reporters.append(ledgerReporter)
+if options.trace:
+  testOptions['traceRegions'] = True
+  traceReporter = stresstesting.TraceEventReporter()
+  reporters.append(traceReporter)
+if options.startupbenchmark:
+  # Only the runner is needed, not the tests, their history or the data files
+  runner.setMantidDir(mantid_module_path)
+  runner.createCodePrefix()
+  stresstesting.benchmarkStartup(runner, options.startupbenchmark, reporters, timeout=(options.timeout or None))
+  xml_report = open(os.path.join(mtdconf.saveDir, "StartupBenchmarkReport.xml"),'w')
+  xml_report.write(reporter.getResults())
+  xml_report.close()
+  if options.makeprop:
+    mtdconf.restoreconfig()
+  sys.exit(0)
+
+mgr = stresstesting.TestManager(mtdconf.testDir, runner = runner, output = reporters,
+                                testsInclude=options.testsInclude, testsExclude=options.testsExclude,
+                                jobs=options.jobs, memoryLimitMB=options.memorylimit,
+                                staticDiscovery=options.staticdiscovery,
+                                discoveryIndex=os.path.join(mtdconf.saveDir, "TestDiscoveryIndex.json"),
+                                timeout=(options.timeout or None), historyDB=options.history,
+                                shard=shard, logDir=os.path.join(mtdconf.saveDir, "TestLogs"),
+                                testOptions=testOptions, profileRegex=options.profile,
+                                samplingHz=options.samplinghz, memoryInterval=options.memoryinterval,
+                                dataDirs=(not options.archivesearch and mtdconf.dataDirs or None),
+                                dataIndexFile=os.path.join(mtdconf.saveDir, "DataFileIndex.json"),
+                                resultCache=(options.incremental and os.path.join(mtdconf.saveDir, "TestResultCache.json") or None),
+                                resultCacheExpiry=(options.cacheexpiry and options.cacheexpiry * 3600. or None),
+                                prefetchMB=options.prefetch, prefetchTests=options.prefetchtests)
+if options.makeprop:
+  # The staging directory is only searched with the properties written by config()
+  mtdconf.stageDataFiles(mgr.scheduledDataFiles())
+
 try:
   mgr.executeTests()
 except KeyboardInterrupt:
@@ -82,6 +236,19 @@ xml_report = open(os.path.join(mtdconf.saveDir, "SystemTestsReport.xml"),'w')
 xml_report.write(reporter.getResults())
 xml_report.close()
 
+if options.trace:
+  trace_report = open(os.path.join(mtdconf.saveDir, "SystemTestsTrace.json"), 'w')
+  trace_report.write(traceReporter.getResults())
+  trace_report.close()
+
+if options.algorithmledger:
+  ledger = ledgerReporter.getResults()
+  print
+  print ledger
+  ledger_report = open(os.path.join(mtdconf.saveDir, "AlgorithmLedger.txt"), 'w')
+  ledger_report.write(ledger)
+  ledger_report.close()
+
 # put the configuratoin back to its original state
 if options.makeprop:
   mtdconf.restoreconfig()
@@ -95,6 +262,8 @@ else:
   percent = int(100. * percent)
   print "%d%s tests passed, %d tests failed out of %d (%d skipped)" % \
       (percent, '%', mgr.failedTests, (mgr.totalTests-mgr.skippedTests), mgr.skippedTests)
+  if options.incremental:
+    print "%d of the passes were cached from earlier runs" % mgr.cachedTests
 print 'All tests passed? ' + str(success)
 if not success:
   sys.exit(1)
@@ -29,7 +29,15 @@ def getSourceDir():
 TABLE_FIELDS = ['date', 'name', 'type', 'host', 'environment', 'runner',
                  'revision', 'commitid', 'runtime', 'cpu_fraction', 
                  'memory_change', 'success',
-                 'status', 'logarchive', 'variables']
+                 'status', 'logarchive', 'variables',
+                 'peak_memory', 'cpu_user', 'cpu_system', 'read_bytes',
+                 'write_bytes', 'major_faults', 'context_switches']
+
+# Columns added after the table was first defined, with their SQL types.
+# upgrade_database() adds them to an existing database.
+ADDED_FIELDS = [('peak_memory', 'DOUBLE'), ('cpu_user', 'DOUBLE'), ('cpu_system', 'DOUBLE'),
+                ('read_bytes', 'INT'), ('write_bytes', 'INT'), ('major_faults', 'INT'),
+                ('context_switches', 'INT')]
 
 #=====================================================================
 # The default path to the database file
@@ -65,22 +73,32 @@ def get_TestResult_from_row(row):
     res = testresult.TestResult()
     res.testID = row[0]
     # ------ Get each entry in the table ---------
-    for i in xrange(len(TABLE_FIELDS)):
+    # Rows from a database that has not been upgraded lack the newer fields
+    for i in xrange(min(len(TABLE_FIELDS), len(row) - 1)):
         res[TABLE_FIELDS[i]] = row[i+1]
         
     return (res)
 
     
+#=====================================================================
+# The types of the rows that time a part of a test rather than a test, stored
+# by xunit_to_sql.py as <test name>.<part>
+PART_TYPES = ['phase', 'region']
+
+# A "where" clause leaving out the rows of PART_TYPES
+TESTS_ONLY = "type NOT IN (%s)" % ", ".join(["'%s'" % part for part in PART_TYPES])
+
 #=====================================================================
 def get_latest_result(name=''):
     """Returns a TestResult object corresponding to the 
     last result in the table
     Parameters
     ----------
-        name :: optional, test name to filter by"""
+        name :: optional, test name to filter by. Without it the parts of
+                tests, see PART_TYPES, are left out."""
     db = SQLgetConnection()
     c = db.cursor()
-    where = ""
+    where = " WHERE " + TESTS_ONLY
     if name != "": where = " WHERE name='%s'" % name
     query = """SELECT * FROM TestRuns %s ORDER BY testID DESC LIMIT 1;""" % where
     c.execute(query)
@@ -170,6 +188,32 @@ def get_all_field_values(field_name, where_clause=""):
         
     return out
       
+#=====================================================================
+def get_runtime_history(where_clause="", limit=5):
+    """Returns a dictionary of test name -> list of the runtimes of its
+    latest successful runs, newest first. Skipped tests are not counted as
+    successful.
+    Parameters:
+        where_clause : an additional SQL "where" clause to further limit the search.
+            Do not include the WHERE keyword!
+        limit : the number of runs to return for each test
+        """
+    db = SQLgetConnection()
+    c = db.cursor()
+    query = "SELECT name, runtime FROM TestRuns WHERE success = 1 AND (status IS NULL OR status != 'skipped')"
+    if (where_clause != ""):
+        query += " AND (" + where_clause + ")"
+    query += " ORDER BY testID DESC"
+    c.execute(query)
+
+    out = {}
+    for (name, runtime) in c.fetchall():
+        runtimes = out.setdefault(name, [])
+        if len(runtimes) < limit and runtime is not None:
+            runtimes.append(float(runtime))
+    c.close()
+    return out
+
 #=====================================================================
 def get_latest_revison():
     """ Return the latest revision number """
@@ -199,9 +243,14 @@ def add_revision():
             
 #=====================================================================
 def get_all_test_names(where_clause=""):
-    """Returns a set containing all the UNIQUE test names in the database.
+    """Returns a set containing all the UNIQUE test names in the database,
+    leaving out the parts of tests, see PART_TYPES.
     ----
     where_clause: Do not include the WHERE keyword! """
+    if where_clause != "":
+        where_clause = "(%s) AND %s" % (where_clause, TESTS_ONLY)
+    else:
+        where_clause = TESTS_ONLY
     return set(get_all_field_values('name', where_clause))
 
 
@@ -232,7 +281,10 @@ def setup_database():
     runtime DOUBLE, cpu_fraction DOUBLE, memory_change INT,
     success BOOL,
     status VARCHAR(50), logarchive VARCHAR(80),
-    variables VARCHAR(200)
+    variables VARCHAR(200),
+    peak_memory DOUBLE, cpu_user DOUBLE, cpu_system DOUBLE,
+    read_bytes INT, write_bytes INT, major_faults INT,
+    context_switches INT
     ); """)
     
     # Now a table that is just one entry per run (a fake "revision")
@@ -242,6 +294,22 @@ def setup_database():
     date DATETIME
     ); """)
 
+
+#=====================================================================
+def upgrade_database():
+    """ Add any columns missing from a database made by an older version
+    of this module. The existing rows get NULL in the new columns.
+    """
+    db = SQLgetConnection()
+    c = db.cursor()
+    c.execute("PRAGMA table_info(TestRuns);")
+    existing = set([row[1] for row in c.fetchall()])
+    for (field, sqltype) in ADDED_FIELDS:
+        if field not in existing:
+            print "Adding column", field, "to", get_database_filename()
+            c.execute("ALTER TABLE TestRuns ADD COLUMN %s %s;" % (field, sqltype))
+    db.commit()
+    c.close()
         
 ###########################################################################
 # A class to report the results of stress tests to the Mantid Test database
@@ -267,7 +335,7 @@ class SQLResultReporter(reporters.ResultReporter):
         # Create the field for the log archive name
         result["logarchive"] = result.get_logarchive_filename()
                
-        valuessql = "INSERT INTO TestRuns VALUES(NULL, "
+        valuessql = "INSERT INTO TestRuns (" + ", ".join(TABLE_FIELDS) + ") VALUES("
 
         # Insert the test results in the order of the table
         for field in TABLE_FIELDS:
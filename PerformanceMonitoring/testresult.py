@@ -76,7 +76,14 @@ class TestResult(object):
                  success=False,
                  status="",
                  log_contents="",
-                 variables=""):
+                 variables="",
+                 peak_memory=0.0,
+                 cpu_user=0.0,
+                 cpu_system=0.0,
+                 read_bytes=0,
+                 write_bytes=0,
+                 major_faults=0,
+                 context_switches=0):
         """ Fill the TestResult object with the contents """
         self.data = {}
         self.data["date"] = date
@@ -94,6 +101,13 @@ class TestResult(object):
         self.data["status"] = status
         self.data["log_contents"] = log_contents
         self.data["variables"] = variables
+        self.data["peak_memory"] = peak_memory
+        self.data["cpu_user"] = cpu_user
+        self.data["cpu_system"] = cpu_system
+        self.data["read_bytes"] = read_bytes
+        self.data["write_bytes"] = write_bytes
+        self.data["major_faults"] = major_faults
+        self.data["context_switches"] = context_switches
         
     
     def get_logarchive_filename(self):
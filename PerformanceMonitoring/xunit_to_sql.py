@@ -29,6 +29,9 @@ def handle_testcase(case, suite_name):
     """ Handle one test case and save it to DB"""
     # Build the full name (Project.Suite.Case)
     name = case.getAttribute("classname") + "." + case.getAttribute("name")
+    if case.getAttribute("cached") == "true":
+        # Passed without being run, see testcache, so there is nothing to store
+        return
     try:
         time = float(case.getAttribute("time"))
     except:
@@ -45,6 +48,25 @@ def handle_testcase(case, suite_name):
         memory_change = int(case.getElementsByTagName("memory").item(0).firstChild.nodeValue)
     except:
         memory_change = 0
+    # The outcome, from the child element the XmlResultReporter writes for a
+    # test that did not pass
+    if case.getElementsByTagName("failure").length > 0:
+        success, status = False, "failed"
+    elif case.getElementsByTagName("skipped").length > 0:
+        # Not a failure, but its time is not that of running it either, see
+        # sqlresults.get_runtime_history()
+        success, status = True, "skipped"
+    else:
+        success, status = True, "success"
+    # The resources used by the test process, written by the XmlResultReporter
+    usage = {}
+    usage_elems = case.getElementsByTagName("usage")
+    if usage_elems.length > 0:
+        for (key, value) in usage_elems.item(0).attributes.items():
+            try:
+                usage[key] = float(value)
+            except ValueError:
+                pass
         
     
     tr = TestResult(date = datetime.datetime.now(),
@@ -58,14 +80,63 @@ def handle_testcase(case, suite_name):
                  runtime=time,
                  cpu_fraction=cpu_fraction,
                  memory_change=memory_change,
-                 success=True,
-                 status="",
+                 success=success,
+                 status=status,
                  log_contents="",
-                 variables=variables) 
+                 variables=variables,
+                 peak_memory=usage.get("max_rss_mb", 0.0),
+                 cpu_user=usage.get("cpu_user", 0.0),
+                 cpu_system=usage.get("cpu_system", 0.0),
+                 read_bytes=int(usage.get("read_bytes", 0)),
+                 write_bytes=int(usage.get("write_bytes", 0)),
+                 major_faults=int(usage.get("major_faults", 0)),
+                 context_switches=int(usage.get("voluntary_switches", 0) + usage.get("involuntary_switches", 0))) 
     #print tr.data
     # Now report it to SQL
     sql_reporter.dispatchResults(tr)
 
+    # The time taken by each phase of the test is stored as a separate test
+    # named <test name>.<phase> with the type "phase"
+    phases = case.getElementsByTagName("phases")
+    if phases.length > 0:
+        for (phase, value) in phases.item(0).attributes.items():
+            try:
+                phase_time = float(value)
+            except ValueError:
+                continue
+            tr = TestResult(date = datetime.datetime.now(),
+                         name=name + "." + phase,
+                         type="phase",
+                         host=platform.uname()[1],
+                         environment=envAsString(),
+                         runner="runSystemTests.py",
+                         revision=revision,
+                         commitid=commitid,
+                         runtime=phase_time,
+                         success=success,
+                         variables=variables)
+            sql_reporter.dispatchResults(tr)
+
+    # The median time of each region timed by the test is stored the same way,
+    # with the type "region"
+    for region in case.getElementsByTagName("region"):
+        try:
+            region_time = float(region.getAttribute("time"))
+        except ValueError:
+            continue
+        tr = TestResult(date = datetime.datetime.now(),
+                     name=name + "." + region.getAttribute("name"),
+                     type="region",
+                     host=platform.uname()[1],
+                     environment=envAsString(),
+                     runner="runSystemTests.py",
+                     revision=revision,
+                     commitid=commitid,
+                     runtime=region_time,
+                     success=success,
+                     variables=variables)
+        sql_reporter.dispatchResults(tr)
+
 def handle_suite(suite):
     """ Handle all the test cases in a suite """
     suite_name = suite.getAttribute("name")
@@ -111,6 +182,8 @@ if __name__ == "__main__":
     sqlresults.set_database_filename(args.db)
     if not os.path.exists(args.db):
         sqlresults.setup_database()
+    else:
+        sqlresults.upgrade_database()
     # Set up the reporter    
     sql_reporter = sqlresults.SQLResultReporter()
     
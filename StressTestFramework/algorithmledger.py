@@ -0,0 +1,140 @@
+'''
+An opt-in record of the Mantid algorithms run by a test. In the test process an
+AlgorithmObserver is told of every algorithm that starts and notes its name, the
+time it took and the resident memory of the process before and after. Each run
+is sent through the metrics channel, see stresstesting.MetricsChannel, and ends
+up in TestResult.algorithms. Child algorithms are only seen if Mantid notifies
+observers of them, which it does not for algorithms created as children of
+another algorithm, so their time counts towards their parent.
+
+AlgorithmLedgerReporter adds up the ledgers of all of the tests to show which
+algorithms the suite spends its time in.
+'''
+import os
+import time
+import stresstesting
+
+# The name of the records sent through the metrics channel
+RECORD_NAME = 'algorithm'
+
+def residentMB():
+    '''The resident memory of this process in MB, None if it is not known'''
+    try:
+        pages = int(open('/proc/self/statm', 'r').read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024. * 1024.)
+
+def install(send):
+    '''
+    Start recording the algorithms run in this process, calling send(entry) as
+    each one finishes. The entry is a dictionary of the name and version of the
+    algorithm, the time it started, its duration and self time, i.e. less the
+    algorithms it ran itself, its depth of nesting and the memory before and after.
+    Returns the observer, which must be kept alive.
+    '''
+    from mantid.api import AlgorithmObserver
+
+    # The entries of the algorithms that are running, innermost last
+    running = []
+
+    class FinishObserver(AlgorithmObserver):
+        '''Waits for one algorithm to finish'''
+        def __init__(self, alg):
+            AlgorithmObserver.__init__(self)
+            self.entry = {'name': alg.name(), 'version': alg.version(), 'depth': len(running),
+                          'memory_before': residentMB(), 'children_time': 0.}
+            running.append(self)
+            self.observeFinish(alg)
+            self.observeError(alg)
+            self.entry['start'] = time.time()
+
+        def finishHandle(self):
+            self.__finished(True)
+
+        def errorHandle(self, message):
+            self.__finished(False)
+
+        def __finished(self, success):
+            entry = self.entry
+            entry['duration'] = time.time() - entry['start']
+            entry['memory_after'] = residentMB()
+            entry['success'] = success
+            entry['self_time'] = entry['duration'] - entry.pop('children_time')
+            if self in running:
+                running.remove(self)
+            if len(running) > 0:
+                running[-1].entry['children_time'] += entry['duration']
+            send(entry)
+
+    class StartObserver(AlgorithmObserver):
+        '''Is told of every algorithm that starts'''
+        def startingHandle(self, alg):
+            try:
+                FinishObserver(alg)
+            except Exception:
+                # Never let the ledger break the test
+                pass
+
+    observer = StartObserver()
+    observer.observeStarting()
+    return observer
+
+def summarize(entries):
+    '''
+    Returns a dictionary of algorithm name -> dictionary of the number of runs,
+    the total and self time and the total increase in memory of the entries
+    '''
+    summary = {}
+    for entry in entries:
+        totals = summary.setdefault(entry['name'], {'count': 0, 'time': 0., 'self_time': 0.,
+                                                    'memory_increase': 0.})
+        totals['count'] += 1
+        totals['time'] += entry['duration']
+        totals['self_time'] += entry['self_time']
+        if entry.get('memory_before') is not None and entry.get('memory_after') is not None:
+            totals['memory_increase'] += entry['memory_after'] - entry['memory_before']
+    return summary
+
+#########################################################################
+# A class to report the algorithms that take the most time over a suite
+#########################################################################
+class AlgorithmLedgerReporter(stresstesting.ResultReporter):
+    '''
+    Adds up the algorithm ledgers of the tests and reports the algorithms with
+    the most self time, and the tests that spent the most time in each
+    '''
+
+    def __init__(self, top=20):
+        self._top = top
+        self._summary = {}
+        # Algorithm name -> {test name: self time}
+        self._tests = {}
+
+    def dispatchResults(self, result):
+        for name, totals in summarize(result.algorithms).iteritems():
+            suite = self._summary.setdefault(name, {'count': 0, 'time': 0., 'self_time': 0.,
+                                                    'memory_increase': 0.})
+            for key in suite:
+                suite[key] += totals[key]
+            self._tests.setdefault(name, {})[result.name] = totals['self_time']
+
+    def getResults(self):
+        '''A table of the algorithms with the most self time'''
+        if len(self._summary) == 0:
+            return "No algorithms recorded\n"
+        hottest = sorted(self._summary.iteritems(), key=lambda item: -item[1]['self_time'])
+        total = sum([totals['self_time'] for totals in self._summary.itervalues()])
+        lines = ["%-40s %8s %12s %12s %7s %12s  %s" % ('Algorithm', 'Runs', 'Self time/s', 'Time/s',
+                                                       'Share', 'Memory/MB', 'Slowest test')]
+        for name, totals in hottest[:self._top]:
+            tests = self._tests[name]
+            slowest = max(tests.keys(), key=lambda test: tests[test])
+            if total > 0:
+                share = 100. * totals['self_time'] / total
+            else:
+                share = 0.
+            lines.append("%-40s %8d %12.2f %12.2f %6.1f%% %12.1f  %s"
+                         % (name, totals['count'], totals['self_time'], totals['time'], share,
+                            totals['memory_increase'], slowest))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,111 @@
+'''
+An index of the files in the data search directories, so that the files a test
+requires can be looked up without asking Mantid's FileFinder, which searches
+every directory for every file. Names are matched without regard to case, as
+the system tests configure FileFinder to do, see MantidFrameworkConfig.
+
+The index can be kept in a file between runs. A directory is only listed again
+when its modification time has changed, which it does when a file is added to,
+removed from or renamed in it, so an unchanged data tree on a network share
+costs one stat() per directory.
+'''
+import os
+import json
+import time
+
+# Bump when the content of the index file changes so that old ones are ignored
+INDEX_VERSION = 1
+
+# A directory modified this recently, in seconds, is listed again next time, as
+# a file may be added within the resolution of its modification time
+RACY_SECONDS = 2.
+
+class DataFileIndex(object):
+    '''
+    The files in the given directories, not including subdirectories. Where a
+    name is in more than one directory the first directory wins, as for
+    datasearch.directories. If filename is given the listings are read from it
+    and save() writes them back.
+    '''
+
+    def __init__(self, directories, filename=None):
+        self._directories = [os.path.abspath(directory) for directory in directories]
+        self._filename = filename
+        self._changed = False
+        # Directory -> {'mtime': modification time, 'files': {lower case name: name}}
+        self._listings = {}
+        if filename is not None and os.path.exists(filename):
+            try:
+                stored = json.load(open(filename, 'r'))
+                if stored.get('version') == INDEX_VERSION:
+                    self._listings = stored['directories']
+            except (IOError, ValueError, KeyError):
+                # A corrupt index is simply rebuilt
+                self._listings = {}
+        self.refresh()
+
+    directories = property(lambda self: self._directories)
+
+    def refresh(self):
+        '''List again the directories that have changed, e.g. by staging files in one'''
+        self._files = {}
+        for directory in reversed(self._directories):
+            for lower, name in self.__listing(directory).iteritems():
+                self._files[lower] = os.path.join(directory, name)
+
+    def __listing(self, directory):
+        '''The listing of the directory, from the index if it has not changed'''
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return {}
+        listing = self._listings.get(directory)
+        if listing is not None and listing['mtime'] == mtime:
+            return listing['files']
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return {}
+        if time.time() - mtime < RACY_SECONDS:
+            mtime = None
+        listing = {'mtime': mtime, 'files': dict([(name.lower(), name) for name in names])}
+        self._listings[directory] = listing
+        self._changed = True
+        return listing['files']
+
+    def save(self):
+        '''Write the index if anything has changed'''
+        if self._filename is None or not self._changed:
+            return
+        try:
+            handle = open(self._filename, 'w')
+            try:
+                json.dump({'version': INDEX_VERSION, 'directories': self._listings}, handle)
+            finally:
+                handle.close()
+            self._changed = False
+        except IOError, exc:
+            print "Failed to save the data file index '%s': %s" % (self._filename, str(exc))
+
+    def find(self, name):
+        '''The full path of the named file, or None if it is not in the directories'''
+        if os.path.isabs(name):
+            if os.path.exists(name):
+                return name
+            return None
+        if os.path.dirname(name) != '':
+            # A path relative to one of the directories
+            for directory in self._directories:
+                if os.path.exists(os.path.join(directory, name)):
+                    return os.path.join(directory, name)
+            return None
+        return self._files.get(name.lower())
+
+    def missing(self, names):
+        '''
+        Returns those of the names that are certainly not available. Names without
+        an extension, which Mantid may match to a run in several forms, are never
+        counted as missing.
+        '''
+        return [name for name in names
+                if os.path.splitext(name)[1] != '' and self.find(name) is None]
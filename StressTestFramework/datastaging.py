@@ -0,0 +1,201 @@
+'''
+Copies the data files the tests need from where they are kept, typically a slow
+network share, to a local directory, e.g. on an SSD or a tmpfs, that is put
+first in the data search path, see MantidFrameworkConfig. A file read by
+several tests is then fetched across the network once rather than by each of
+them, and only when it has changed.
+
+The directory holds at most a given size of files. When a file has to be made
+room for, the files least recently needed by a run are removed first. A manifest
+in the directory records the source of each copy, its size, the modification
+time of the source and the SHA-1 of its content. A copy is only used again if
+the source has not changed and the copy still has the right size and content.
+'''
+import os
+import json
+import time
+import hashlib
+
+# The record of the copies, kept in the staging directory
+MANIFEST = 'staging.json'
+
+# Bump when the content of the manifest changes so that old ones are ignored
+MANIFEST_VERSION = 1
+
+# Files are copied and hashed this many bytes at a time
+CHUNK_SIZE = 1 << 20
+
+_MB = 1024. * 1024.
+
+def _hashFile(filename):
+    '''The SHA-1 of the content of the file'''
+    sha1 = hashlib.sha1()
+    handle = open(filename, 'rb')
+    try:
+        while True:
+            chunk = handle.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sha1.update(chunk)
+    finally:
+        handle.close()
+    return sha1.hexdigest()
+
+def _copyFile(source, destination):
+    '''Copy source to destination, keeping its times. Returns the SHA-1 of the content.'''
+    sha1 = hashlib.sha1()
+    inHandle = open(source, 'rb')
+    try:
+        outHandle = open(destination, 'wb')
+        try:
+            while True:
+                chunk = inHandle.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha1.update(chunk)
+                outHandle.write(chunk)
+        finally:
+            outHandle.close()
+    finally:
+        inHandle.close()
+    stat = os.stat(source)
+    os.utime(destination, (stat.st_atime, stat.st_mtime))
+    return sha1.hexdigest()
+
+class StagingCache(object):
+    '''
+    The local copies in directory, holding at most limitMB of files. The
+    directory is created if it does not exist.
+    '''
+
+    def __init__(self, directory, limitMB):
+        self._directory = directory
+        self._limit = limitMB * _MB
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # File name -> {'source', 'size', 'mtime' of the source, 'sha1', 'used'}
+        self._entries = {}
+        manifest = os.path.join(directory, MANIFEST)
+        if os.path.exists(manifest):
+            try:
+                stored = json.load(open(manifest, 'r'))
+                if stored.get('version') == MANIFEST_VERSION:
+                    self._entries = stored['files']
+            except (IOError, ValueError, KeyError):
+                # Everything not in the manifest is removed below
+                self._entries = {}
+        self.__removeStale()
+
+    directory = property(lambda self: self._directory)
+
+    def __remove(self, name):
+        self._entries.pop(name, None)
+        try:
+            os.remove(os.path.join(self._directory, name))
+        except OSError:
+            pass
+
+    def __sourceChanged(self, entry):
+        try:
+            stat = os.stat(entry['source'])
+        except OSError:
+            return True
+        return stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']
+
+    def __removeStale(self):
+        '''
+        Remove the files not in the manifest, e.g. left by an interrupted copy,
+        and the copies of sources that have changed, which would otherwise be
+        found before the sources
+        '''
+        for name in os.listdir(self._directory):
+            if name != MANIFEST and name not in self._entries:
+                self.__remove(name)
+        for name, entry in self._entries.items():
+            if not os.path.exists(os.path.join(self._directory, name)) or self.__sourceChanged(entry):
+                self.__remove(name)
+
+    def __isIntact(self, name, entry):
+        '''True if the copy has the size and content it had when it was made'''
+        filename = os.path.join(self._directory, name)
+        try:
+            if os.path.getsize(filename) != entry['size']:
+                return False
+            return _hashFile(filename) == entry['sha1']
+        except (IOError, OSError):
+            return False
+
+    def __makeRoom(self, size, keep):
+        '''
+        Remove the least recently used copies, other than those named in keep,
+        until size bytes fit under the limit. Returns False if they cannot.
+        '''
+        total = sum([entry['size'] for entry in self._entries.itervalues()])
+        candidates = sorted([(entry['used'], name) for name, entry in self._entries.iteritems()
+                             if name not in keep])
+        while total + size > self._limit:
+            if len(candidates) == 0:
+                return False
+            name = candidates.pop(0)[1]
+            total -= self._entries[name]['size']
+            self.__remove(name)
+        return True
+
+    def stage(self, sources):
+        '''
+        Make sure there is an up to date copy of each of the source files, in
+        the order given, as far as they fit. Returns the number of files and MB
+        copied and the number of files and MB that were already there.
+        '''
+        copied = [0, 0.]
+        reused = [0, 0.]
+        keep = set()
+        now = time.time()
+        for source in sources:
+            source = os.path.abspath(source)
+            name = os.path.basename(source)
+            if name in keep:
+                # Only the first file of a name is found in the search path
+                continue
+            entry = self._entries.get(name)
+            if entry is not None and entry['source'] == source and self.__isIntact(name, entry):
+                entry['used'] = now
+                keep.add(name)
+                reused[0] += 1
+                reused[1] += entry['size'] / _MB
+                continue
+            if entry is not None:
+                self.__remove(name)
+            try:
+                stat = os.stat(source)
+            except OSError:
+                continue
+            if not self.__makeRoom(stat.st_size, keep):
+                continue
+            partial = os.path.join(self._directory, name + '.part')
+            try:
+                sha1 = _copyFile(source, partial)
+                os.rename(partial, os.path.join(self._directory, name))
+            except (IOError, OSError), exc:
+                print "Failed to stage '%s': %s" % (source, str(exc))
+                if os.path.exists(partial):
+                    os.remove(partial)
+                continue
+            self._entries[name] = {'source': source, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                                   'sha1': sha1, 'used': now}
+            keep.add(name)
+            copied[0] += 1
+            copied[1] += stat.st_size / _MB
+        self.save()
+        return tuple(copied), tuple(reused)
+
+    def save(self):
+        '''Write the manifest'''
+        try:
+            handle = open(os.path.join(self._directory, MANIFEST), 'w')
+            try:
+                json.dump({'version': MANIFEST_VERSION, 'files': self._entries}, handle)
+            finally:
+                handle.close()
+        except IOError, exc:
+            print "Failed to save the staging manifest in '%s': %s" % (self._directory, str(exc))
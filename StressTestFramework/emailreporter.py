@@ -12,7 +12,7 @@ class EmailResultReporter(stresstesting.ResultReporter):
         self._resultString += 'Test ' + t[1] + ' outcome: '
       elif t[0] == 'status':
         self._resultString += t[1] + '\n'
-        if t[1] != 'success':
+        if t[1] not in ('success', 'cached-pass'):
           self._overallPass = False
 
   def reportStatus(self):
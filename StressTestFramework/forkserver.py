@@ -0,0 +1,158 @@
+'''
+A server that imports Mantid once and then forks a fresh process for every test
+it is sent, so that the tests do not each pay the cost of starting Python and
+loading Mantid. It is started and used by stresstesting.PythonForkServerRunner.
+
+Protocol: a client connects to the UNIX socket, sends the python code to run and
+shuts down its side of the connection. The server forks a supervisor process for
+each connection straight away, so that a slow client does not hold up the others.
+The supervisor reads the code, leads a new process group and sends HEADER
+followed by the process group id. It forks the test process, whose stdout and
+stderr are the connection, and sends EXIT_MARKER followed by the exit code and,
+as JSON, the resources used by the test process (see processusage) once it has
+finished. Exit codes follow the convention of the shell: a test killed by signal
+N gives 128+N.
+
+Only the thread that calls fork() exists in the child. Importing mantid.simpleapi
+starts the FrameworkManager, which may start threads of its own, e.g. a thread
+pool or OpenMP workers. In the test process those threads are gone and any lock
+one of them held at the fork stays locked, so a test can hang. serve() warns
+when the server has more than one thread once the modules are imported; preload
+fewer modules, or run the tests in fresh interpreters, if tests hang.
+'''
+import os
+import sys
+import socket
+import select
+import signal
+import errno
+import json
+import traceback
+import processusage
+
+READY = 'FORKSERVER-READY'
+HEADER = '\0forkserver-pgid:'
+EXIT_MARKER = '\0forkserver-exit:'
+
+def serve(address, preload):
+    '''
+    Import the modules in preload, listen on the UNIX socket address and fork a
+    process for each connection. Returns when stdin is closed by the client.
+    '''
+    for name in preload:
+        __import__(name)
+    threads = _threadCount()
+    if threads > 1:
+        # Passed on by the client, see stresstesting.PythonForkServerRunner.startServer()
+        print "Warning: the fork server has %d threads after importing %s. Only the forking thread " \
+              "is copied into the tests, which may hang on a lock held by another." % (threads, ', '.join(preload))
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(address)
+    listener.listen(64)
+    print READY
+    sys.stdout.flush()
+    # Nothing else should go to the client's pipe. The tests get their own output.
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    try:
+        while True:
+            try:
+                readable = select.select([listener, sys.stdin], [], [], 1.)[0]
+            except select.error, exc:
+                if exc[0] == errno.EINTR:
+                    continue
+                raise
+            if sys.stdin in readable and os.read(sys.stdin.fileno(), 1024) == '':
+                # The client has gone away
+                break
+            if listener in readable:
+                conn = listener.accept()[0]
+                _fork(conn, listener, devnull)
+            _reap()
+    finally:
+        listener.close()
+        if os.path.exists(address):
+            os.remove(address)
+
+def _threadCount():
+    '''The number of threads in this process, including those not started by Python, or 1 if unknown'''
+    try:
+        return len(os.listdir('/proc/self/task'))
+    except OSError:
+        return 1
+
+def _reap():
+    '''Collect the supervisors that have finished'''
+    while True:
+        try:
+            pid = os.waitpid(-1, os.WNOHANG)[0]
+        except OSError:
+            return
+        if pid == 0:
+            return
+
+def _recvall(conn):
+    chunks = []
+    while True:
+        data = conn.recv(65536)
+        if not data:
+            break
+        chunks.append(data)
+    return ''.join(chunks)
+
+def _fork(conn, listener, devnull):
+    if os.fork() != 0:
+        conn.close()
+        return
+    # In the supervisor. The code is read here so that the accept loop never waits on a client.
+    try:
+        listener.close()
+        code = _recvall(conn)
+        os.setsid()
+        # Only the test should be stopped by a watchdog's SIGTERM
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        conn.sendall(HEADER + str(os.getpid()) + '\n')
+        pid = os.fork()
+        if pid == 0:
+            _runTest(conn, code, devnull)
+        retcode, usage = processusage.waitForProcess(pid)
+        if retcode < 0:
+            retcode = 128 - retcode
+        conn.sendall(EXIT_MARKER + str(retcode) + ' ' + json.dumps(usage) + '\n')
+        conn.close()
+    finally:
+        os._exit(0)
+
+def _runTest(conn, code, devnull):
+    '''Run the code as python -c would, with the connection as stdout/stderr'''
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.dup2(devnull, 0)
+    os.dup2(conn.fileno(), 1)
+    os.dup2(conn.fileno(), 2)
+    conn.close()
+    retcode = 0
+    try:
+        try:
+            exec compile(code, '<string>', 'exec') in {'__name__': '__main__', '__builtins__': __builtins__}
+        except SystemExit, exc:
+            if exc.code is None:
+                retcode = 0
+            elif isinstance(exc.code, int):
+                retcode = exc.code
+            else:
+                print >> sys.stderr, exc.code
+                retcode = 1
+        except:
+            traceback.print_exc()
+            retcode = 1
+        import atexit
+        atexit._run_exitfuncs()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(retcode)
@@ -0,0 +1,145 @@
+'''
+Reads the data files of the next tests into the operating system's page cache
+while the current tests run, so that loading them does not wait on the disk or
+the network. The TestManager says which files the upcoming tests need, in the
+order they will be needed, and a background thread asks for them to be read
+ahead, as far as a memory budget allows.
+
+Where the C library has posix_fadvise() the kernel is told the files will be
+needed, POSIX_FADV_WILLNEED, and reads them itself. Elsewhere the thread reads
+them, which costs a copy of the data but warms the cache just the same.
+'''
+import os
+import sys
+import threading
+
+# From <fcntl.h>, the same on all the platforms that have posix_fadvise
+POSIX_FADV_WILLNEED = 3
+
+# Files are read this many bytes at a time when posix_fadvise is not available
+CHUNK_SIZE = 1 << 20
+
+_MB = 1024. * 1024.
+
+def _loadFadvise():
+    '''posix_fadvise(fd, offset, length, advice) from the C library, or None'''
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # The 64 bit offset version, whatever the size of off_t
+        fadvise = libc.posix_fadvise64
+    except (ImportError, OSError, AttributeError):
+        return None
+    fadvise.argtypes = [ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong, ctypes.c_int]
+    fadvise.restype = ctypes.c_int
+    return fadvise
+
+class Prefetcher(threading.Thread):
+    '''
+    A daemon thread reading ahead the files given to want(), at most budgetMB of
+    them at a time
+    '''
+
+    def __init__(self, budgetMB):
+        threading.Thread.__init__(self, name='prefetch')
+        self.daemon = True
+        self._budget = budgetMB * _MB
+        self._fadvise = _loadFadvise()
+        self._condition = threading.Condition()
+        self._wanted = []
+        # Bumped by want() so that a long read can give up on a file no longer wanted
+        self._generation = 0
+        self._stopped = False
+        # Paths read ahead that are still wanted
+        self._done = set()
+        # The number of files and MB read ahead
+        self.files = 0
+        self.megabytes = 0.
+
+    def want(self, paths):
+        '''The files the next tests need, in the order they need them, replacing the previous list'''
+        paths = list(paths)
+        self._condition.acquire()
+        try:
+            if paths == self._wanted:
+                # Keep going with the file being read
+                return
+            self._wanted = paths
+            self._generation += 1
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def stop(self):
+        '''Stop reading ahead'''
+        self._condition.acquire()
+        try:
+            self._stopped = True
+            self._generation += 1
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+    def __window(self, paths):
+        '''The leading paths that fit in the budget, with their sizes'''
+        window = []
+        total = 0
+        seen = set()
+        for path in paths:
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if total + size > self._budget:
+                break
+            total += size
+            window.append((path, size))
+        return window
+
+    def run(self):
+        generation = None
+        while True:
+            self._condition.acquire()
+            try:
+                while not self._stopped and self._generation == generation:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation = self._generation
+                paths = self._wanted
+            finally:
+                self._condition.release()
+            window = self.__window(paths)
+            # Forget what is no longer wanted, so that it is read again if it comes back
+            self._done &= set([path for path, size in window])
+            for path, size in window:
+                if self._generation != generation:
+                    break
+                if path in self._done:
+                    continue
+                if self.__readAhead(path, generation):
+                    self._done.add(path)
+                    self.files += 1
+                    self.megabytes += size / _MB
+
+    def __readAhead(self, path, generation):
+        '''Get the file into the page cache. Returns False if it was not done.'''
+        try:
+            handle = open(path, 'rb')
+        except IOError:
+            return False
+        try:
+            if self._fadvise is not None:
+                return self._fadvise(handle.fileno(), 0, 0, POSIX_FADV_WILLNEED) == 0
+            while handle.read(CHUNK_SIZE):
+                if self._generation != generation:
+                    return False
+            return True
+        finally:
+            handle.close()
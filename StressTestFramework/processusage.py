@@ -0,0 +1,227 @@
+'''
+Waits for a test process and collects the resources it used: CPU time, peak
+resident memory, context switches and page faults from wait4() and the bytes
+read and written from /proc/<pid>/io. Both include the children of the process
+that it waited for. Used by the runners in stresstesting and by forkserver.
+MemorySampler follows the memory of a test as it runs, from /proc.
+'''
+import os
+import sys
+import time
+import errno
+import threading
+
+def waitForProcess(pid):
+    '''
+    Wait for the child process to finish. Returns its exit code, negative for a
+    signal as with subprocess, and a dictionary of the resources it used. Needs
+    os.wait4 so is not available on Windows.
+    '''
+    # The I/O counts can only be read before the process is reaped
+    io = _readIOWhenFinished(pid)
+    status, rusage = _retry(os.wait4, pid, 0)[1:]
+    usage = {'cpu_user': rusage.ru_utime,
+             'cpu_system': rusage.ru_stime,
+             'max_rss_mb': _maxRSSMB(rusage.ru_maxrss),
+             'major_faults': rusage.ru_majflt,
+             'minor_faults': rusage.ru_minflt,
+             'voluntary_switches': rusage.ru_nvcsw,
+             'involuntary_switches': rusage.ru_nivcsw}
+    if io is not None:
+        usage['read_bytes'] = io.get('rchar', 0)
+        usage['write_bytes'] = io.get('wchar', 0)
+        usage['disk_read_bytes'] = io.get('read_bytes', 0)
+        usage['disk_write_bytes'] = io.get('write_bytes', 0)
+    return exitCode(status), usage
+
+def exitCode(status):
+    '''Convert a wait() status to an exit code as subprocess gives it'''
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def _retry(function, *args):
+    while True:
+        try:
+            return function(*args)
+        except OSError, exc:
+            if exc.errno != errno.EINTR:
+                raise
+
+def _maxRSSMB(maxrss):
+    # Bytes on OS X, kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return maxrss / (1024. * 1024.)
+    return maxrss / 1024.
+
+def _readIOWhenFinished(pid):
+    '''
+    Wait until the process has exited, without reaping it, and return the counts
+    from /proc/<pid>/io. None if they cannot be read.
+    '''
+    statfile = '/proc/%d/stat' % pid
+    iofile = '/proc/%d/io' % pid
+    if not os.path.exists(iofile):
+        return None
+    delay = 0.001
+    try:
+        while True:
+            # The state follows the command name, which is in brackets
+            state = open(statfile, 'r').read().rsplit(')', 1)[1].split()[0]
+            if state in ('Z', 'X'):
+                break
+            time.sleep(delay)
+            delay = min(2 * delay, 0.05)
+        io = {}
+        for line in open(iofile, 'r'):
+            name, value = line.split(':')
+            io[name.strip()] = int(value)
+        return io
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+#########################################################################
+# The memory used by a test over time
+#########################################################################
+# Whether the kernel lists the children of a process in /proc/<pid>/task/<tid>/children,
+# which needs Linux 3.5 or later built with CONFIG_PROC_CHILDREN
+_LISTS_CHILDREN = os.path.exists('/proc/%d/task/%d/children' % (os.getpid(), os.getpid()))
+
+def _processGroup(pid):
+    '''The process group of the process. Raises IOError if it has gone.'''
+    # The process group is the third field after the command name
+    stat = open('/proc/%s/stat' % pid, 'r').read()
+    return int(stat.rsplit(')', 1)[1].split()[2])
+
+def _children(pid):
+    '''The processes started by any of the threads of the process'''
+    children = []
+    try:
+        for tid in os.listdir('/proc/%d/task' % pid):
+            children.extend([int(child) for child in open('/proc/%d/task/%s/children' % (pid, tid), 'r').read().split()])
+    except (IOError, OSError, ValueError):
+        # Gone in the meantime, or a thread of it
+        pass
+    return children
+
+def groupProcesses(pgid, known):
+    '''
+    The ids of the processes in the given process group. They are looked for
+    among the processes in the set known, which is updated, the leader of the
+    group and their descendants, so that /proc is not scanned for every sample.
+    A process that outlives its parent is still found as it is remembered. Where
+    the kernel does not list the children of a process all of /proc is scanned.
+    '''
+    if _LISTS_CHILDREN:
+        candidates = list(known) + [pgid]
+    else:
+        candidates = [int(pid) for pid in os.listdir('/proc') if pid.isdigit()]
+    found = set()
+    while len(candidates) > 0:
+        pid = candidates.pop()
+        if pid in found:
+            continue
+        try:
+            if _processGroup(pid) != pgid:
+                continue
+        except (IOError, OSError, IndexError, ValueError):
+            # Gone in the meantime
+            continue
+        found.add(pid)
+        if _LISTS_CHILDREN:
+            candidates.extend(_children(pid))
+    known.clear()
+    known.update(found)
+    return found
+
+def groupMemoryMB(pgid, known=None):
+    '''
+    The resident and proportional set sizes, in MB, summed over the processes in
+    the given process group. The PSS shares the pages used by several processes
+    out between them, e.g. with the fork server. It is None if it cannot be read.
+    known is the set of the processes found in the group last time, if kept, see
+    groupProcesses().
+    '''
+    if known is None:
+        known = set()
+    pagesize = os.sysconf('SC_PAGE_SIZE')
+    rss = 0.
+    pss = 0.
+    for pid in groupProcesses(pgid, known):
+        try:
+            rss += int(open('/proc/%s/statm' % pid, 'r').read().split()[1]) * pagesize / (1024. * 1024.)
+        except (IOError, OSError, IndexError, ValueError):
+            # Gone in the meantime
+            continue
+        if pss is not None:
+            pss_kb = _readPSSkB(pid)
+            if pss_kb is None:
+                pss = None
+            else:
+                pss += pss_kb / 1024.
+    return rss, pss
+
+def _readPSSkB(pid):
+    # smaps_rollup, from Linux 4.14, is much cheaper than adding up smaps
+    for name in ('smaps_rollup', 'smaps'):
+        try:
+            handle = open('/proc/%s/%s' % (pid, name), 'r')
+        except IOError:
+            continue
+        try:
+            return sum([int(line.split()[1]) for line in handle if line.startswith('Pss:')])
+        finally:
+            handle.close()
+    return None
+
+def memoryStatistics(timeline):
+    '''
+    The peak of the RSS and PSS in a timeline of (seconds, RSS, PSS), the time
+    it was reached and the area under the curve in MB seconds
+    '''
+    statistics = {}
+    for column, name in ((1, 'rss'), (2, 'pss')):
+        points = [(sample[0], sample[column]) for sample in timeline if sample[column] is not None]
+        if len(points) == 0:
+            continue
+        peak_time, peak = max(points, key=lambda point: point[1])
+        area = 0.
+        for (t0, m0), (t1, m1) in zip(points[:-1], points[1:]):
+            area += 0.5 * (m0 + m1) * (t1 - t0)
+        statistics['peak_%s_mb' % name] = peak
+        statistics['peak_%s_time' % name] = peak_time
+        statistics['%s_mb_seconds' % name] = area
+    return statistics
+
+class MemorySampler(object):
+    '''
+    Samples the memory of the processes in a process group every interval seconds
+    in a thread, from when it is created until stop() is called. timeline is the
+    list of (seconds since the start, RSS in MB, PSS in MB or None).
+    '''
+
+    def __init__(self, pgid, interval):
+        self.timeline = []
+        self._pgid = pgid
+        self._interval = interval
+        # The processes found in the group so far, see groupProcesses()
+        self._pids = set()
+        self._start = time.time()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.__sample)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __sample(self):
+        while True:
+            rss, pss = groupMemoryMB(self._pgid, self._pids)
+            if rss > 0:
+                self.timeline.append((time.time() - self._start, rss, pss))
+            if self._stopped.wait(self._interval):
+                break
+
+    def stop(self):
+        '''Stop sampling. Returns the timeline.'''
+        self._stopped.set()
+        self._thread.join()
+        return self.timeline
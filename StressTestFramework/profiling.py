@@ -0,0 +1,199 @@
+'''
+Profiling of a test in the test process. Only imported when profiling is asked
+for, so a run without it pays nothing.
+
+The profile of a test is written as a .pstats file, for pstats or a viewer such
+as snakeviz, and as collapsed stacks, one "frame;frame;frame count" line per
+stack, which flame graph tools such as flamegraph.pl read directly.
+SamplingProfiler instead takes a sample of the Python stack at intervals of wall
+time, which costs too little to change how long the test takes, and writes the
+number of samples of each stack in the same collapsed format.
+'''
+import os
+import sys
+import atexit
+import time
+import signal
+import threading
+import traceback
+
+def functionLabel(func):
+    '''A frame label for the (filename, line, name) tuple used by pstats'''
+    filename, line, name = func
+    if filename == '~':
+        # A built-in function
+        label = name
+    else:
+        label = '%s:%d(%s)' % (os.path.basename(filename), line, name)
+    # Separators of the collapsed format
+    return label.replace(';', ':').replace(' ', '_')
+
+def writeCollapsed(stacks, filename, scale=1.):
+    '''
+    Write a dictionary of tuple of frame labels, outermost first -> weight as
+    collapsed stacks. Weights are multiplied by scale and rounded, dropping any
+    that come to nothing.
+    '''
+    handle = open(filename, 'w')
+    try:
+        for stack, weight in sorted(stacks.iteritems()):
+            count = int(round(weight * scale))
+            if count > 0:
+                handle.write('%s %d\n' % (';'.join(stack), count))
+    finally:
+        handle.close()
+
+#########################################################################
+# Deterministic profiling with cProfile
+#########################################################################
+# Stacks deeper than this are cut short when rebuilt from a profile
+MAX_DEPTH = 200
+
+def startProfile():
+    '''Returns a running cProfile.Profile'''
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def writeProfile(profiler, basename):
+    '''
+    Stop the profiler and write basename.pstats and basename.collapsed.txt, with
+    the weights of the collapsed stacks in microseconds
+    '''
+    profiler.disable()
+    import pstats
+    profiler.dump_stats(basename + '.pstats')
+    stats = pstats.Stats(basename + '.pstats')
+    writeCollapsed(collapsedStacks(stats.stats), basename + '.collapsed.txt', 1e6)
+
+def collapsedStacks(stats, minTime=1e-6):
+    '''
+    Rebuild the call stacks from the caller -> callee times in the stats dictionary
+    of a pstats.Stats. A profile only records who called whom, so the time of a
+    function is shared between its callers in proportion to the time each caller
+    spent in it. Recursion is cut where a function appears again in its own stack
+    and stacks taking less than minTime seconds in all are left out. Returns a
+    dictionary of tuple of frame labels -> self time in seconds.
+    '''
+    callees = {}
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.iteritems():
+        if len(callers) == 0:
+            roots.append(func)
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+
+    stacks = {}
+    def visit(func, stack, labels, fraction):
+        tt, ct = stats[func][2], stats[func][3]
+        labels = labels + (functionLabel(func),)
+        if tt * fraction > 0:
+            stacks[labels] = stacks.get(labels, 0.) + tt * fraction
+        if len(labels) >= MAX_DEPTH:
+            return
+        for callee in callees.get(func, []):
+            if callee in stack:
+                continue
+            callee_ct = stats[callee][3]
+            via_func = stats[callee][4][func][3]
+            if callee_ct <= 0 or via_func * fraction < minTime:
+                continue
+            visit(callee, stack | set([callee]), labels, fraction * via_func / callee_ct)
+
+    for root in roots:
+        visit(root, set([root]), (), 1.)
+    return stacks
+
+#########################################################################
+# Statistical profiling from a sampling thread
+#########################################################################
+# The histogram of a SamplingProfiler is written out this often, in seconds
+WRITE_INTERVAL = 5.
+
+def frameStack(frame):
+    '''The tuple of frame labels of the stack ending at frame, outermost first'''
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(functionLabel((code.co_filename, code.co_firstlineno, code.co_name)))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels[:MAX_DEPTH])
+
+class SamplingProfiler(object):
+    '''
+    Samples the Python stack of the thread that starts it frequency times a second
+    of wall-clock time, from a daemon thread using sys._current_frames(), so that
+    a test blocked on a lock or in I/O is sampled as much as one using the CPU.
+    Mantid releases the interpreter lock while algorithms run, so a test stuck in
+    one long algorithm is counted against the Python frame that called it.
+
+    The histogram is written to filename as collapsed stacks every WRITE_INTERVAL
+    seconds, replacing the file atomically, and when the process exits. A test
+    killed by the watchdog of a runner, even with SIGKILL, so leaves the samples
+    taken up to the last write. If the test is sent SIGTERM and the interpreter
+    gets to handle it, the stack it was stopped in is also printed to stderr, the
+    test log.
+    '''
+
+    def __init__(self, filename, frequency=100.):
+        self._filename = filename
+        self._interval = 1. / frequency
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.current_thread().ident
+        self._thread = threading.Thread(target=self._run, name='sampling profiler')
+        self._thread.daemon = True
+        self._thread.start()
+        signal.signal(signal.SIGTERM, self._terminated)
+        atexit.register(self.stop)
+
+    def stop(self):
+        '''Stop sampling and write the histogram'''
+        self._stopped.set()
+        self._write()
+
+    def _run(self):
+        written = time.time()
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                # The thread being sampled has finished
+                break
+            stack = frameStack(frame)
+            del frame
+            self._lock.acquire()
+            try:
+                self._stacks[stack] = self._stacks.get(stack, 0) + 1
+            finally:
+                self._lock.release()
+            if time.time() - written >= WRITE_INTERVAL:
+                self._write()
+                written = time.time()
+
+    def _write(self):
+        '''Replace the file with the histogram so far, so that it is never seen half written'''
+        self._lock.acquire()
+        try:
+            partial = self._filename + '.part'
+            writeCollapsed(self._stacks, partial)
+            if os.name == 'nt' and os.path.exists(self._filename):
+                os.remove(self._filename)
+            os.rename(partial, self._filename)
+        finally:
+            self._lock.release()
+
+    def _terminated(self, signum, frame):
+        sys.stderr.write("Terminated by signal %d in\n" % signum)
+        traceback.print_stack(frame, file=sys.stderr)
+        sys.stderr.flush()
+        self.stop()
+        # Die of the signal so that the runner still sees how the test ended
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
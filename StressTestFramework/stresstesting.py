@@ -35,7 +35,12 @@ import tempfile
 import imp
 import inspect
 import abc
+import json
+import contextlib
+import functools
+import math
 import numpy
+import processusage
 
 #########################################################################
 # The base test class.
@@ -51,6 +56,13 @@ class MantidStressTest(object):
     # Define a prefix for reporting results
     PREFIX = 'RESULT'
 
+    # The values of platform.system(), e.g. 'Darwin', on which the test is skipped
+    skipOnPlatforms = ()
+
+    # The modules the test needs, e.g. ('genxmlif', 'minixsv'). It is skipped if
+    # one of them cannot be found.
+    requiredModules = ()
+
     def __init__(self):
         # A list of things not to check when validating
         self.disableChecking = []
@@ -58,6 +70,16 @@ class MantidStressTest(object):
         self.stripWhitespace = True
         # Tolerance
         self.tolerance = 0.00000001
+        # The names of the timed regions being run, outermost first
+        self._regionStack = []
+        # Region path -> time spent in it in the current iteration
+        self._regionTimes = {}
+        # The last inventory of the workspaces, see workspaceInventory()
+        self._inventory = None
+        # The number of regions sent for a trace, see tracereporter
+        self._spans = 0
+        # Reference file name -> the file validated against, see inputs()
+        self._references = {}
         # Store the resident memory of the system (in MB) before starting the test
         import mantid.api
         mantid.api.FrameworkManager.clear()
@@ -71,7 +93,9 @@ class MantidStressTest(object):
         '''
         Override this to return True when the tests should be skipped for some
         reason. 
-        See also: requiredFiles() and requiredMemoryMB()
+        See also: requiredFiles(), requiredMemoryMB(), skipOnPlatforms and
+        requiredModules, which are checked before the test is started when they
+        are constants
         '''
         return False
 
@@ -92,6 +116,38 @@ class MantidStressTest(object):
         '''
         return []
     
+    def findDataFile(self, filename):
+        '''
+        Returns the full path of the named data file, or an empty string if it
+        cannot be found. It is looked up in the index of the data directories,
+        see dataFileIndex(), before asking Mantid's FileFinder.
+        '''
+        index = dataFileIndex()
+        if index is not None:
+            path = index.find(filename)
+            if path is not None:
+                return path
+        from mantid.api import FileFinder
+        return FileFinder.getFullPath(filename)
+
+    def inputs(self):
+        '''
+        The inputs of the test once it has run, for testcache: 'modules', the
+        files of the modules loaded from the directory of the test, and 'files',
+        the paths of its required files and the reference file it was validated
+        against, by name. A path is None where the file could not be found.
+        '''
+        directory = os.path.dirname(os.path.abspath(inspect.getfile(self.__class__)))
+        modules = set()
+        for module in sys.modules.values():
+            filename = getattr(module, '__file__', None)
+            if filename is not None and os.path.dirname(os.path.abspath(filename)) == directory:
+                modules.add(os.path.splitext(os.path.abspath(filename))[0] + '.py')
+        files = dict(self._references)
+        for filename in self.requiredFiles():
+            files[filename] = self.findDataFile(filename) or None
+        return {'modules': sorted(modules), 'files': files}
+
     def requiredMemoryMB(self):
         '''
         Override this method to specify the amount of free memory,
@@ -108,21 +164,111 @@ class MantidStressTest(object):
         return "WorkspaceToNeXus"
 
     def maxIterations(self):
-        '''Override this to perform more than 1 iteration of the implemented test.'''
+        '''
+        Override this to perform more than 1 iteration of the implemented test.
+        In benchmark mode this is the least number of timed iterations.
+        '''
         return 1
 
-    def reportResult(self, name, value):
+    def warmupIterations(self):
         '''
-        Send a result to be stored as a name,value pair
+        Override this to run the test a number of times, untimed, before the timed
+        iterations, e.g. to load the instrument definitions and fill the file cache.
         '''
-        print self.PREFIX + self.DELIMITER + name + self.DELIMITER + str(value) + '\n',
-        
+        return _options.get('warmupIterations', 0)
+
+    def benchmarkPrecision(self):
+        '''
+        Override this to turn on benchmark mode: the test is repeated until the 95%
+        confidence interval of the median time is narrower than this percentage of
+        the median, or benchmarkTimeBudget() runs out. None turns it off.
+        '''
+        return _options.get('benchmarkPrecision', None)
+
+    def benchmarkTimeBudget(self):
+        '''
+        Override this to give the time, in seconds, after which benchmark mode
+        stops repeating the test whatever the precision reached.
+        '''
+        return _options.get('benchmarkTimeBudget', 300.)
+
+    def soakIterations(self):
+        '''
+        Override this to run the test this many times, clearing the workspaces
+        between runs, in place of the usual iterations and fail it if the time
+        taken or the memory left after clearing grows with each run, see runSoak() and finishSoak().
+        None turns it off.
+        '''
+        return _options.get('soakIterations', None)
+
+    def workspaceInventory(self):
+        '''
+        Override this to return True to list the workspaces left after each timed
+        iteration and after validation, and how they changed, see workspaceinventory.
+        '''
+        return _options.get('workspaceInventory', False)
+
+    def timeoutSeconds(self):
+        '''
+        Override this to specify the wall-clock time, in seconds, after which the
+        test is stopped and marked as timed out. None uses the default of the run.
+        '''
+        return None
+
+    def reportResult(self, name, value, iteration=None):
+        '''
+        Send a result to be stored as a name,value pair, optionally for one iteration
+        of the test. The value keeps its type when the framework has opened a metrics
+        channel, see openMetrics(), otherwise it is printed as a RESULT line.
+        '''
+        sendResult(name, value, iteration)
+
+    def __takeInventory(self, label):
+        import workspaceinventory
+        try:
+            inventory = workspaceinventory.takeInventory()
+            print workspaceinventory.formatInventory(label, inventory, self._inventory)
+        except Exception, exc:
+            # Only a diagnostic, it must not fail the test
+            print "Cannot list the workspaces %s: %s" % (label, str(exc))
+            return
+        self.reportResult(workspaceinventory.RECORD_NAME, {'label': label, 'workspaces': inventory})
+        self._inventory = inventory
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        '''
+        A context manager timing the code inside it as the named region, e.g.
+            with self.timed('filtered_load'):
+                LoadEventNexus(...)
+        Regions may be nested, an inner region is named outer/inner. The time
+        spent in each region in each timed iteration of runTest() is reported as
+        the result 'region <name>'. With the 'traceRegions' option each run of a
+        region is also sent for the trace of the run, see tracereporter.
+        See also timedRegion().
+        '''
+        self._regionStack.append(name)
+        path = '/'.join(self._regionStack)
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self._regionTimes[path] = self._regionTimes.get(path, 0.) + elapsed
+            self._regionStack.pop()
+            if _options.get('traceRegions'):
+                import tracereporter
+                if self._spans < tracereporter.MAX_SPANS:
+                    self._spans += 1
+                    self.reportResult(tracereporter.RECORD_NAME, {'name': path, 'start': start,
+                                                                  'duration': elapsed})
+
     def __verifyRequiredFile(self, filename):
         '''Return True if the specified file name is findable by Mantid.'''
         from mantid.api import FileFinder
 
-        # simple way is just getFullPath which never uses archive search
-        if os.path.exists(FileFinder.getFullPath(filename)):
+        # simple way is the index or getFullPath, which never use archive search
+        if os.path.exists(self.findDataFile(filename)):
             return True
 
         # try full findRuns which will use archive search if it is turned on
@@ -175,27 +321,134 @@ class MantidStressTest(object):
         '''
         Run the defined number of iterations of this test
         '''
+        self.checkRequirements()
+        self.runIterations()
+
+    def checkRequirements(self):
+        '''
+        Exit with SKIP_TEST if the required files or memory are not available or
+        skipTests() says so
+        '''
         # Do we need to skip due to missing files?
         self.__verifyRequiredFiles()
         
         self.__verifyMemory()
+
+        reason = staticSkipReason(self.skipOnPlatforms, self.requiredModules)
+        if reason is not None:
+            print reason
+            sys.exit(PythonTestRunner.SKIP_TEST)
         
         # A custom check for skipping the tests for other reasons
         if self.skipTests():
             sys.exit(PythonTestRunner.SKIP_TEST)
 
+    def runIterations(self):
+        '''
+        Run the warm-up and then the timed iterations of the test, reporting the
+        time taken by each phase as well as by each iteration
+        '''
+        warmup = self.warmupIterations()
+        if warmup > 0:
+            start = time.time()
+            for i in range(warmup):
+                self.runTest()
+            reportPhase('warmup', start)
+            self._regionTimes.clear()
+
         # Start timer
         start = time.time()
-        countmax = self.maxIterations() + 1
-        for i in range(1, countmax):
+        precision = self.benchmarkPrecision()
+        if precision is None:
+            countmin = self.maxIterations()
+        else:
+            countmin = max(self.maxIterations(), BENCHMARK_MIN_ITERATIONS)
+        times = []
+        while True:
             istart = time.time()
             self.runTest()
             delta_t = time.time() - istart
-            self.reportResult('iteration time_taken', str(i) + ' %.2f' % delta_t)
+            times.append(delta_t)
+            self.reportResult('time_taken', delta_t, iteration=len(times))
+            for path, region_time in sorted(self._regionTimes.iteritems()):
+                self.reportResult(REGION_PREFIX + path, region_time, iteration=len(times))
+            self._regionTimes.clear()
+            if self.workspaceInventory():
+                self.__takeInventory('after iteration %d' % len(times))
+            if len(times) < countmin:
+                continue
+            if precision is None or len(times) >= BENCHMARK_MAX_ITERATIONS \
+                    or time.time() - start >= self.benchmarkTimeBudget():
+                break
+            if timingStatistics(times)['ci_width'] <= precision:
+                break
         delta_t = float(time.time() - start)
         # Finish
         #self.reportResult('time_taken', '%.2f' % delta_t)
+        reportPhase('runTest', start)
+        if precision is not None:
+            for name, value in sorted(timingStatistics(times).iteritems()):
+                self.reportResult('time_' + name, value)
         
+    def runSoak(self, count):
+        '''
+        Run the test count times in this process, clearing the workspaces between
+        runs, and record the time taken by each run and the resident memory left
+        after each clear. The workspaces of the last run are left for validation,
+        which clears them, so call finishSoak() after returnValidationCode() to
+        take the memory left by the last run and check the trends.
+        '''
+        import mantid.api
+        start = time.time()
+        self._soakTimes = []
+        self._soakMemory = []
+        for i in range(count):
+            if i > 0:
+                mantid.api.FrameworkManager.clear()
+                self.__sampleSoakMemory()
+            istart = time.time()
+            self.runTest()
+            self._soakTimes.append(time.time() - istart)
+            self.reportResult('time_taken', self._soakTimes[-1], iteration=len(self._soakTimes))
+        reportPhase('runTest', start)
+
+    def finishSoak(self):
+        '''
+        Take the memory left by the last run of runSoak(), once validation has
+        cleared its workspaces, and fit trends to the time taken by each run and to
+        the memory left after it. Returns False if the time grows by more than the
+        'soakTimeSlope' option, in percent of the median per run, or the memory by
+        more than 'soakMemorySlope', in MB per run.
+        '''
+        self.__sampleSoakMemory()
+        times, memory = self._soakTimes, self._soakMemory
+        median = timingStatistics(times)['median']
+        if median > 0:
+            time_slope = 100. * trendSlope(times) / median
+        else:
+            time_slope = 0.
+        memory_slope = trendSlope(memory)
+        self.reportResult('soak_time_slope', time_slope)
+        self.reportResult('soak_memory_slope', memory_slope)
+        print "Soak of %d runs: the time taken changes by %.3f%% and the memory by %.3f MB per run" \
+              % (len(times), time_slope, memory_slope)
+        passed = True
+        time_limit = _options.get('soakTimeSlope', SOAK_TIME_SLOPE)
+        if time_slope > time_limit:
+            print "The time taken grows by more than %g%% per run" % time_limit
+            passed = False
+        memory_limit = _options.get('soakMemorySlope', SOAK_MEMORY_SLOPE)
+        if memory_slope > memory_limit:
+            print "The memory grows by more than %g MB per run" % memory_limit
+            passed = False
+        return passed
+
+    def __sampleSoakMemory(self):
+        '''Record the resident memory left by the latest run of runSoak()'''
+        from mantid.kernel import MemoryStats
+        self._soakMemory.append(MemoryStats().residentMem() / 1024.)
+        self.reportResult('soak_memory', self._soakMemory[-1], iteration=len(self._soakMemory))
+
     def __prepASCIIFile(self, filename):
         """
         Prepare an ascii file for comparison using difflib.
@@ -212,6 +465,7 @@ class MantidStressTest(object):
         Validate ASCII files using difflib.
         """
         (measured, expected) = self.validate()
+        self._references[expected] = os.path.abspath(expected)
         measured = self.__prepASCIIFile(measured)
         expected = self.__prepASCIIFile(expected)
 
@@ -245,7 +499,8 @@ class MantidStressTest(object):
         from mantid.simpleapi import Load
         workspace2 = valNames[1]
         if workspace2.endswith('.nxs'):
-            Load(Filename=workspace2,OutputWorkspace="RefFile")
+            self._references[workspace2] = self.findDataFile(workspace2) or None
+            Load(Filename=self._references[workspace2] or workspace2,OutputWorkspace="RefFile")
             workspace2 = "RefFile"
         else:
             raise RuntimeError("Should supply a NeXus file: %s" % workspace2)
@@ -334,6 +589,8 @@ class MantidStressTest(object):
             self._success = True
         else:
             self._success = False
+        if self.workspaceInventory():
+            self.__takeInventory('after validation')
         # Now the validation is complete we can clear out all the stored data and check memory usage
         import mantid.api
         mantid.api.FrameworkManager.clear()
@@ -414,6 +671,321 @@ class MantidStressTest(object):
             raise Exception(msg)
 
     
+#########################################################################
+# Benchmark mode, see MantidStressTest.benchmarkPrecision()
+#########################################################################
+BENCHMARK_MIN_ITERATIONS = 5
+BENCHMARK_MAX_ITERATIONS = 1000
+
+def timingStatistics(times):
+    '''
+    Returns a dictionary of the median, median absolute deviation, minimum and
+    95th percentile of the times, and the width of the 95% confidence interval of
+    the median as a percentage of the median. The interval is taken between the
+    order statistics that bound it whatever the distribution of the times.
+    '''
+    times = sorted(times)
+    count = len(times)
+    median = _percentile(times, 50.)
+    deviations = sorted([abs(t - median) for t in times])
+    # Ranks n/2 -+ 1.96*sqrt(n)/2, counting from 1
+    half = 0.98 * count ** 0.5
+    lower = times[max(0, int(math.floor(count / 2. - half)) - 1)]
+    upper = times[min(count - 1, int(math.ceil(count / 2. + half)))]
+    if median > 0:
+        ci_width = 100. * (upper - lower) / median
+    else:
+        ci_width = 0.
+    return {'median': median,
+            'mad': _percentile(deviations, 50.),
+            'min': times[0],
+            'p95': _percentile(times, 95.),
+            'ci_width': ci_width,
+            'count': count}
+
+def staticSkipReason(skipOnPlatforms, requiredModules):
+    '''
+    The reason a test with the given skipOnPlatforms and requiredModules, see
+    MantidStressTest, is skipped on this machine, or None if it is not. The
+    modules are looked for without importing them, so only the top level package
+    of a dotted name is checked.
+    '''
+    if platform.system() in skipOnPlatforms:
+        return "Test skipped on %s" % platform.system()
+    for name in requiredModules:
+        try:
+            found = imp.find_module(name.split('.')[0])
+        except ImportError:
+            return "Required module '%s' is not available" % name
+        if found[0] is not None:
+            found[0].close()
+    return None
+
+#########################################################################
+# Soak mode, see MantidStressTest.soakIterations()
+#########################################################################
+# The default limits on the growth per run, in percent of the median time and in MB
+SOAK_TIME_SLOPE = 1.
+SOAK_MEMORY_SLOPE = 1.
+
+def trendSlope(values):
+    '''
+    The Theil-Sen estimate of the change in the values per step: the median of
+    the slopes between every pair of values. Unlike a least squares fit a few
+    outliers, e.g. a slow first run, do not move it. 0 for fewer than 2 values.
+    '''
+    slopes = []
+    for i in range(len(values)):
+        for j in range(i + 1, len(values)):
+            slopes.append((values[j] - values[i]) / float(j - i))
+    if len(slopes) == 0:
+        return 0.
+    return _percentile(sorted(slopes), 50.)
+
+def _percentile(values, percent):
+    '''Linear interpolation between the closest ranks of the sorted values'''
+    position = (len(values) - 1) * percent / 100.
+    below = int(math.floor(position))
+    above = min(below + 1, len(values) - 1)
+    return values[below] + (values[above] - values[below]) * (position - below)
+
+#########################################################################
+# The channel a test sends its results to the framework through
+#########################################################################
+class MetricsChannel(object):
+    '''
+    Writes the results of a test to a file as JSON lines, one object per result
+    holding the name, the value and the time it was reported. Values keep their
+    type, numpy arrays and scalars are sent as lists and numbers.
+    '''
+
+    def __init__(self, filename):
+        self._file = open(filename, 'a')
+
+    def send(self, name, value, iteration=None):
+        record = {'name': name, 'value': value, 'time': time.time()}
+        if iteration is not None:
+            record['iteration'] = iteration
+        self._file.write(json.dumps(record, default=_jsonValue) + '\n')
+        # Keep everything sent so far if the test dies
+        self._file.flush()
+
+    @staticmethod
+    def read(filename):
+        '''
+        Returns the records in the file, in the order sent. A line cut short by the
+        test being killed is ignored.
+        '''
+        records = []
+        if not os.path.exists(filename):
+            return records
+        handle = open(filename, 'r')
+        try:
+            for line in handle:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+        finally:
+            handle.close()
+        return records
+
+def resultItem(name, value, iteration=None):
+    '''
+    Returns the [name, value] strings stored in a TestResult for a result. Results
+    for an iteration are stored as 'iteration <name>' -> '<iteration> <value>'.
+    '''
+    if iteration is None:
+        return [name, str(value)]
+    if isinstance(value, float):
+        value = '%.2f' % value
+    return ['iteration ' + name, '%d %s' % (iteration, value)]
+
+def _jsonValue(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+# Set in the test process by openMetrics()
+_metrics = None
+
+def openMetrics(filename):
+    '''Send the results reported by tests in this process to the given file'''
+    global _metrics
+    _metrics = MetricsChannel(filename)
+
+# Settings for the tests in this process, see executeInChild()
+_options = {}
+
+# Built by dataFileIndex()
+_dataFileIndex = None
+
+def dataFileIndex():
+    '''
+    The index of the data directories given by the TestManager, see datafileindex,
+    or None if it gave none. It is read from the index file the TestManager saved,
+    so only the directories changed since are listed again.
+    '''
+    global _dataFileIndex
+    if _dataFileIndex is None and 'dataDirs' in _options:
+        import datafileindex
+        _dataFileIndex = datafileindex.DataFileIndex(_options['dataDirs'], _options.get('dataFileIndex'))
+    return _dataFileIndex
+
+def sendResult(name, value, iteration=None):
+    '''Send a result through the metrics channel, if open, or print a RESULT line'''
+    if _metrics is not None:
+        _metrics.send(name, value, iteration)
+    else:
+        name, value = resultItem(name, value, iteration)
+        print MantidStressTest.PREFIX + MantidStressTest.DELIMITER + name \
+            + MantidStressTest.DELIMITER + value + '\n',
+
+# Results giving the time taken by a phase of running a test start with this
+PHASE_PREFIX = 'phase '
+
+def reportPhase(name, start):
+    '''Report the time since start as the time taken by the named phase. Returns the time now.'''
+    now = time.time()
+    sendResult(PHASE_PREFIX + name, now - start)
+    return now
+
+# Results giving the time taken by a region timed by a test start with this
+REGION_PREFIX = 'region '
+
+def timedRegion(name=None):
+    '''
+    A decorator timing each call of a method of a MantidStressTest as a region,
+    see MantidStressTest.timed(). The region is named after the method unless a
+    name is given, e.g.
+        @stresstesting.timedRegion('load_then_filter')
+        def loadThenFilter(self):
+    '''
+    def decorate(method):
+        @functools.wraps(method)
+        def timedMethod(self, *args, **kwargs):
+            with self.timed(name or method.__name__):
+                return method(self, *args, **kwargs)
+        return timedMethod
+    return decorate
+
+def _startChild(options):
+    '''Set up a test process with the options from the TestManager. Returns the time now.'''
+    global _options
+    _options = options
+    if 'metrics' in options:
+        openMetrics(options['metrics'])
+    start = time.time()
+    if 'spawnTime' in options:
+        sendResult(PHASE_PREFIX + 'startup', start - options['spawnTime'])
+    return start
+
+def importMantid():
+    '''
+    Import Mantid a stage at a time, reporting the time taken by each as a phase:
+    import_kernel, which reads the ConfigService properties, import_api, which
+    starts the FrameworkManager and loads the algorithm libraries,
+    import_simpleapi, which generates the algorithm functions, and facility_setup,
+    which reads the facility and default instrument definitions. The stages
+    already done in the fork server take no time. Returns the time now.
+    '''
+    start = time.time()
+    try:
+        import mantid.kernel
+        start = reportPhase('import_kernel', start)
+        import mantid.api
+        start = reportPhase('import_api', start)
+        import mantid.simpleapi
+        start = reportPhase('import_simpleapi', start)
+    except ImportError:
+        # Reported properly by the test when it imports it
+        return time.time()
+    try:
+        mantid.kernel.config.getFacility()
+        mantid.kernel.config.getInstrument()
+    except (AttributeError, RuntimeError, ValueError):
+        # Reported properly by the test if it needs them
+        pass
+    return reportPhase('facility_setup', start)
+
+def executeStartupInChild(options):
+    '''
+    Only start up a test process, importing Mantid, and exit. Used by
+    benchmarkStartup().
+    '''
+    _startChild(options)
+    importMantid()
+    sys.exit(PythonTestRunner.SUCCESS_CODE)
+
+def executeInChild(modname, testname, options):
+    '''
+    Run a test in the test process and exit with its return code. This is what
+    the code passed to the runners by TestSuite.execute() calls. options is a
+    dictionary of settings from the TestManager: 'metrics' is the file for the
+    MetricsChannel, 'spawnTime' the time the process was started, a true
+    'algorithmLedger' records the algorithms run, see algorithmledger, a true
+    'workspaceInventory' lists the workspaces left, see workspaceinventory,
+    'soakTimeSlope' and 'soakMemorySlope' are the limits of finishSoak(), a true
+    'traceRegions' sends the runs of timed regions, see MantidStressTest.timed(),
+    'dataDirs' and 'dataFileIndex' give the index of the data files, see
+    dataFileIndex(), a true 'recordInputs' sends the inputs of a test that
+    passes, see MantidStressTest.inputs(),
+    'profile' is the file name, less extension, to write a cProfile profile of
+    the test to, 'samples' the file to write the stacks sampled 'samplingHz'
+    times a second to, see profiling, and the rest give the defaults
+    of the MantidStressTest methods of the same name, e.g. 'benchmarkPrecision'.
+    The time taken by each phase is reported: startup of the process, the stages
+    of importing Mantid, see importMantid(), setup of the test, runTest, validation
+    and cleanup. TestSuite adds the teardown, from the end of cleanup to the exit
+    of the process.
+    '''
+    start = _startChild(options)
+    if 'samples' in options:
+        import profiling
+        profiling.SamplingProfiler(options['samples'], options.get('samplingHz', 100.)).start()
+    start = importMantid()
+    if options.get('algorithmLedger') and _metrics is not None:
+        import algorithmledger
+        try:
+            # Kept alive until the test exits
+            ledger = algorithmledger.install(lambda entry: _metrics.send(algorithmledger.RECORD_NAME, entry))
+        except ImportError, exc:
+            print "Cannot record the algorithms run: %s" % str(exc)
+    module = __import__(modname)
+    systest = getattr(module, testname)()
+    profiler = None
+    if 'profile' in options:
+        import profiling
+        profiler = profiling.startProfile()
+    try:
+        systest.checkRequirements()
+        reportPhase('setup', start)
+        soak = systest.soakIterations()
+        if soak:
+            systest.runSoak(soak)
+        else:
+            systest.runIterations()
+    finally:
+        # The profile of a test that raised shows where it went wrong
+        if profiler is not None:
+            profiling.writeProfile(profiler, options['profile'])
+    start = time.time()
+    retcode = systest.returnValidationCode(PythonTestRunner.VALIDATION_FAIL_CODE)
+    # After validation has cleared the workspaces of the last run
+    if soak and not systest.finishSoak() and retcode == PythonTestRunner.SUCCESS_CODE:
+        retcode = PythonTestRunner.SOAK_FAIL_CODE
+    start = reportPhase('validation', start)
+    if retcode == PythonTestRunner.SUCCESS_CODE and options.get('recordInputs') and _metrics is not None:
+        import testcache
+        try:
+            _metrics.send(testcache.RECORD_NAME, systest.inputs())
+        except Exception, exc:
+            # The test passed, it is only not remembered as passing
+            print "Cannot record the inputs of the test for the result cache: %s" % str(exc)
+    systest.cleanup()
+    reportPhase('cleanup', start)
+    sys.exit(retcode)
+
 #########################################################################
 # A class to store the results of a test 
 #########################################################################
@@ -432,6 +1004,29 @@ class TestResult(object):
         self.total_time = ''
         self.output = ''
         self.err = ''
+        # The file holding the whole output, if it was kept
+        self.logfile = None
+        # The records sent through the MetricsChannel, with their types
+        self.metrics = []
+        # The resources used by the test process, see processusage, and the
+        # fraction of the wall time it spent on the CPU
+        self.usage = None
+        # The algorithms run by the test, if recorded, see algorithmledger
+        self.algorithms = []
+        # The inventories of the workspaces taken by the test, if asked for,
+        # as dictionaries of the label and the workspaces, see workspaceinventory
+        self.workspaces = []
+        # When the test process was started and how long it ran for, in seconds,
+        # None if it was not run
+        self.start_time = None
+        self.wall_time = None
+        # The runs of the regions timed by the test, if traced, see tracereporter
+        self.spans = []
+        # (seconds, RSS in MB, PSS in MB) samples of the memory of the test
+        # process, if sampled, see processusage.MemorySampler
+        self.memoryTimeline = []
+        # What the test depended on, if it passed and was asked, see testcache
+        self.inputs = None
     
     def addItem(self, item):
         '''
@@ -445,6 +1040,102 @@ class TestResult(object):
         '''
         return self._results
 
+#########################################################################
+# A class to collect the output of a test as it runs
+#########################################################################
+class OutputCapture(object):
+    '''
+    Collects the output of a test line by line as it arrives. The RESULT lines
+    are picked out as they pass, the whole output is written to logfile, or to an
+    anonymous temporary file with spool, and only the last tailSize bytes are
+    kept in memory. With memoryInterval the memory of the test processes is
+    sampled that often, in seconds, while they run, see processusage.MemorySampler.
+    '''
+    TAIL_SIZE = 64 * 1024
+
+    def __init__(self, logfile=None, spool=False, tailSize=TAIL_SIZE, memoryInterval=None):
+        import collections
+        self.logfile = logfile
+        if logfile is not None:
+            self._log = open(logfile, 'w+b')
+        elif spool:
+            self._log = tempfile.TemporaryFile()
+        else:
+            self._log = None
+        self._tail = collections.deque()
+        self._tail_size = 0
+        self._max_tail_size = tailSize
+        # Bytes of output seen
+        self.size = 0
+        # [name, value] of each RESULT line
+        self.results = []
+        # The resources used by the process, see processusage
+        self.usage = None
+        # (seconds, RSS, PSS) samples of the memory used by the process
+        self.memoryTimeline = []
+        self._memory_interval = memoryInterval
+        self._sampler = None
+
+    def processStarted(self, pgid):
+        '''Called by the runner with the process group of the test once it has started'''
+        if self._memory_interval and os.path.isdir('/proc'):
+            self._sampler = processusage.MemorySampler(pgid, self._memory_interval)
+
+    def processFinished(self, usage):
+        '''
+        Called by the runner with the resources used, None if they are not known,
+        once the process has finished
+        '''
+        self.usage = usage
+        if self._sampler is not None:
+            self.memoryTimeline = self._sampler.stop()
+            self._sampler = None
+
+    def write(self, line):
+        '''Add a line of output, including its line ending'''
+        self.size += len(line)
+        if self._log is not None:
+            self._log.write(line)
+        if line.startswith(MantidStressTest.PREFIX):
+            entries = line.rstrip('\r\n').split(MantidStressTest.DELIMITER)
+            if len(entries) == 3 and entries[0] == MantidStressTest.PREFIX:
+                self.results.append([entries[1], entries[2]])
+        if len(line) > self._max_tail_size:
+            line = line[-self._max_tail_size:]
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size > self._max_tail_size:
+            self._tail_size -= len(self._tail.popleft())
+
+    def tail(self):
+        '''The end of the output, noting how much has been left out'''
+        text = ''.join(self._tail)
+        if self.size > len(text):
+            omitted = "[%d bytes of output omitted" % (self.size - len(text))
+            if self.logfile is not None:
+                omitted += ", see " + self.logfile
+            text = omitted + "]\n" + text
+        return text
+
+    def replay(self, stream):
+        '''Write the whole output to the stream, if it was logged, else the tail'''
+        if self._log is None:
+            stream.write(self.tail())
+            return
+        self._log.flush()
+        self._log.seek(0)
+        while True:
+            chunk = self._log.read(65536)
+            if not chunk:
+                break
+            stream.write(chunk)
+        self._log.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
 #########################################################################
 # A base class to support report results in an appropriate manner
 #########################################################################
@@ -490,6 +1181,48 @@ from xmlreporter import XmlResultReporter
 #########################################################################
 from emailreporter import EmailResultReporter
 
+#########################################################################
+# A class to report the algorithms the tests spend their time in
+#########################################################################
+from algorithmledger import AlgorithmLedgerReporter
+
+#########################################################################
+# A class to write the timeline of a run as a trace for chrome://tracing
+#########################################################################
+from tracereporter import TraceEventReporter
+
+#########################################################################
+# A class to stop tests that run for too long
+#########################################################################
+class Watchdog(object):
+    '''
+    Calls kill(signal.SIGTERM) if it has not been stopped within timeout
+    seconds, followed by kill(signal.SIGKILL) if it is still not stopped
+    GRACE_PERIOD seconds later.
+    '''
+    GRACE_PERIOD = 10.
+
+    def __init__(self, timeout, kill):
+        import threading
+        self.expired = False
+        self._kill = kill
+        self._stopped = threading.Event()
+        self._timer = threading.Timer(timeout, self.__expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def __expire(self):
+        import signal
+        self.expired = True
+        self._kill(signal.SIGTERM)
+        if not self._stopped.wait(self.GRACE_PERIOD):
+            self._kill(signal.SIGKILL)
+
+    def stop(self):
+        '''Call when the process has finished'''
+        self._stopped.set()
+        self._timer.cancel()
+
 #########################################################################
 # A base class for a TestRunner
 #########################################################################
@@ -504,6 +1237,9 @@ class PythonTestRunner(object):
     VALIDATION_FAIL_CODE = 99
     NOT_A_TEST = 98
     SKIP_TEST = 97
+    SOAK_FAIL_CODE = 96
+    # Returned in place of the exit code when the watchdog stopped the test
+    TIMEOUT_CODE = -1000
 
     def __init__(self, need_escaping = False):
         self._mtdpy_header = ''
@@ -516,6 +1252,10 @@ class PythonTestRunner(object):
         # A string to prefix the code with
         self._code_prefix = ''
         self._using_escape = need_escaping
+        # Print the output of the test as it arrives
+        self._echo_output = True
+        # Process groups of the tests that are running
+        self._running = set()
 
     def commandString(self, pycode):
         '''
@@ -530,6 +1270,13 @@ class PythonTestRunner(object):
     def setTestDir(self, test_dir):
         self._test_dir = os.path.abspath(test_dir).replace('\\','/')
 
+    def setEchoOutput(self, echo):
+        '''
+        Turn on/off printing the output of the test process as it arrives. This
+        is turned off when several tests run at once so that their output does not mix.
+        '''
+        self._echo_output = echo
+
     def createCodePrefix(self):
         if self._using_escape == True:
             esc = '\\'
@@ -547,24 +1294,89 @@ class PythonTestRunner(object):
         '''
         return self._code_prefix
 
-    def spawnSubProcess(self, cmd):
+    def spawnSubProcess(self, cmd, timeout=None, capture=None, env=None):
         '''
-        Spawn a new process and run the given command within it
+        Spawn a new process and run the given command within it. If it runs for longer
+        than timeout seconds it is killed and TIMEOUT_CODE is returned as its exit code.
+        The output is passed to capture, see collectOutput(). env, if given, is the
+        environment of the process.
         '''
+        # Close inherited descriptors so that processes started concurrently from
+        # other threads do not keep each other's output pipes open. The process
+        # leads a new session so that the whole group can be killed.
+        if os.name == 'nt':
+            preexec = None
+        else:
+            preexec = os.setsid
+        proc = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, bufsize=-1,
+                                close_fds = (os.name != 'nt'), preexec_fn = preexec, env = env)
+        self._running.add(proc.pid)
+        if capture is not None:
+            capture.processStarted(proc.pid)
+        watchdog = None
+        if timeout is not None:
+            watchdog = Watchdog(timeout, lambda signum: self.killProcessGroup(proc.pid, signum))
+        usage = None
+        try:
+            std_out = self.collectOutput(iter(proc.stdout.readline, ''), capture)
+            std_err = ""
+            if hasattr(os, 'wait4'):
+                proc.returncode, usage = processusage.waitForProcess(proc.pid)
+            else:
+                proc.wait()
+        finally:
+            # Also after ^C, to stop the memory sampler
+            if capture is not None:
+                capture.processFinished(usage)
+            if watchdog is not None:
+                watchdog.stop()
+            self._running.discard(proc.pid)
+
+        if watchdog is not None and watchdog.expired:
+            return PythonTestRunner.TIMEOUT_CODE, std_out, std_err
+        return proc.returncode, std_out, std_err 
 
-        proc = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, bufsize=-1)
-        std_out = ""
-        std_err = ""
-        for line in proc.stdout:
-            print line,
-            std_out += line
-        proc.wait()
+    def killProcessGroup(self, pgid, signum):
+        '''
+        Send the signal to the process group led by the given process. On Windows
+        the process tree is killed whatever the signal.
+        '''
+        try:
+            if os.name == 'nt':
+                subprocess.call('taskkill /F /T /PID %d' % pgid, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+            else:
+                os.killpg(pgid, signum)
+        except OSError:
+            # Already gone
+            pass
 
-        return proc.returncode, std_out, std_err 
+    def killRunning(self):
+        '''
+        Kill all of the tests that are still running, e.g. after ^C. The tests are in
+        their own process groups so do not receive the interrupt from the terminal.
+        '''
+        import signal
+        for pgid in list(self._running):
+            self.killProcessGroup(pgid, getattr(signal, 'SIGKILL', None))
+
+    def collectOutput(self, lines, capture=None):
+        '''
+        Pass the lines of output from a test process to the OutputCapture, printing
+        them if required. Returns the tail of the output kept by the capture.
+        '''
+        if capture is None:
+            capture = OutputCapture()
+        for line in lines:
+            if self._echo_output:
+                sys.stdout.write(line)
+            capture.write(line)
+        return capture.tail()
     
-    def start(self, pycode):
+    def start(self, pycode, timeout=None, capture=None):
         '''
-        Run the given test code in a new subprocess
+        Run the given test code in a new subprocess, stopping it after timeout seconds.
+        The output is passed to capture, an OutputCapture, if given. Returns the exit
+        code, the tail of the output and the error output.
         '''
         raise NotImplementedError('"run(self, pycode)" should be overridden in a derived class')
     
@@ -577,14 +1389,146 @@ class PythonConsoleRunner(PythonTestRunner):
     interpreter
     '''
     
+    # The environment variable holding the code to run
+    CODE_VARIABLE = 'STRESSTESTING_CODE'
+
     def __init__(self):
-        PythonTestRunner.__init__(self, True)
+        PythonTestRunner.__init__(self)
 
-    def start(self, pycode):
+    def start(self, pycode, timeout=None, capture=None):
         '''
         Run the code in a new instance of a python interpreter
         '''
-        return self.spawnSubProcess(sys.executable + ' -c \"' + self.getCodePrefix() + pycode + '\"')
+        # The code, which holds the paths of the test options, is passed in the
+        # environment rather than on the command line so that the shell does not
+        # interpret quotes, $ or ` in them
+        env = dict(os.environ)
+        env[self.CODE_VARIABLE] = self.getCodePrefix() + pycode
+        cmd = '"' + sys.executable + '" -c "import os;exec(os.environ[\'' + self.CODE_VARIABLE + '\'])"'
+        return self.spawnSubProcess(cmd, timeout, capture, env)
+
+#########################################################################
+# A runner class to execute the tests in processes forked from a server
+#########################################################################
+class PythonForkServerRunner(PythonTestRunner):
+    '''
+    This class executes each test in a process forked from a server process that
+    has already imported Mantid, so that the tests do not each pay for starting
+    the interpreter and loading Mantid. The modules imported up front are given by
+    preload. Every test still gets a fresh process so nothing is shared between
+    tests. Requires fork() so is not available on Windows.
+    '''
+
+    def __init__(self, preload=('mantid.simpleapi',)):
+        PythonTestRunner.__init__(self)
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("The fork server runner is not supported on this platform")
+        self._preload = list(preload)
+        self._server = None
+        self._server_dir = None
+        import threading
+        self._lock = threading.Lock()
+
+    def startServer(self):
+        '''
+        Start the server process and wait until it has imported the preload modules
+        '''
+        import forkserver
+        self._server_dir = tempfile.mkdtemp(prefix='stresstesting')
+        self._address = os.path.join(self._server_dir, 'forkserver').replace('\\','/')
+        framework_dir = os.path.dirname(os.path.abspath(__file__)).replace('\\','/')
+        code = self.getCodePrefix() + 'sys.path.insert(0, "%s");import forkserver;forkserver.serve("%s", %r)' \
+               % (framework_dir, self._address, self._preload)
+        self._server = subprocess.Popen([sys.executable, '-c', code], stdin = subprocess.PIPE,
+                                        stdout = subprocess.PIPE, stderr = subprocess.STDOUT, close_fds = True)
+        for line in iter(self._server.stdout.readline, ''):
+            if line.strip() == forkserver.READY:
+                break
+            print line,
+        else:
+            self._server.wait()
+            raise RuntimeError("The fork server failed to start, exit code %d" % self._server.returncode)
+        import atexit
+        atexit.register(self.stopServer)
+
+    def stopServer(self):
+        '''
+        Stop the server and any tests still running, e.g. after ^C
+        '''
+        import shutil
+        self.killRunning()
+        if self._server is not None and self._server.poll() is None:
+            self._server.stdin.close()
+            self._server.wait()
+        if self._server_dir is not None:
+            shutil.rmtree(self._server_dir, ignore_errors=True)
+            self._server_dir = None
+
+    def start(self, pycode, timeout=None, capture=None):
+        '''
+        Run the code in a process forked from the server
+        '''
+        import socket, forkserver
+        self._lock.acquire()
+        try:
+            if self._server is None or self._server.poll() is not None:
+                self.startServer()
+        finally:
+            self._lock.release()
+
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(self._address)
+        conn.sendall(self.getCodePrefix() + pycode)
+        conn.shutdown(socket.SHUT_WR)
+        status = {}
+
+        def testOutput(stream):
+            # Strip out the messages from the server
+            for line in stream:
+                if line.startswith(forkserver.HEADER):
+                    status['pgid'] = int(line[len(forkserver.HEADER):])
+                    self._running.add(status['pgid'])
+                    capture.processStarted(status['pgid'])
+                    continue
+                pos = line.find(forkserver.EXIT_MARKER)
+                if pos >= 0:
+                    retcode, usage = line[pos + len(forkserver.EXIT_MARKER):].split(' ', 1)
+                    status['retcode'] = int(retcode)
+                    capture.processFinished(json.loads(usage))
+                    line = line[:pos]
+                    if len(line) > 0:
+                        yield line
+                    break
+                yield line
+
+        watchdog = None
+        if timeout is not None:
+            def kill(signum):
+                if 'pgid' in status:
+                    self.killProcessGroup(status['pgid'], signum)
+            watchdog = Watchdog(timeout, kill)
+        if capture is None:
+            capture = OutputCapture()
+        stream = conn.makefile('rb')
+        try:
+            std_out = self.collectOutput(testOutput(stream), capture)
+        finally:
+            if watchdog is not None:
+                watchdog.stop()
+            stream.close()
+            conn.close()
+            self._running.discard(status.get('pgid'))
+            if 'retcode' not in status:
+                capture.processFinished(None)
+        if watchdog is not None and watchdog.expired:
+            retcode = PythonTestRunner.TIMEOUT_CODE
+        elif 'retcode' in status:
+            retcode = status['retcode']
+        else:
+            capture.write("Lost the connection to the fork server before the test finished\n")
+            std_out = capture.tail()
+            retcode = PythonTestRunner.GENERIC_FAIL_CODE
+        return retcode, std_out, ""
 
 #########################################################################
 # A runner class to execute the tests on using the command line interface
@@ -602,7 +1546,7 @@ class MantidPlotTestRunner(PythonTestRunner):
             mtdplot_bin += '.exe'
         self._mtdplot_bin = os.path.abspath(mtdplot_bin).replace('\\','/')
         
-    def start(self, pycode):
+    def start(self, pycode, timeout=None, capture=None):
         '''
         Run the code in a new instance of the MantidPlot scripting environment
         '''
@@ -623,7 +1567,7 @@ class MantidPlotTestRunner(PythonTestRunner):
         fd, tmpfilepath = tempfile.mkstemp(suffix = '.py', dir = loc, text=True)
 
         os.write(fd, 'import sys\nsys.stdout = sys.__stdout__\n' + self.getCodePrefix() + pycode)
-        retcode, output, err = self.spawnSubProcess('"' +self._mtdplot_bin + '" -xq \'' + tmpfilepath + '\'') 
+        retcode, output, err = self.spawnSubProcess('"' +self._mtdplot_bin + '" -xq \'' + tmpfilepath + '\'', timeout, capture)
         # Remove the temporary file
         os.close(fd)
         os.remove(tmpfilepath)
@@ -636,8 +1580,10 @@ class TestSuite(object):
     '''
     Tie together a test and its results.
     '''
-    def __init__(self, modname, testname, filename = None):
+    def __init__(self, modname, testname, filename = None, requiredMemoryMB = 0, timeoutSeconds = None,
+                 requiredFiles = None, skipOnPlatforms = (), requiredModules = (), referenceFiles = ()):
         self._modname = modname
+        self._testname = testname
         self._fullname = modname
         # A None testname indicates the source did not load properly
         # It has come this far so that it gets reported as a proper failure
@@ -657,9 +1603,29 @@ class TestSuite(object):
         self._result.addItem(['host_name', sysinfo[1]])
         self._result.addItem(['environment', self.envAsString()])
         self._result.status = 'skipped' # the test has been skipped until it has been executed
+        # Used by the manager to decide when the test can be started
+        self._required_memory = requiredMemoryMB
+        # None means the default of the run
+        self._timeout = timeoutSeconds
+        # Checked before the test is started, see TestManager. None if not known.
+        self._required_files = requiredFiles
+        self._skip_on_platforms = skipOnPlatforms
+        self._required_modules = requiredModules
+        # The files the test is validated against, where known without running it
+        self._reference_files = referenceFiles
+        # Wall-clock time taken to run the test process, None until executed
+        self._wall_time = None
 
     name = property(lambda self: self._fullname)
     status = property(lambda self: self._result.status)
+    requiredMemoryMB = property(lambda self: self._required_memory)
+    timeoutSeconds = property(lambda self: self._timeout)
+    requiredFiles = property(lambda self: self._required_files)
+    skipOnPlatforms = property(lambda self: self._skip_on_platforms)
+    requiredModules = property(lambda self: self._required_modules)
+    referenceFiles = property(lambda self: self._reference_files)
+    wallTime = property(lambda self: self._wall_time)
+    inputs = property(lambda self: self._result.inputs)
 
     def envAsString(self):
         if os.name == 'nt':
@@ -676,19 +1642,66 @@ class TestSuite(object):
         self.setOutputMsg(reason)
         self._result.status = 'skipped'
 
-    def execute(self, runner):
-        print time.strftime("%a, %d %b %Y %H:%M:%S", time.localtime()) + ': Executing ' + self._fullname
-        pycode = 'import ' + self._modname + ';'\
-                 + 'systest = ' + self._fullname + '();'\
-                 + 'systest.execute();'\
-                 + 'retcode = systest.returnValidationCode('+str(PythonTestRunner.VALIDATION_FAIL_CODE)+');'\
-                 + 'systest.cleanup();'\
-                 + 'sys.exit(retcode)'
+    def markAsCached(self, passed):
+        '''Report the test as passed, without running it, on the strength of its pass at the time passed'''
+        import testcache
+        self.setOutputMsg(testcache.describePass(passed))
+        self._result.status = 'cached-pass'
+        self._result.addItem(['status', 'cached-pass'])
+
+    def markAsFailed(self, message):
+        '''Report the test as failed with the given output, e.g. because it could not be started'''
+        self.setOutputMsg(message)
+        self._result.status = 'error'
+        self._result.addItem(['status', 'error'])
+
+    def execute(self, runner, echo=True, timeout=None, logfile=None, options=None, memoryInterval=None):
+        '''
+        Run the test using the given runner. If echo is False the output is not
+        printed, call printOutput() to show it once the test has finished. The test
+        is stopped after timeout seconds. The whole output is written to logfile, if
+        given, and only its tail is kept with the result. options are passed to the
+        test process, see executeInChild(). With memoryInterval the memory of the
+        test is sampled that often, in seconds, and its peak, the time of the peak
+        and the area under the curve are added to the usage of the result.
+        '''
+        self._start_msg = time.strftime("%a, %d %b %Y %H:%M:%S", time.localtime()) + ': Executing ' + self._fullname
+        if echo:
+            print self._start_msg
+        else:
+            sys.stdout.write(self._start_msg + '\n')
+        if logfile is not None:
+            metricsfile = os.path.splitext(logfile)[0] + '.metrics.jsonl'
+            if os.path.exists(metricsfile):
+                os.remove(metricsfile)
+        else:
+            fd, metricsfile = tempfile.mkstemp(suffix='.metrics.jsonl')
+            os.close(fd)
+        options = dict(options or {})
+        options['metrics'] = metricsfile
+        options['spawnTime'] = time.time()
+        pycode = 'import stresstesting;'\
+                 + 'stresstesting.executeInChild(%r, %r, %r)' % (self._modname, self._testname, options)
         # Start the new process
         self._result.date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self._result.addItem(['test_date',self._result.date])
-        retcode, output, err = runner.start(pycode)
-        
+        # Without echo the output is kept for printOutput(), on disk rather than in memory
+        self._capture = OutputCapture(logfile, spool=not echo, memoryInterval=memoryInterval)
+        self._result.logfile = logfile
+        start = time.time()
+        retcode, output, err = runner.start(pycode, timeout, self._capture)
+        self._wall_time = time.time() - start
+        self._result.start_time = start
+        self._result.wall_time = self._wall_time
+        usage = self._capture.usage
+        if usage is not None and self._wall_time > 0:
+            usage['cpu_fraction'] = (usage['cpu_user'] + usage['cpu_system']) / self._wall_time
+        if len(self._capture.memoryTimeline) > 0:
+            self._result.memoryTimeline = self._capture.memoryTimeline
+            if usage is None:
+                usage = {}
+            usage.update(processusage.memoryStatistics(self._result.memoryTimeline))
+        self._result.usage = usage
 
         if retcode == PythonTestRunner.SUCCESS_CODE:
             status = 'success'
@@ -701,24 +1714,64 @@ class TestSuite(object):
             status = 'crashed'
         elif retcode == PythonTestRunner.SKIP_TEST:
             status = 'skipped'
-        elif retcode < 0:
-            status = 'hung'
+        elif retcode == PythonTestRunner.SOAK_FAIL_CODE:
+            status = 'soak failure'
+        elif retcode == PythonTestRunner.TIMEOUT_CODE:
+            status = 'timeout'
+            message = "Test stopped after exceeding its time limit of %g seconds\n" % timeout
+            if echo:
+                sys.stdout.write(message)
+            self._capture.write(message)
+            output = self._capture.tail()
+        elif retcode < 0 or retcode > 128:
+            # Killed by a signal. A shell gives 128 + the signal number.
+            status = 'signal'
         else:
             status = 'unknown'
 
         # Check return code and add result
         self._result.status = status
         self._result.addItem(['status', status])
-        # Dump std out so we know what happened
-        print output
         self._result.output = output
-        all_lines = output.split('\n')
-        # Find the test results
-        for line in all_lines:
-            entries = line.split(MantidStressTest.DELIMITER)
-            if len(entries) == 3 and entries[0] == MantidStressTest.PREFIX:
-                self._result.addItem([entries[1], entries[2]])
+        # The test results. Those printed as RESULT lines are picked out as the output
+        # arrives, e.g. when a test is run by hand.
+        self._result.metrics = MetricsChannel.read(metricsfile)
+        if logfile is None:
+            os.remove(metricsfile)
+        for record in self._result.metrics:
+            if record['name'] == PHASE_PREFIX + 'cleanup':
+                # From the end of the test to the exit of the process
+                self._result.metrics.append({'name': PHASE_PREFIX + 'teardown',
+                                             'value': start + self._wall_time - record['time'],
+                                             'time': start + self._wall_time})
+                break
+        import algorithmledger, workspaceinventory, tracereporter, testcache
+        for record in self._result.metrics:
+            if record['name'] == algorithmledger.RECORD_NAME:
+                self._result.algorithms.append(record['value'])
+            elif record['name'] == workspaceinventory.RECORD_NAME:
+                self._result.workspaces.append(record['value'])
+            elif record['name'] == tracereporter.RECORD_NAME:
+                self._result.spans.append(record['value'])
+            elif record['name'] == testcache.RECORD_NAME:
+                self._result.inputs = record['value']
+            else:
+                self._result.addItem(resultItem(record['name'], record['value'], record.get('iteration')))
+        for item in self._capture.results:
+            self._result.addItem(item)
+        if echo:
+            self._capture.close()
                 
+    def printOutput(self):
+        '''Print the output of a test that was executed with echo turned off'''
+        if hasattr(self, '_start_msg'):
+            print self._start_msg
+        if hasattr(self, '_capture'):
+            self._capture.replay(sys.stdout)
+            self._capture.close()
+        if self.status == 'error':
+            print self._result.output
+
     def setOutputMsg(self, msg=None):
         if msg is not None:
             self._result.output = msg
@@ -727,6 +1780,54 @@ class TestSuite(object):
         for r in reporters:
             r.dispatchResults(self._result)
 
+#########################################################################
+# Benchmark of starting up a test process
+#########################################################################
+def benchmarkStartup(runner, count, reporters, timeout=None):
+    '''
+    Start count processes that only start up and import Mantid, see
+    importMantid(), with the runner, stopping any after timeout seconds. Each
+    phase of starting up is reported to the reporters as a benchmarked test named
+    Startup.<phase>, with 'total' for the whole life of the process, so that the
+    performance database keeps a series for each of them. The tests are not
+    needed, so a TestManager is not either, but the runner must know where Mantid
+    is, see PythonTestRunner.setMantidDir() and createCodePrefix().
+    '''
+    phases = {}
+    for i in range(count):
+        fd, metricsfile = tempfile.mkstemp(suffix='.metrics.jsonl')
+        os.close(fd)
+        options = {'metrics': metricsfile, 'spawnTime': time.time()}
+        pycode = 'import stresstesting;stresstesting.executeStartupInChild(%r)' % options
+        retcode, output, err = runner.start(pycode, timeout)
+        total = time.time() - options['spawnTime']
+        records = MetricsChannel.read(metricsfile)
+        os.remove(metricsfile)
+        if retcode == PythonTestRunner.TIMEOUT_CODE:
+            print "Starting up took more than %g seconds:\n%s" % (timeout, output)
+            continue
+        if retcode != PythonTestRunner.SUCCESS_CODE:
+            print "Starting up failed with exit code %d:\n%s" % (retcode, output)
+            continue
+        for record in records:
+            if record['name'].startswith(PHASE_PREFIX):
+                phases.setdefault(record['name'][len(PHASE_PREFIX):], []).append(record['value'])
+        phases.setdefault('total', []).append(total)
+
+    for phase, times in sorted(phases.iteritems()):
+        result = TestResult()
+        result.name = result.filename = 'Startup.' + phase
+        result.date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        result.status = 'success'
+        result.addItem(['test_name', result.name])
+        result.addItem(['status', result.status])
+        for iteration, value in enumerate(times):
+            result.addItem(resultItem('time_taken', value, iteration + 1))
+        for name, value in sorted(timingStatistics(times).iteritems()):
+            result.addItem(resultItem('time_' + name, value))
+        for reporter in reporters:
+            reporter.dispatchResults(result)
+
 #########################################################################
 # The main API class
 #########################################################################
@@ -736,8 +1837,57 @@ class TestManager(object):
     '''
 
     def __init__(self, test_loc, runner = PythonConsoleRunner(), output = [TextResultReporter()],
-                 testsInclude=None, testsExclude=None):
-        '''Initialize a class instance'''
+                 testsInclude=None, testsExclude=None, jobs=1, memoryLimitMB=None,
+                 staticDiscovery=True, discoveryIndex=None, timeout=None, historyDB=None,
+                 shard=None, logDir=None, testOptions=None, profileRegex=None, samplingHz=None,
+                 memoryInterval=None, dataDirs=None, dataIndexFile=None, resultCache=None,
+                 resultCacheExpiry=None, prefetchMB=None, prefetchTests=3):
+        '''Initialize a class instance.
+        With staticDiscovery the test modules are parsed rather than imported to find
+        the tests, see testdiscovery. The result is kept in the file discoveryIndex,
+        if given, so that unchanged modules are not parsed again.
+        timeout is the time, in seconds, after which a test is stopped unless the test
+        gives its own with MantidStressTest.timeoutSeconds(). None means no limit.
+        Either is multiplied by the 'soakIterations' of testOptions, if given.
+        historyDB is a performance database, see PerformanceMonitoring/sqlresults.py.
+        The runtimes recorded in it are used to start the longest tests first when
+        tests run in parallel, see testhistory.
+        shard is a tuple (i, N) to run only the i-th, counting from 1, of N shares of
+        the tests. The shares have roughly equal total runtime according to historyDB
+        and are the same on every machine given the same tests and database.
+        The whole output of each test is written to logDir/<test name>.log, if
+        given. Only the end of it is kept in memory for the reporters.
+        testOptions is a dictionary of settings passed to every test process, see
+        executeInChild(), e.g. {'benchmarkPrecision': 5.} to benchmark every test.
+        Tests whose names match profileRegex are run under cProfile, writing
+        <test name>.pstats and <test name>.collapsed.txt to logDir, see profiling.
+        With samplingHz every test samples its stack that many times a second and
+        writes the counts to <test name>.samples.txt in logDir, every few seconds so
+        that a test killed for taking too long leaves them too.
+        With memoryInterval the memory of each test is sampled that often, in
+        seconds, see TestSuite.execute().
+        jobs gives the number of tests that may run at the same time. When this is
+        more than 1 a test is only started when the memory it requires, see
+        MantidStressTest.requiredMemoryMB(), fits alongside the tests already running.
+        The memory shared out is memoryLimitMB, or the free memory at the start of the
+        run if this is not given.
+        Before a test is started the requirements it declares as constants, see
+        MantidStressTest.skipTests(), are checked and it is marked as skipped without
+        being run if they are not met. Its required files are looked for in dataDirs,
+        if given, see datafileindex. Leave this out when the files may be found
+        elsewhere, e.g. in the archive. The listings of the directories are kept in
+        dataIndexFile, if given, so that only the directories changed since the last
+        run are listed again, and the tests find their files through the same index,
+        see MantidStressTest.findDataFile().
+        With resultCache, a file, the passes of the tests are remembered and a test
+        is reported as 'cached-pass' rather than run if nothing it depends on, nor
+        the Mantid revision, has changed since it passed, see testcache. Passes older
+        than resultCacheExpiry seconds, if given, are not used.
+        With prefetchMB the data and reference files of the next prefetchTests tests
+        to be started, see scheduledDataFiles(), are read ahead into the page cache
+        while the tests before them run, up to prefetchMB of them, see prefetch.
+        The files are found through dataDirs, so this needs them too.
+        '''
 
         # Check whether the MANTIDPATH variable is set
         mtdheader_dir = os.getenv("MANTIDPATH")
@@ -752,6 +1902,12 @@ class TestManager(object):
         sys.path.append(os.path.abspath(mtdheader_dir).replace('\\','/'))
         runner.setMantidDir(mtdheader_dir)
 
+        if staticDiscovery:
+            import testdiscovery
+            self._discovery = testdiscovery.DiscoveryIndex(discoveryIndex)
+        else:
+            self._discovery = None
+
         # If given option is a directory
         if os.path.isdir(test_loc) == True:
             test_dir = os.path.abspath(test_loc).replace('\\','/')
@@ -765,7 +1921,13 @@ class TestManager(object):
             test_dir = os.path.abspath(os.path.dirname(test_loc)).replace('\\','/')
             sys.path.append(test_dir)
             runner.setTestDir(test_dir)
-            self._tests = self.loadTestsFromModule(os.path.basename(test_loc))
+            if self._discovery is not None:
+                self._discovery.update(test_dir)
+                self._tests = self.findTestsInModule(os.path.join(test_dir, os.path.basename(test_loc)))
+            else:
+                self._tests = self.loadTestsFromModule(os.path.basename(test_loc))
+        if self._discovery is not None:
+            self._discovery.save()
 
         if len(self._tests) == 0:
             print 'No tests defined in ' + test_dir + '. Please ensure all test classes sub class stresstesting.MantidStressTest.'
@@ -779,38 +1941,361 @@ class TestManager(object):
         self._testsInclude = testsInclude
         self._testsExclude = testsExclude
 
+        self._jobs = max(1, jobs)
+        self._memoryLimitMB = memoryLimitMB
+        self._timeout = timeout
+        self._logDir = logDir
+        self._testOptions = testOptions
+        if profileRegex is not None:
+            self._profileRegex = re.compile(profileRegex)
+        else:
+            self._profileRegex = None
+        self._samplingHz = samplingHz
+        self._memoryInterval = memoryInterval
+        if dataDirs is not None:
+            import datafileindex
+            self._dataFiles = datafileindex.DataFileIndex(dataDirs, dataIndexFile)
+            self._dataFiles.save()
+            self._dataIndexFile = dataIndexFile
+        else:
+            self._dataFiles = None
+        self._cache = None
+        if resultCache is not None:
+            import testcache
+            revision = testcache.mantidRevision(mtdheader_dir)
+            if revision is None:
+                print "Cannot get the Mantid revision from MantidPlot -r in '%s', all tests will be run" \
+                    % mtdheader_dir
+            else:
+                self._cache = testcache.TestCache(resultCache, revision, resultCacheExpiry, self._dataFiles)
+        self._cachedTests = 0
+        self._prefetchMB = prefetchMB
+        self._prefetchTests = prefetchTests
+        self._prefetcher = None
+        if logDir is not None and not os.path.isdir(logDir):
+            os.makedirs(logDir)
+
+        # Test name -> predicted runtime, in seconds
+        self._predicted = None
+        if historyDB is not None:
+            import testhistory
+            try:
+                runtimes = testhistory.loadRuntimes(historyDB)
+            except Exception, exc:
+                print "Failed to read the test runtimes from '%s': %s" % (historyDB, str(exc))
+            else:
+                self._predicted = testhistory.predictRuntimes([suite.name for suite in self._tests], runtimes)
+
+        if shard is not None:
+            self._tests = self.__selectShard(shard[0], shard[1])
+
         # Create a prefix to use when executing the code
         runner.createCodePrefix()
 
+    def __selectShard(self, index, count):
+        '''Returns the tests in the given shard, in their original order'''
+        import testhistory
+        if index < 1 or index > count:
+            raise ValueError("Shard %d does not exist when there are %d shards" % (index, count))
+        names = [suite.name for suite in self._tests]
+        predicted = self._predicted
+        if predicted is None:
+            predicted = testhistory.predictRuntimes(names, {})
+        # Tests that will not be run do not count towards the time of a shard
+        weights = {}
+        for suite in self._tests:
+            if self.__skipReason(suite) is None:
+                weights[suite.name] = predicted[suite.name]
+            else:
+                weights[suite.name] = 0.
+        selected = set(testhistory.shard(names, weights, count)[index - 1])
+        return [suite for suite in self._tests if suite.name in selected]
+
     totalTests = property(lambda self: len(self._tests))
     skippedTests = property(lambda self: (self.totalTests - self._passedTests - self._failedTests))
     passedTests = property(lambda self: self._passedTests)
+    # Counted as passed too
+    cachedTests = property(lambda self: self._cachedTests)
     failedTests = property(lambda self: self._failedTests)
 
-    def __shouldTest(self, suite):
+    def scheduledDataFiles(self, suites=None):
+        '''
+        The names of the data and reference files needed by the tests that will be
+        run, or by the given tests, in the order of the tests, as far as they are
+        known without running them. The tests that will be skipped by their known
+        requirements or not run because of a cached pass are left out.
+        '''
+        if suites is None:
+            suites = [suite for suite in self._tests if self.__skipReason(suite) is None
+                      and self.__preflightReason(suite) is None and self.__cachedPass(suite) is None]
+        names = []
+        seen = set()
+        for suite in suites:
+            for name in list(suite.requiredFiles or []) + list(suite.referenceFiles):
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        return names
+
+    def __skipReason(self, suite):
         if self._testsInclude is not None:
             if not self._testsInclude in suite.name:
-                suite.markAsSkipped("NotIncludedTest")
-                return False
+                return "NotIncludedTest"
         if self._testsExclude is not None:
             if self._testsExclude in suite.name:
-                suite.markAsSkipped("ExcludedTest")
-                return False
+                return "ExcludedTest"
+        return None
+
+    def __shouldTest(self, suite):
+        reason = self.__skipReason(suite)
+        if reason is not None:
+            suite.markAsSkipped(reason)
+            return False
         return True
 
+    def __preflight(self, suite):
+        '''
+        Check the requirements of the test that are known without starting it.
+        If they are not met it is marked as skipped with the message it would give
+        itself and False is returned.
+        '''
+        reason = self.__preflightReason(suite)
+        if reason is not None:
+            suite.markAsSkipped(reason)
+            return False
+        return True
+
+    def __preflightReason(self, suite):
+        '''The message the test would give if its known requirements are not met, else None'''
+        reason = None
+        if self._dataFiles is not None and suite.requiredFiles is not None:
+            missing = self._dataFiles.missing(suite.requiredFiles)
+            if len(missing) > 0:
+                reason = ''.join(["Missing required file: '%s'\n" % name for name in missing])
+        if reason is None and suite.requiredMemoryMB > 0:
+            available = availableMemoryMB()
+            if available is not None and available < suite.requiredMemoryMB:
+                reason = "Insufficient memory available to run test! %g MB available, need %g MB.\n" \
+                         % (available, suite.requiredMemoryMB)
+        if reason is None:
+            reason = staticSkipReason(suite.skipOnPlatforms, suite.requiredModules)
+            if reason is not None:
+                reason += '\n'
+        return reason
+
+    def __reportSuite(self, suite):
+        if self._cache is not None and suite.wallTime is not None:
+            if suite.status == "success" and suite.inputs is not None:
+                self._cache.record(suite.name, suite.inputs, self.__optionsFor(suite))
+            else:
+                self._cache.forget(suite.name)
+        if suite.status == "success":
+            self._passedTests += 1
+        elif suite.status == "cached-pass":
+            self._passedTests += 1
+            self._cachedTests += 1
+        elif suite.status == "skipped":
+            self._skippedTests += 1
+        else:
+            self._failedTests += 1
+        suite.reportResults(self._reporters)
+        self._lastTestRun += 1
+
+    def __timeoutFor(self, suite):
+        timeout = suite.timeoutSeconds
+        if timeout is None:
+            timeout = self._timeout
+        soak = (self._testOptions or {}).get('soakIterations')
+        if timeout is not None and soak:
+            # The test is run that many times in the one process
+            timeout *= soak
+        return timeout
+
+    def __logFor(self, suite):
+        if self._logDir is None:
+            return None
+        return os.path.join(self._logDir, suite.name + '.log')
+
+    def __optionsFor(self, suite):
+        options = dict(self._testOptions or {})
+        if self._profileRegex is not None and self._profileRegex.search(suite.name):
+            options['profile'] = os.path.join(self._logDir or os.getcwd(), suite.name)
+        if self._samplingHz:
+            options['samples'] = os.path.join(self._logDir or os.getcwd(), suite.name + '.samples.txt')
+            options['samplingHz'] = self._samplingHz
+        if self._dataFiles is not None:
+            options['dataDirs'] = self._dataFiles.directories
+            if self._dataIndexFile is not None:
+                options['dataFileIndex'] = self._dataIndexFile
+        if self._cache is not None:
+            options['recordInputs'] = True
+        return options
+
+    def __prefetch(self, upcoming):
+        '''Read ahead the files of the first of the upcoming tests, if prefetching'''
+        if self._prefetcher is None:
+            return
+        names = self.scheduledDataFiles(upcoming[:self._prefetchTests])
+        self._prefetcher.want([path for path in [self._dataFiles.find(name) for name in names]
+                               if path is not None])
+
+    def __cached(self, suite):
+        '''
+        If the test has passed before and nothing it depends on has changed it is
+        marked as a cached pass and True is returned
+        '''
+        passed = self.__cachedPass(suite)
+        if passed is None:
+            return False
+        suite.markAsCached(passed)
+        return True
+
+    def __cachedPass(self, suite):
+        '''The time of the pass of the test that still holds, see testcache, else None'''
+        if self._cache is None:
+            return None
+        return self._cache.lookup(suite.name, self.__optionsFor(suite))
+
     def executeTests(self):
-        # Get the defined tests
-        for suite in self._tests:
+        start = time.time()
+        if self._dataFiles is not None:
+            # Pick up files staged since, see MantidFrameworkConfig.stageDataFiles()
+            self._dataFiles.refresh()
+            self._dataFiles.save()
+        if self._prefetchMB and self._dataFiles is not None:
+            import prefetch
+            self._prefetcher = prefetch.Prefetcher(self._prefetchMB)
+            self._prefetcher.start()
+        try:
+            if self._jobs > 1:
+                self.__executeTestsInParallel()
+            else:
+                # Get the defined tests
+                for index, suite in enumerate(self._tests):
+                    self.__prefetch([later for later in self._tests[index + 1:]
+                                     if self.__skipReason(later) is None])
+                    if self.__shouldTest(suite) and self.__preflight(suite) and not self.__cached(suite):
+                        suite.execute(self._runner, timeout=self.__timeoutFor(suite), logfile=self.__logFor(suite),
+                                      options=self.__optionsFor(suite), memoryInterval=self._memoryInterval)
+                    self.__reportSuite(suite)
+        except:
+            # e.g. ^C
+            self._runner.killRunning()
+            raise
+        finally:
+            if self._cache is not None:
+                self._cache.save()
+            if self._prefetcher is not None:
+                self._prefetcher.stop()
+                print "Read ahead %d data files (%.1f MB)" % (self._prefetcher.files, self._prefetcher.megabytes)
+                self._prefetcher = None
+        if self._predicted is not None:
+            print "Predicted time to run the tests %.1f seconds, actual %.1f seconds" \
+                % (self.predictedMakespan(), time.time() - start)
+
+    def predictedMakespan(self):
+        '''
+        The time the tests that have been run were predicted to take from their
+        history, in the order they were started. None if there is no history.
+        '''
+        if self._predicted is None:
+            return None
+        import testhistory
+        indices = [index for index, suite in enumerate(self._tests) if suite.wallTime is not None]
+        if self._jobs > 1:
+            indices = self.__longestFirst(indices)
+        return testhistory.makespan([self._predicted[self._tests[index].name] for index in indices], self._jobs)
+
+    def __longestFirst(self, indices):
+        '''Sort the indices of tests by decreasing predicted runtime'''
+        return sorted(indices, key=lambda index: (-self._predicted[self._tests[index].name], index))
+
+    def __canStart(self, suite, running, memoryBudget):
+        '''Returns true if there is enough memory to start the test alongside those running'''
+        required = suite.requiredMemoryMB
+        if required <= 0 or len(running) == 0:
+            # The test checks the memory itself and skips if there is not enough
+            return True
+        if memoryBudget is not None and sum(running.values()) + required > memoryBudget:
+            return False
+        available = availableMemoryMB()
+        return available is None or required <= available
+
+    def __executeTestsInParallel(self):
+        '''
+        Run up to self._jobs tests at once, each in its own thread waiting on the
+        subprocess. The results are reported in the same order as the serial run.
+        '''
+        import threading
+        self._runner.setEchoOutput(False)
+        memoryBudget = self._memoryLimitMB
+        if memoryBudget is None:
+            memoryBudget = availableMemoryMB()
+
+        finished = set()
+        running = {} # index of the test -> memory reserved for it
+        waiting = []
+        for index, suite in enumerate(self._tests):
             if self.__shouldTest(suite):
-                suite.execute(self._runner)
-            if suite.status == "success":
-                self._passedTests += 1
-            elif suite.status == "skipped":
-                self._skippedTests += 1
+                waiting.append(index)
             else:
-                self._failedTests += 1
-            suite.reportResults(self._reporters)
-            self._lastTestRun += 1
+                finished.add(index)
+        if self._predicted is not None:
+            # Longest first, so that the run does not end with one long test on its own.
+            # The results are still reported in the original order.
+            waiting = self.__longestFirst(waiting)
+        condition = threading.Condition()
+
+        def runSuite(index):
+            suite = self._tests[index]
+            try:
+                suite.execute(self._runner, echo=False, timeout=self.__timeoutFor(suite),
+                              logfile=self.__logFor(suite), options=self.__optionsFor(suite),
+                              memoryInterval=self._memoryInterval)
+            except Exception:
+                # Raised in this thread it would be lost, leaving the test reported as skipped
+                import traceback
+                suite.markAsFailed("The test could not be run:\n" + traceback.format_exc())
+            finally:
+                condition.acquire()
+                del running[index]
+                finished.add(index)
+                condition.notify()
+                condition.release()
+
+        condition.acquire()
+        try:
+            while self._lastTestRun < len(self._tests):
+                # Report everything that has finished, in order
+                while self._lastTestRun in finished:
+                    suite = self._tests[self._lastTestRun]
+                    suite.printOutput()
+                    self.__reportSuite(suite)
+                    if self._lastTestRun == len(self._tests):
+                        return
+                # Start as many waiting tests as allowed
+                notRun = False
+                for index in waiting[:]:
+                    if len(running) >= self._jobs:
+                        break
+                    suite = self._tests[index]
+                    if not self.__canStart(suite, running, memoryBudget):
+                        continue
+                    waiting.remove(index)
+                    if not self.__preflight(suite) or self.__cached(suite):
+                        finished.add(index)
+                        notRun = True
+                        continue
+                    running[index] = max(0, suite.requiredMemoryMB)
+                    worker = threading.Thread(target=runSuite, args=(index,), name=suite.name)
+                    worker.daemon = True
+                    worker.start()
+                self.__prefetch([self._tests[index] for index in waiting])
+                if not notRun:
+                    # A timeout keeps the wait interruptible by ^C
+                    condition.wait(1.)
+        finally:
+            condition.release()
 
     def markSkipped(self, reason=None):
         for suite in self._tests[self._lastTestRun:]:
@@ -819,7 +2304,12 @@ class TestManager(object):
          
     def loadTestsFromDir(self, test_dir):
         ''' Load all of the tests defined in the given directory'''
-        entries = os.listdir(test_dir)
+        if self._discovery is not None:
+            tests = []
+            for modname in self._discovery.update(test_dir):
+                tests.extend(self.findTestsInModule(os.path.join(test_dir, modname + '.py')))
+            return tests
+        entries = sorted(os.listdir(test_dir))
         tests = []
         regex = re.compile('^.*\.py$', re.IGNORECASE)
         for file in entries:
@@ -827,6 +2317,27 @@ class TestManager(object):
                 tests.extend(self.loadTestsFromModule(os.path.join(test_dir,file)))
         return tests
 
+    def findTestsInModule(self, filename):
+        '''
+        Find the test classes in the given module by parsing it, without importing it
+        '''
+        modname = os.path.splitext(os.path.basename(filename))[0]
+        found = self._discovery.findTests(filename)
+        if found is None:
+            # Does not parse, add fake unnamed test so that an error will get
+            # generated when the tests are run and it will be counted properly
+            return [TestSuite(modname, None, filename)]
+        tests = []
+        for test_name, requirements in found:
+            memory = requirements.get('requiredMemoryMB', 0)
+            timeout = requirements.get('timeoutSeconds', None)
+            tests.append(TestSuite(modname, str(test_name), filename, memory, timeout,
+                                   requirements.get('requiredFiles', None),
+                                   requirements.get('skipOnPlatforms', ()),
+                                   requirements.get('requiredModules', ()),
+                                   referenceFiles(requirements.get('validate', None))))
+        return tests
+
     def loadTestsFromModule(self, filename):
         '''
         Load test classes from the given module object which has been
@@ -846,7 +2357,11 @@ class TestManager(object):
                     continue
                 if self.isValidTestClass(value):
                     test_name = key
-                    tests.append(TestSuite(modname, test_name, filename))
+                    memory = self.classRequirement(value, 'requiredMemoryMB', 0)
+                    timeout = self.classRequirement(value, 'timeoutSeconds', None)
+                    files = self.classRequirement(value, 'requiredFiles', None)
+                    tests.append(TestSuite(modname, test_name, filename, memory, timeout, files,
+                                           value.skipOnPlatforms, value.requiredModules))
         except Exception:
             # Error loading the source, add fake unnamed test so that an error
             # will get generated when the tests are run and it will be counted properly
@@ -870,13 +2385,24 @@ class TestManager(object):
         else:
             return True
 
+    def classRequirement(self, class_obj, method, default):
+        '''
+        Returns the value of a requirement method, e.g. requiredMemoryMB, without
+        calling the constructor of the test as this initializes Mantid. The default
+        is returned if the method needs anything set up by the constructor.
+        '''
+        try:
+            return getattr(object.__new__(class_obj), method)()
+        except Exception:
+            return default
+
 #########################################################################
 # Class to handle the environment
 #########################################################################
 class MantidFrameworkConfig:
 
     def __init__(self, mantidDir=None, sourceDir=None,
-                 loglevel='information', archivesearch=False):
+                 loglevel='information', archivesearch=False, stagingDir=None, stagingLimitMB=10240.):
         # force the environment variable
         if mantidDir is not None:
             if os.path.isfile(mantidDir):
@@ -911,6 +2437,12 @@ class MantidFrameworkConfig:
                 os.path.join(parentDir, "Data/PEARL"),
                 self.__saveDir
                 ]
+        # Local copies of the data files, searched first, see stageDataFiles()
+        self.__stagingDir = stagingDir
+        self.__stagingLimitMB = stagingLimitMB
+        if stagingDir is not None:
+            self.__stagingDir = os.path.abspath(stagingDir)
+            self.__dataDirs.insert(0, self.__stagingDir)
 
         # set the log level
         self.__loglevel = loglevel
@@ -967,6 +2499,7 @@ class MantidFrameworkConfig:
 
     saveDir = property(lambda self: self.__saveDir)
     testDir = property(lambda self: self.__testDir)
+    dataDirs = property(lambda self: self.__dataDirs)
 
     def config(self):
         if not os.path.exists(self.__saveDir):
@@ -975,6 +2508,8 @@ class MantidFrameworkConfig:
         else:
             if not os.path.isdir(self.__saveDir):
                 raise RuntimeError("%s is not a directory" % self.__saveDir)
+        if self.__stagingDir is not None and not os.path.isdir(self.__stagingDir):
+            os.makedirs(self.__stagingDir)
 
         # Start mantid
         import mantid
@@ -1018,11 +2553,40 @@ class MantidFrameworkConfig:
         # Save this configuration
         config.saveConfig(self.__userPropsFile)
 
+    def stageDataFiles(self, names):
+        '''
+        Copy the named data files to the staging directory, if there is one, so
+        that they are read from there, see datastaging. The files are found in
+        the other data directories. Those given first are staged first when they
+        do not all fit.
+        '''
+        if self.__stagingDir is None:
+            return
+        import datafileindex, datastaging
+        start = time.time()
+        sources = datafileindex.DataFileIndex(self.__dataDirs[1:])
+        paths = [path for path in [sources.find(name) for name in names] if path is not None]
+        cache = datastaging.StagingCache(self.__stagingDir, self.__stagingLimitMB)
+        copied, reused = cache.stage(paths)
+        print "Staged %d data files (%.1f MB) in %s in %.1f seconds, %d (%.1f MB) were already there" \
+            % (copied[0], copied[1], self.__stagingDir, time.time() - start, reused[0], reused[1])
+
     def restoreconfig(self):
         self.__moveFile(self.__userPropsFile, self.__userPropsFileSystest)
         self.__moveFile(self.__userPropsFileBackup, self.__userPropsFile)
 
 
+#==============================================================================
+def referenceFiles(validation):
+    '''
+    The names of the reference files in a value returned by
+    MantidStressTest.validate(), i.e. the second of each pair that has an extension
+    '''
+    if not isinstance(validation, (list, tuple)):
+        return ()
+    return [name for name in validation[1::2]
+            if isinstance(name, basestring) and os.path.splitext(name)[1] != '']
+
 #==============================================================================
 def envAsString():
     """Returns a string describing the environment
@@ -1036,3 +2600,25 @@ def envAsString():
     else:
         env = platform.dist()[0] + "-" + platform.dist()[1]
     return env
+
+#==============================================================================
+def availableMemoryMB():
+    """Returns the memory, in MB, that can be used by new processes
+    without swapping or None if this is unknown on this platform."""
+    try:
+        meminfo = open('/proc/meminfo', 'r')
+    except IOError:
+        return None
+    fields = {}
+    try:
+        for line in meminfo:
+            name, value = line.split(':', 1)
+            fields[name] = float(value.split()[0]) # in kB
+    finally:
+        meminfo.close()
+    if 'MemAvailable' in fields:
+        available = fields['MemAvailable']
+    else:
+        # Older kernels
+        available = fields.get('MemFree', 0.) + fields.get('Buffers', 0.) + fields.get('Cached', 0.)
+    return available/1024.
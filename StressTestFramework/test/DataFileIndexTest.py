@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import datafileindex
+
+class DataFileIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._first = os.path.join(self._dir, 'first')
+        self._second = os.path.join(self._dir, 'second')
+        os.mkdir(self._first)
+        os.mkdir(self._second)
+        self._indexFile = os.path.join(self._dir, 'index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _touch(self, directory, name):
+        path = os.path.join(directory, name)
+        open(path, 'w').close()
+        return path
+
+    def _index(self):
+        index = datafileindex.DataFileIndex([self._first, self._second], self._indexFile)
+        index.save()
+        return index
+
+    def test_names_are_found_without_regard_to_case(self):
+        path = self._touch(self._second, 'LOQ_Run.nxs')
+        index = self._index()
+        self.assertEqual(index.find('loq_run.NXS'), path)
+        self.assertEqual(index.find('other.nxs'), None)
+
+    def test_first_directory_wins(self):
+        first = self._touch(self._first, 'run.nxs')
+        self._touch(self._second, 'run.nxs')
+        self.assertEqual(self._index().find('run.nxs'), first)
+
+    def test_paths_are_found_as_they_are(self):
+        os.mkdir(os.path.join(self._second, 'sub'))
+        relative = self._touch(os.path.join(self._second, 'sub'), 'run.nxs')
+        absolute = self._touch(self._dir, 'elsewhere.nxs')
+        index = self._index()
+        self.assertEqual(index.find(os.path.join('sub', 'run.nxs')), relative)
+        self.assertEqual(index.find(absolute), absolute)
+        self.assertEqual(index.find(os.path.join(self._dir, 'gone.nxs')), None)
+
+    def test_names_without_an_extension_are_never_missing(self):
+        self._touch(self._first, 'present.nxs')
+        self.assertEqual(self._index().missing(['present.nxs', 'absent.nxs', 'LOQ12345']),
+                         ['absent.nxs'])
+
+    def test_unchanged_directory_is_not_listed_again(self):
+        self._touch(self._first, 'old.nxs')
+        past = time.time() - 100.
+        os.utime(self._first, (past, past))
+        self._index()
+        # Added without changing the modification time of the directory, so
+        # only seen if the directory is listed again
+        self._touch(self._first, 'new.nxs')
+        os.utime(self._first, (past, past))
+        self.assertEqual(self._index().find('new.nxs'), None)
+
+        os.utime(self._first, None)
+        self.assertNotEqual(self._index().find('new.nxs'), None)
+
+    def test_recently_modified_directory_is_listed_again(self):
+        self._touch(self._first, 'old.nxs')
+        mtime = os.stat(self._first).st_mtime
+        self._index()
+        # A file added within the resolution of the modification time
+        self._touch(self._first, 'new.nxs')
+        os.utime(self._first, (mtime, mtime))
+        self.assertNotEqual(self._index().find('new.nxs'), None)
+
+    def test_refresh_finds_files_added_since(self):
+        index = self._index()
+        self._touch(self._second, 'staged.nxs')
+        self.assertEqual(index.find('staged.nxs'), None)
+        index.refresh()
+        self.assertNotEqual(index.find('staged.nxs'), None)
+
+    def test_corrupt_index_is_rebuilt(self):
+        path = self._touch(self._first, 'run.nxs')
+        open(self._indexFile, 'w').write('{')
+        self.assertEqual(self._index().find('run.nxs'), path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import datastaging
+
+# The size of each data file, in bytes
+SIZE = 1024
+
+_MB = 1024. * 1024.
+
+class _Clock(object):
+    '''Stands in for the time module so that each call of stage() is a second later'''
+    def __init__(self):
+        self.now = 1000.
+
+    def time(self):
+        self.now += 1.
+        return self.now
+
+class DataStagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._sourceDir = os.path.join(self._dir, 'source')
+        self._stagingDir = os.path.join(self._dir, 'staging')
+        os.mkdir(self._sourceDir)
+        self._time = datastaging.time
+        datastaging.time = _Clock()
+
+    def tearDown(self):
+        datastaging.time = self._time
+        shutil.rmtree(self._dir)
+
+    def _source(self, name, content='x', size=SIZE):
+        path = os.path.join(self._sourceDir, name)
+        handle = open(path, 'wb')
+        handle.write(content * size)
+        handle.close()
+        return path
+
+    def _cache(self, files=2):
+        '''A cache with room for the given number of files and half of another'''
+        return datastaging.StagingCache(self._stagingDir, (files + 0.5) * SIZE / _MB)
+
+    def _staged(self, name):
+        return os.path.exists(os.path.join(self._stagingDir, name))
+
+    def test_files_are_copied_then_reused(self):
+        a = self._source('a.nxs')
+        b = self._source('b.nxs')
+        copied, reused = self._cache().stage([a, b])
+        self.assertEqual(copied, (2, 2 * SIZE / _MB))
+        self.assertEqual(reused, (0, 0.))
+        copy = os.path.join(self._stagingDir, 'a.nxs')
+        self.assertEqual(open(copy, 'rb').read(), open(a, 'rb').read())
+        # os.utime() keeps the time to the microsecond at best
+        self.assertAlmostEqual(os.stat(copy).st_mtime, os.stat(a).st_mtime, delta=1e-5)
+
+        copied, reused = self._cache().stage([a, b])
+        self.assertEqual(copied, (0, 0.))
+        self.assertEqual(reused, (2, 2 * SIZE / _MB))
+
+    def test_least_recently_used_file_is_evicted(self):
+        a = self._source('a.nxs')
+        b = self._source('b.nxs')
+        c = self._source('c.nxs')
+        cache = self._cache()
+        cache.stage([a])
+        cache.stage([b])
+        # a is now more recently used than b
+        cache.stage([a])
+        cache.stage([c])
+        self.assertTrue(self._staged('a.nxs'))
+        self.assertFalse(self._staged('b.nxs'))
+        self.assertTrue(self._staged('c.nxs'))
+
+    def test_files_staged_together_do_not_evict_each_other(self):
+        files = [self._source(name) for name in ('a.nxs', 'b.nxs', 'c.nxs')]
+        copied, reused = self._cache().stage(files)
+        self.assertEqual(copied[0], 2)
+        self.assertTrue(self._staged('a.nxs'))
+        self.assertTrue(self._staged('b.nxs'))
+        self.assertFalse(self._staged('c.nxs'))
+
+    def test_file_larger_than_the_limit_is_not_staged(self):
+        big = self._source('big.nxs', size=3 * SIZE)
+        copied, reused = self._cache().stage([big])
+        self.assertEqual(copied, (0, 0.))
+        self.assertFalse(self._staged('big.nxs'))
+
+    def test_only_the_first_file_of_a_name_is_staged(self):
+        a = self._source('a.nxs', 'x')
+        os.mkdir(os.path.join(self._sourceDir, 'other'))
+        other = os.path.join(self._sourceDir, 'other', 'a.nxs')
+        shutil.copy(a, other)
+        copied, reused = self._cache().stage([a, other])
+        self.assertEqual(copied[0], 1)
+
+    def test_corrupt_copy_is_copied_again(self):
+        a = self._source('a.nxs', 'x')
+        self._cache().stage([a])
+        # Same size, different content
+        handle = open(os.path.join(self._stagingDir, 'a.nxs'), 'wb')
+        handle.write('y' * SIZE)
+        handle.close()
+        copied, reused = self._cache().stage([a])
+        self.assertEqual(copied[0], 1)
+        self.assertEqual(reused[0], 0)
+        self.assertEqual(open(os.path.join(self._stagingDir, 'a.nxs'), 'rb').read(), 'x' * SIZE)
+
+    def test_copy_of_a_changed_source_is_removed(self):
+        a = self._source('a.nxs')
+        self._cache().stage([a])
+        self._source('a.nxs', size=SIZE / 2)
+        self._cache()
+        self.assertFalse(self._staged('a.nxs'))
+
+    def test_files_not_in_the_manifest_are_removed(self):
+        a = self._source('a.nxs')
+        self._cache().stage([a])
+        for name in ('stray.nxs', 'b.nxs.part'):
+            open(os.path.join(self._stagingDir, name), 'w').close()
+        self._cache()
+        self.assertTrue(self._staged('a.nxs'))
+        self.assertTrue(self._staged(datastaging.MANIFEST))
+        self.assertFalse(self._staged('stray.nxs'))
+        self.assertFalse(self._staged('b.nxs.part'))
+
+    def test_manifest_of_another_version_is_ignored(self):
+        a = self._source('a.nxs')
+        self._cache().stage([a])
+        manifest = os.path.join(self._stagingDir, datastaging.MANIFEST)
+        stored = json.load(open(manifest, 'r'))
+        stored['version'] = datastaging.MANIFEST_VERSION - 1
+        json.dump(stored, open(manifest, 'w'))
+        self._cache()
+        self.assertFalse(self._staged('a.nxs'))
+
+    def test_corrupt_manifest_is_started_again(self):
+        a = self._source('a.nxs')
+        self._cache().stage([a])
+        open(os.path.join(self._stagingDir, datastaging.MANIFEST), 'w').write('{')
+        copied, reused = self._cache().stage([a])
+        self.assertEqual(copied[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
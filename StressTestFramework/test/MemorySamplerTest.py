@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import signal
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import processusage
+
+class MemoryStatisticsTest(unittest.TestCase):
+
+    def test_peak_and_area(self):
+        timeline = [(0., 10., 5.), (1., 30., 15.), (3., 20., 10.)]
+        stats = processusage.memoryStatistics(timeline)
+        self.assertEqual(stats['peak_rss_mb'], 30.)
+        self.assertEqual(stats['peak_rss_time'], 1.)
+        # Trapezia of 20 and 50 MB s
+        self.assertAlmostEqual(stats['rss_mb_seconds'], 70.)
+        self.assertEqual(stats['peak_pss_mb'], 15.)
+        self.assertAlmostEqual(stats['pss_mb_seconds'], 35.)
+
+    def test_first_peak_is_taken(self):
+        stats = processusage.memoryStatistics([(0., 5., None), (1., 8., None), (2., 8., None)])
+        self.assertEqual(stats['peak_rss_time'], 1.)
+
+    def test_unknown_pss_is_left_out(self):
+        stats = processusage.memoryStatistics([(0., 10., None), (2., 10., None)])
+        self.assertAlmostEqual(stats['rss_mb_seconds'], 20.)
+        self.assertFalse('peak_pss_mb' in stats)
+
+    def test_single_sample_has_no_area(self):
+        stats = processusage.memoryStatistics([(0.5, 10., 4.)])
+        self.assertEqual(stats['peak_rss_mb'], 10.)
+        self.assertEqual(stats['rss_mb_seconds'], 0.)
+
+    def test_empty_timeline(self):
+        self.assertEqual(processusage.memoryStatistics([]), {})
+
+@unittest.skipUnless(os.path.isdir('/proc'), "Needs /proc")
+class MemorySamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        # A group of a shell and the two processes it starts
+        self._proc = subprocess.Popen('sleep 10 & sleep 10; wait', shell=True, preexec_fn=os.setsid)
+
+    def tearDown(self):
+        try:
+            os.killpg(self._proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self._proc.wait()
+
+    def _waitForGroup(self, count, timeout=5.):
+        end = time.time() + timeout
+        known = set()
+        while len(processusage.groupProcesses(self._proc.pid, known)) < count and time.time() < end:
+            time.sleep(0.01)
+        return known
+
+    def test_whole_group_is_found(self):
+        known = self._waitForGroup(3)
+        self.assertEqual(len(known), 3)
+        self.assertTrue(self._proc.pid in known)
+
+    def test_memory_of_the_group(self):
+        self._waitForGroup(3)
+        rss, pss = processusage.groupMemoryMB(self._proc.pid)
+        self.assertTrue(rss > 0)
+        if pss is not None:
+            self.assertTrue(0 < pss <= rss)
+
+    def test_sampler_records_until_stopped(self):
+        self._waitForGroup(3)
+        sampler = processusage.MemorySampler(self._proc.pid, 0.01)
+        time.sleep(0.2)
+        timeline = sampler.stop()
+        self.assertTrue(len(timeline) > 2)
+        self.assertEqual(timeline, sorted(timeline))
+        self.assertTrue(all([sample[1] > 0 for sample in timeline]))
+        count = len(timeline)
+        time.sleep(0.05)
+        self.assertEqual(len(sampler.timeline), count)
+
+    def test_sampler_of_a_finished_group_records_nothing(self):
+        os.killpg(self._proc.pid, signal.SIGKILL)
+        self._proc.wait()
+        sampler = processusage.MemorySampler(self._proc.pid, 0.01)
+        time.sleep(0.05)
+        self.assertEqual(sampler.stop(), [])
+
+if __name__ == '__main__':
+    unittest.main()
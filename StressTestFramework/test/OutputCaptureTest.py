@@ -0,0 +1,76 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+
+class OutputCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_short_output_is_kept_whole(self):
+        capture = stresstesting.OutputCapture(tailSize=100)
+        capture.write('first\n')
+        capture.write('second\n')
+        self.assertEqual(capture.tail(), 'first\nsecond\n')
+        self.assertEqual(capture.size, 13)
+
+    def test_only_the_last_lines_are_kept(self):
+        capture = stresstesting.OutputCapture(tailSize=10)
+        for line in ('aaaa\n', 'bbbb\n', 'cccc\n'):
+            capture.write(line)
+        self.assertEqual(capture.tail(), '[5 bytes of output omitted]\nbbbb\ncccc\n')
+
+    def test_long_line_is_cut_to_its_end(self):
+        capture = stresstesting.OutputCapture(tailSize=4)
+        capture.write('abcdefgh\n')
+        self.assertEqual(capture.tail(), '[5 bytes of output omitted]\nfgh\n')
+
+    def test_omitted_output_points_at_the_log(self):
+        logfile = os.path.join(self._dir, 'test.log')
+        capture = stresstesting.OutputCapture(logfile, tailSize=5)
+        capture.write('aaaa\n')
+        capture.write('bbbb\n')
+        self.assertEqual(capture.tail(), '[5 bytes of output omitted, see %s]\nbbbb\n' % logfile)
+        capture.close()
+        self.assertEqual(open(logfile, 'r').read(), 'aaaa\nbbbb\n')
+
+    def test_replay_writes_the_whole_spooled_output(self):
+        capture = stresstesting.OutputCapture(spool=True, tailSize=5)
+        capture.write('aaaa\n')
+        capture.write('bbbb\n')
+        stream = StringIO.StringIO()
+        capture.replay(stream)
+        self.assertEqual(stream.getvalue(), 'aaaa\nbbbb\n')
+        # More output can follow a replay
+        capture.write('cccc\n')
+        stream = StringIO.StringIO()
+        capture.replay(stream)
+        self.assertEqual(stream.getvalue(), 'aaaa\nbbbb\ncccc\n')
+        capture.close()
+
+    def test_replay_without_a_log_writes_the_tail(self):
+        capture = stresstesting.OutputCapture(tailSize=5)
+        capture.write('aaaa\n')
+        capture.write('bbbb\n')
+        stream = StringIO.StringIO()
+        capture.replay(stream)
+        self.assertEqual(stream.getvalue(), capture.tail())
+
+    def test_result_lines_are_picked_out(self):
+        capture = stresstesting.OutputCapture(tailSize=5)
+        capture.write('RESULT|time_taken|1.5\n')
+        capture.write('RESULTS are in\n')
+        capture.write('RESULT|memory|2\r\n')
+        self.assertEqual(capture.results, [['time_taken', '1.5'], ['memory', '2']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+
+TESTS = '''
+import stresstesting
+
+class BigOne(stresstesting.MantidStressTest):
+    def requiredMemoryMB(self):
+        return 6
+
+class BigTwo(stresstesting.MantidStressTest):
+    def requiredMemoryMB(self):
+        return 6
+
+class Small(stresstesting.MantidStressTest):
+    def requiredMemoryMB(self):
+        return 2
+'''
+
+class _Runner(stresstesting.PythonTestRunner):
+    '''Pretends to run each test for a while, recording which tests ran at the same time'''
+
+    def __init__(self, failing=()):
+        stresstesting.PythonTestRunner.__init__(self)
+        self.started = []
+        self.together = []
+        self._running = set()
+        self._failing = failing
+        self._lock = threading.Lock()
+
+    def start(self, pycode, timeout=None, capture=None):
+        name = re.search(r"executeInChild\('\w+', '(\w+)'", pycode).group(1)
+        self._lock.acquire()
+        self.started.append(name)
+        self._running.add(name)
+        self.together.append(set(self._running))
+        self._lock.release()
+        time.sleep(0.1)
+        self._lock.acquire()
+        self._running.discard(name)
+        self._lock.release()
+        if name in self._failing:
+            raise OSError("cannot start %s" % name)
+        return stresstesting.PythonTestRunner.SUCCESS_CODE, '', ''
+
+class _Reporter(stresstesting.ResultReporter):
+    def __init__(self):
+        stresstesting.ResultReporter.__init__(self)
+        self.results = []
+
+    def dispatchResults(self, result):
+        self.results.append((result.name, result.status, result.output))
+
+class ParallelSchedulingTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._testDir = os.path.join(self._dir, 'tests')
+        os.mkdir(self._testDir)
+        open(os.path.join(self._testDir, 'MemoryTests.py'), 'w').write(TESTS)
+        self._mantidPath = os.environ.get('MANTIDPATH')
+        os.environ['MANTIDPATH'] = self._dir
+        self._stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+        if self._mantidPath is None:
+            del os.environ['MANTIDPATH']
+        else:
+            os.environ['MANTIDPATH'] = self._mantidPath
+        shutil.rmtree(self._dir)
+
+    def _run(self, runner, predicted=None, **kwargs):
+        reporter = _Reporter()
+        manager = stresstesting.TestManager(self._testDir, runner=runner, output=[reporter], **kwargs)
+        if predicted is not None:
+            manager._predicted = predicted
+        manager.executeTests()
+        return reporter.results
+
+    def test_tests_only_run_together_when_their_memory_fits(self):
+        runner = _Runner()
+        results = self._run(runner, jobs=3, memoryLimitMB=10)
+        self.assertEqual([status for name, status, output in results], ['success'] * 3)
+        for together in runner.together:
+            self.assertFalse(set(['BigOne', 'BigTwo']) <= together)
+        # The small test fits alongside a big one rather than waiting for it
+        self.assertTrue(set(['BigOne', 'Small']) in runner.together)
+
+    def test_longest_tests_are_started_first(self):
+        runner = _Runner()
+        predicted = {'MemoryTests.BigOne': 1., 'MemoryTests.BigTwo': 5., 'MemoryTests.Small': 3.}
+        results = self._run(runner, predicted, jobs=2, memoryLimitMB=100)
+        self.assertEqual(runner.started, ['BigTwo', 'Small', 'BigOne'])
+        # Reported in the original order all the same
+        self.assertEqual([name for name, status, output in results],
+                         ['MemoryTests.BigOne', 'MemoryTests.BigTwo', 'MemoryTests.Small'])
+
+    def test_test_that_cannot_be_run_is_reported_as_failed(self):
+        results = self._run(_Runner(failing=['BigTwo']), jobs=2, memoryLimitMB=100)
+        statuses = dict([(name, (status, output)) for name, status, output in results])
+        self.assertEqual(statuses['MemoryTests.BigOne'][0], 'success')
+        self.assertEqual(statuses['MemoryTests.Small'][0], 'success')
+        status, output = statuses['MemoryTests.BigTwo']
+        self.assertEqual(status, 'error')
+        self.assertTrue('OSError: cannot start BigTwo' in output)
+
+if __name__ == '__main__':
+    unittest.main()
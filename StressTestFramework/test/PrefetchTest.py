@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import prefetch
+
+# The size of each data file, in bytes
+SIZE = 1024
+
+_MB = 1024. * 1024.
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._prefetcher = None
+
+    def tearDown(self):
+        if self._prefetcher is not None and self._prefetcher.is_alive():
+            self._prefetcher.stop()
+            self._prefetcher.join()
+        shutil.rmtree(self._dir)
+
+    def _file(self, name, size=SIZE):
+        path = os.path.join(self._dir, name)
+        handle = open(path, 'wb')
+        handle.write('x' * size)
+        handle.close()
+        return path
+
+    def _window(self, paths, files=2):
+        '''The window of a prefetcher with room for the given number of files and half of another'''
+        prefetcher = prefetch.Prefetcher((files + 0.5) * SIZE / _MB)
+        return prefetcher._Prefetcher__window(paths)
+
+    def _waitForFiles(self, count, timeout=5.):
+        end = time.time() + timeout
+        while self._prefetcher.files < count and time.time() < end:
+            time.sleep(0.01)
+        return self._prefetcher.files
+
+    def test_window_is_the_leading_files_that_fit(self):
+        a, b, c = [self._file(name) for name in ('a.nxs', 'b.nxs', 'c.nxs')]
+        self.assertEqual(self._window([a, b, c]), [(a, SIZE), (b, SIZE)])
+
+    def test_window_stops_at_the_first_file_that_does_not_fit(self):
+        big = self._file('big.nxs', 3 * SIZE)
+        small = self._file('small.nxs')
+        self.assertEqual(self._window([big, small]), [])
+
+    def test_window_skips_repeated_and_missing_files(self):
+        a, b = self._file('a.nxs'), self._file('b.nxs')
+        missing = os.path.join(self._dir, 'missing.nxs')
+        self.assertEqual(self._window([a, missing, a, b]), [(a, SIZE), (b, SIZE)])
+
+    def test_wanted_files_are_read(self):
+        paths = [self._file(name) for name in ('a.nxs', 'b.nxs')]
+        self._prefetcher = prefetch.Prefetcher(1.)
+        self._prefetcher.start()
+        self._prefetcher.want(paths)
+        self.assertEqual(self._waitForFiles(2), 2)
+        self.assertAlmostEqual(self._prefetcher.megabytes, 2 * SIZE / _MB)
+
+    def test_files_are_read_without_fadvise(self):
+        paths = [self._file(name) for name in ('a.nxs', 'b.nxs')]
+        self._prefetcher = prefetch.Prefetcher(1.)
+        self._prefetcher._fadvise = None
+        self._prefetcher.start()
+        self._prefetcher.want(paths)
+        self.assertEqual(self._waitForFiles(2), 2)
+
+    def test_files_already_read_are_not_read_again(self):
+        paths = [self._file(name) for name in ('a.nxs', 'b.nxs')]
+        self._prefetcher = prefetch.Prefetcher(1.)
+        self._prefetcher.start()
+        self._prefetcher.want(paths)
+        self._waitForFiles(2)
+        self._prefetcher.want(paths)
+        self._prefetcher.want(paths[1:] + [self._file('c.nxs')])
+        self.assertEqual(self._waitForFiles(3), 3)
+        time.sleep(0.1)
+        self.assertEqual(self._prefetcher.files, 3)
+
+    def test_stop_ends_the_thread(self):
+        self._prefetcher = prefetch.Prefetcher(1.)
+        self._prefetcher.start()
+        self._prefetcher.stop()
+        self._prefetcher.join(5.)
+        self.assertFalse(self._prefetcher.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import profiling
+
+MAIN = ('/tests/mod.py', 1, 'main')
+A = ('/tests/mod.py', 10, 'a')
+B = ('/tests/mod.py', 20, 'b')
+C = ('/tests/mod.py', 30, 'c')
+
+def _busy():
+    total = 0
+    for i in range(100000):
+        total += i
+    return total
+
+class CollapsedStacksTest(unittest.TestCase):
+
+    def _labels(self, *funcs):
+        return tuple([profiling.functionLabel(func) for func in funcs])
+
+    def test_function_label(self):
+        self.assertEqual(profiling.functionLabel(MAIN), 'mod.py:1(main)')
+        self.assertEqual(profiling.functionLabel(('~', 0, "<method 'a b' of 'x;y'>")), "<method_'a_b'_of_'x:y'>")
+
+    def test_time_of_a_shared_function_is_split_between_its_callers(self):
+        # main calls a and b, which both call c: b spends twice as long in c as a
+        stats = {MAIN: (1, 1, 1., 10., {}),
+                 A: (1, 1, 3., 4., {MAIN: (1, 1, 3., 4.)}),
+                 B: (1, 1, 3., 5., {MAIN: (1, 1, 3., 5.)}),
+                 C: (3, 3, 3., 3., {A: (1, 1, 1., 1.), B: (2, 2, 2., 2.)})}
+        stacks = profiling.collapsedStacks(stats)
+        expected = {self._labels(MAIN): 1.,
+                    self._labels(MAIN, A): 3.,
+                    self._labels(MAIN, A, C): 1.,
+                    self._labels(MAIN, B): 3.,
+                    self._labels(MAIN, B, C): 2.}
+        self.assertEqual(sorted(stacks.keys()), sorted(expected.keys()))
+        for stack, seconds in expected.iteritems():
+            self.assertAlmostEqual(stacks[stack], seconds)
+        # All of the time is accounted for
+        self.assertAlmostEqual(sum(stacks.values()), 10.)
+
+    def test_recursion_is_cut(self):
+        stats = {MAIN: (1, 1, 0., 2., {}),
+                 A: (1, 5, 2., 2., {MAIN: (1, 1, 2., 2.), A: (4, 4, 1., 1.)})}
+        stacks = profiling.collapsedStacks(stats)
+        self.assertEqual(stacks, {self._labels(MAIN, A): 2.})
+
+    def test_short_stacks_are_left_out(self):
+        stats = {MAIN: (1, 1, 1., 1.001, {}),
+                 A: (1, 1, 0.001, 0.001, {MAIN: (1, 1, 0.001, 0.001)})}
+        stacks = profiling.collapsedStacks(stats, minTime=0.01)
+        self.assertEqual(stacks, {self._labels(MAIN): 1.})
+
+class WriteProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_profile_is_written(self):
+        basename = os.path.join(self._dir, 'SomeTest')
+        profiler = profiling.startProfile()
+        _busy()
+        profiling.writeProfile(profiler, basename)
+        self.assertTrue(os.path.exists(basename + '.pstats'))
+        lines = open(basename + '.collapsed.txt', 'r').read().splitlines()
+        busy = [line for line in lines if line.split(' ')[0].endswith('(_busy)')]
+        self.assertEqual(len(busy), 1)
+        self.assertTrue(int(busy[0].split(' ')[1]) > 0)
+
+    def test_write_collapsed(self):
+        filename = os.path.join(self._dir, 'stacks.txt')
+        profiling.writeCollapsed({('main', 'a'): 0.0024, ('main',): 0.001, ('main', 'b'): 1e-7},
+                                 filename, 1e3)
+        self.assertEqual(open(filename, 'r').read(), 'main 1\nmain;a 2\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+
+try:
+    import mantid
+    HAVE_MANTID = True
+except ImportError:
+    HAVE_MANTID = False
+
+TESTS = '''
+import stresstesting
+from mantid.simpleapi import CreateWorkspace
+
+class SoakedValidationTest(stresstesting.MantidStressTest):
+    def runTest(self):
+        CreateWorkspace(DataX=[0., 1.], DataY=[1.], OutputWorkspace='result')
+        CreateWorkspace(DataX=[0., 1.], DataY=[1.], OutputWorkspace='expected')
+
+    def validateMethod(self):
+        return 'WorkspaceToWorkspace'
+
+    def validate(self):
+        return ('result', 'expected')
+
+class SoakedMismatchTest(SoakedValidationTest):
+    def runTest(self):
+        CreateWorkspace(DataX=[0., 1.], DataY=[1.], OutputWorkspace='result')
+        CreateWorkspace(DataX=[0., 1.], DataY=[2.], OutputWorkspace='expected')
+'''
+
+class _Reporter(stresstesting.ResultReporter):
+    def __init__(self):
+        stresstesting.ResultReporter.__init__(self)
+        self.results = {}
+
+    def dispatchResults(self, result):
+        self.results[result.name] = result
+
+class TrendSlopeTest(unittest.TestCase):
+
+    def test_slope_of_a_line(self):
+        self.assertAlmostEqual(stresstesting.trendSlope([1., 3., 5., 7.]), 2.)
+        self.assertAlmostEqual(stresstesting.trendSlope([4., 3., 2.]), -1.)
+
+    def test_outliers_do_not_move_the_slope(self):
+        # A slow first run and a spike
+        self.assertAlmostEqual(stresstesting.trendSlope([50., 10., 10., 30., 10., 10.]), 0.)
+        self.assertAlmostEqual(stresstesting.trendSlope([100., 1., 2., 3., 4., 5., 6.]), 1.)
+
+    def test_too_few_values(self):
+        self.assertEqual(stresstesting.trendSlope([]), 0.)
+        self.assertEqual(stresstesting.trendSlope([5.]), 0.)
+
+@unittest.skipUnless(HAVE_MANTID, "Needs Mantid")
+class SoakTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._testDir = os.path.join(self._dir, 'tests')
+        os.mkdir(self._testDir)
+        open(os.path.join(self._testDir, 'SoakedTests.py'), 'w').write(TESTS)
+        self._mantidPath = os.environ.get('MANTIDPATH')
+        os.environ['MANTIDPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(mantid.__file__)))
+        self._stdout = sys.stdout
+        # The runner looks for the framework on sys.path, where the test directory also matches
+        self._pythonPath = os.environ.get('PYTHONPATH')
+        framework = os.path.dirname(os.path.abspath(stresstesting.__file__))
+        os.environ['PYTHONPATH'] = os.pathsep.join([framework] + filter(None, [self._pythonPath]))
+        # A failed validation saves the workspace to the working directory
+        self._cwd = os.getcwd()
+        os.chdir(self._dir)
+        sys.stdout = StringIO.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+        os.chdir(self._cwd)
+        for name, value in (('MANTIDPATH', self._mantidPath), ('PYTHONPATH', self._pythonPath)):
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self._dir)
+
+    def _soak(self, count):
+        reporter = _Reporter()
+        # Limits no run can reach, so that only validation decides
+        options = {'soakIterations': count, 'soakTimeSlope': 1e6, 'soakMemorySlope': 1e6}
+        manager = stresstesting.TestManager(self._testDir, output=[reporter], testOptions=options,
+                                            logDir=self._dir)
+        manager.executeTests()
+        return reporter.results
+
+    def test_workspaces_of_the_last_run_are_validated(self):
+        results = self._soak(3)
+        result = results['SoakedTests.SoakedValidationTest']
+        self.assertEqual(result.status, 'success')
+        memory = [record for record in result.metrics if record['name'] == 'soak_memory']
+        # One point for each run
+        self.assertEqual([record['iteration'] for record in memory], [1, 2, 3])
+        self.assertEqual(len([record for record in result.metrics if record['name'] == 'soak_memory_slope']), 1)
+        self.assertEqual(results['SoakedTests.SoakedMismatchTest'].status, 'failed validation')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import testcache
+import datafileindex
+
+OPTIONS = {'benchmarkPrecision': 5.}
+
+class _Version(object):
+    '''Stands in for the sys module with another Python version'''
+    version = '0.0.0 (other)'
+
+class TestCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._module = self._write('SomeTest.py', 'class SomeTest(object): pass\n')
+        self._data = self._write('run.nxs', 'x' * 100)
+        self._cacheFile = os.path.join(self._dir, 'cache.json')
+        self._inputs = {'modules': [self._module], 'files': {'run.nxs': self._data}}
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _write(self, name, content, directory=None):
+        path = os.path.join(directory or self._dir, name)
+        handle = open(path, 'w')
+        handle.write(content)
+        handle.close()
+        return path
+
+    def _cache(self, revision='r1', expirySeconds=None, dataFiles=None):
+        return testcache.TestCache(self._cacheFile, revision, expirySeconds, dataFiles)
+
+    def _fingerprint(self, options=OPTIONS, revision='r1'):
+        return self._cache(revision).fingerprint(self._inputs, options)
+
+    def test_pass_is_remembered_between_runs(self):
+        cache = self._cache()
+        cache.record('SomeTest', self._inputs, OPTIONS)
+        cache.save()
+        self.assertNotEqual(self._cache().lookup('SomeTest', OPTIONS), None)
+        self.assertEqual(self._cache().lookup('OtherTest', OPTIONS), None)
+
+    def test_forgotten_pass_is_not_used(self):
+        cache = self._cache()
+        cache.record('SomeTest', self._inputs, OPTIONS)
+        cache.forget('SomeTest')
+        cache.save()
+        self.assertEqual(self._cache().lookup('SomeTest', OPTIONS), None)
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(self._fingerprint(), self._fingerprint())
+
+    def test_fingerprint_changes_with_the_test_source(self):
+        before = self._fingerprint()
+        self._write('SomeTest.py', 'class SomeTest(object): x = 1\n')
+        self.assertNotEqual(self._fingerprint(), before)
+
+    def test_fingerprint_changes_with_a_data_file(self):
+        before = self._fingerprint()
+        self._write('run.nxs', 'x' * 101)
+        self.assertNotEqual(self._fingerprint(), before)
+
+    def test_fingerprint_changes_with_the_options_and_revision(self):
+        before = self._fingerprint()
+        self.assertNotEqual(self._fingerprint(options={}), before)
+        self.assertNotEqual(self._fingerprint(revision='r2'), before)
+
+    def test_fingerprint_changes_with_the_framework(self):
+        before = self._fingerprint()
+        frameworkHash = testcache._frameworkHash
+        testcache._frameworkHash = lambda: 'changed'
+        try:
+            self.assertNotEqual(self._fingerprint(), before)
+        finally:
+            testcache._frameworkHash = frameworkHash
+
+    def test_fingerprint_changes_with_the_python_version(self):
+        before = self._fingerprint()
+        testcache.sys = _Version()
+        try:
+            self.assertNotEqual(self._fingerprint(), before)
+        finally:
+            testcache.sys = sys
+
+    def test_missing_input_gives_no_fingerprint(self):
+        os.remove(self._data)
+        self.assertEqual(self._fingerprint(), None)
+        cache = self._cache()
+        cache.record('SomeTest', self._inputs, OPTIONS)
+        self.assertEqual(cache.lookup('SomeTest', OPTIONS), None)
+
+    def test_expired_pass_is_not_used(self):
+        cache = self._cache()
+        cache.record('SomeTest', self._inputs, OPTIONS)
+        cache.save()
+        stored = json.load(open(self._cacheFile, 'r'))
+        stored['tests']['SomeTest']['time'] -= 120.
+        json.dump(stored, open(self._cacheFile, 'w'))
+        self.assertEqual(self._cache(expirySeconds=60.).lookup('SomeTest', OPTIONS), None)
+        self.assertNotEqual(self._cache(expirySeconds=600.).lookup('SomeTest', OPTIONS), None)
+
+    def test_cache_of_another_version_is_ignored(self):
+        cache = self._cache()
+        cache.record('SomeTest', self._inputs, OPTIONS)
+        cache.save()
+        stored = json.load(open(self._cacheFile, 'r'))
+        stored['version'] = testcache.CACHE_VERSION - 1
+        json.dump(stored, open(self._cacheFile, 'w'))
+        self.assertEqual(self._cache().lookup('SomeTest', OPTIONS), None)
+
+    def test_staged_copy_keeps_the_fingerprint(self):
+        staging = os.path.join(self._dir, 'staging')
+        os.mkdir(staging)
+        index = datafileindex.DataFileIndex([staging, self._dir])
+        before = self._cache(dataFiles=index).fingerprint(self._inputs, OPTIONS)
+        # As datastaging copies it, keeping the modification time
+        shutil.copy2(self._data, staging)
+        index.refresh()
+        self.assertEqual(index.find('run.nxs'), os.path.join(staging, 'run.nxs'))
+        self.assertEqual(self._cache(dataFiles=index).fingerprint(self._inputs, OPTIONS), before)
+
+    def test_file_earlier_in_the_search_path_is_noticed(self):
+        staging = os.path.join(self._dir, 'staging')
+        os.mkdir(staging)
+        index = datafileindex.DataFileIndex([staging, self._dir])
+        before = self._cache(dataFiles=index).fingerprint(self._inputs, OPTIONS)
+        self._write('run.nxs', 'y' * 50, staging)
+        index.refresh()
+        self.assertNotEqual(self._cache(dataFiles=index).fingerprint(self._inputs, OPTIONS), before)
+
+if __name__ == '__main__':
+    unittest.main()
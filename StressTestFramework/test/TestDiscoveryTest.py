@@ -0,0 +1,127 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import testdiscovery
+
+BASES = '''
+import stresstesting
+from abc import ABCMeta, abstractmethod
+
+class CommonTest(stresstesting.MantidStressTest):
+    def requiredMemoryMB(self):
+        return 2 * 1024
+
+class AbstractTest(stresstesting.MantidStressTest):
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def runTest(self):
+        pass
+'''
+
+TESTS = '''
+import stresstesting
+import Bases
+from Bases import AbstractTest
+
+class Helper(object):
+    pass
+
+class InheritedTest(Bases.CommonTest):
+    def timeoutSeconds(self):
+        return 60
+
+class ImplementedTest(AbstractTest):
+    skipOnPlatforms = ['darwin']
+    requiredModules = ('genxmlif', 'minixsv')
+
+    def runTest(self):
+        pass
+
+class StillAbstractTest(AbstractTest):
+    pass
+
+class DynamicTest(Bases.CommonTest):
+    def requiredMemoryMB(self):
+        return self.size * 2
+
+class ScaledTest(stresstesting.MantidStressTest):
+    def requiredFiles(self):
+        """Two runs"""
+        return ['RUN%d.nxs' % 1, 'RUN2.nxs']
+
+    def timeoutSeconds(self):
+        return 10 * 60
+'''
+
+class TestDiscoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._write('Bases.py', BASES)
+        self._write('Tests.py', TESTS)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _write(self, name, content):
+        handle = open(os.path.join(self._dir, name), 'w')
+        handle.write(content)
+        handle.close()
+
+    def _tests(self, modname='Tests', index=None):
+        if index is None:
+            index = testdiscovery.DiscoveryIndex()
+        index.update(self._dir)
+        return dict(index.findTests(os.path.join(self._dir, modname + '.py')))
+
+    def test_tests_are_found_through_bases_in_other_modules(self):
+        tests = self._tests()
+        self.assertEqual(sorted(tests.keys()), ['DynamicTest', 'ImplementedTest', 'InheritedTest', 'ScaledTest'])
+
+    def test_abstract_classes_are_not_tests(self):
+        self.assertEqual(sorted(self._tests('Bases').keys()), ['CommonTest'])
+
+    def test_constant_requirements_are_recorded(self):
+        tests = self._tests()
+        self.assertEqual(tests['InheritedTest'], {'requiredMemoryMB': 2048, 'timeoutSeconds': 60})
+        self.assertEqual(tests['ImplementedTest'], {'skipOnPlatforms': ['darwin'],
+                                                    'requiredModules': ['genxmlif', 'minixsv']})
+
+    def test_requirement_that_is_not_a_constant_is_dropped(self):
+        tests = self._tests()
+        # Overrides the constant of its base
+        self.assertEqual(tests['DynamicTest'], {})
+        self.assertEqual(tests['ScaledTest'], {'timeoutSeconds': 600})
+
+    def test_module_that_does_not_parse_gives_none(self):
+        self._write('Broken.py', 'class (:\n')
+        index = testdiscovery.DiscoveryIndex()
+        index.update(self._dir)
+        self.assertEqual(index.findTests(os.path.join(self._dir, 'Broken.py')), None)
+
+    def test_index_is_saved_and_reused(self):
+        filename = os.path.join(self._dir, 'index.json')
+        index = testdiscovery.DiscoveryIndex(filename)
+        tests = self._tests(index=index)
+        index.save()
+        # The stored parse is used while the module is unchanged
+        parse = testdiscovery.parseModule
+        testdiscovery.parseModule = None
+        try:
+            self.assertEqual(self._tests(index=testdiscovery.DiscoveryIndex(filename)), tests)
+        finally:
+            testdiscovery.parseModule = parse
+
+    def test_constant_value(self):
+        value = testdiscovery.constantValue(testdiscovery.ast.parse('-2 * 1024 + 1', mode='eval').body)
+        self.assertEqual(value, -2047)
+        self.assertRaises(ValueError, testdiscovery.constantValue,
+                          testdiscovery.ast.parse('size * 2', mode='eval').body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PerformanceMonitoring'))
+import testhistory
+import sqlresults
+
+class TestHistoryTest(unittest.TestCase):
+
+    def test_median(self):
+        self.assertEqual(testhistory.median([3., 1., 2.]), 2.)
+        self.assertEqual(testhistory.median([4., 1., 2., 3.]), 2.5)
+
+    def test_tests_without_history_are_predicted_the_median(self):
+        predicted = testhistory.predictRuntimes(['a', 'b', 'c', 'new'], {'a': 10., 'b': 20., 'c': 90.})
+        self.assertEqual(predicted, {'a': 10., 'b': 20., 'c': 90., 'new': 20.})
+
+    def test_default_estimate_without_any_history(self):
+        predicted = testhistory.predictRuntimes(['a', 'b'], {'other': 5.})
+        self.assertEqual(predicted, {'a': testhistory.DEFAULT_ESTIMATE, 'b': testhistory.DEFAULT_ESTIMATE})
+
+    def test_makespan(self):
+        self.assertEqual(testhistory.makespan([1., 2., 3.], 1), 6.)
+        self.assertEqual(testhistory.makespan([1., 2., 3.], 0), 6.)
+        self.assertEqual(testhistory.makespan([3., 3., 2., 2., 2.], 2), 7.)
+        self.assertEqual(testhistory.makespan([], 4), 0.)
+
+    def test_longest_first_shortens_the_makespan(self):
+        durations = [1., 1., 1., 1., 4.]
+        self.assertEqual(testhistory.makespan(durations, 2), 6.)
+        self.assertEqual(testhistory.makespan(sorted(durations, reverse=True), 2), 4.)
+
+    def test_each_test_goes_to_the_shard_with_the_least_time(self):
+        predicted = {'a': 8., 'b': 7., 'c': 6., 'd': 5., 'e': 4.}
+        shards = testhistory.shard(predicted.keys(), predicted, 2)
+        self.assertEqual(shards, [['a', 'd', 'e'], ['b', 'c']])
+        self.assertEqual([sum([predicted[name] for name in names]) for names in shards], [17., 13.])
+
+    def test_shards_do_not_depend_on_the_order_of_the_names(self):
+        predicted = dict([('test%d' % i, float(i % 4)) for i in range(20)])
+        names = sorted(predicted.keys())
+        shards = testhistory.shard(names, predicted, 3)
+        self.assertEqual(testhistory.shard(list(reversed(names)), predicted, 3), shards)
+        self.assertEqual(sorted(sum(shards, [])), names)
+
+    def test_ties_go_to_the_first_shard(self):
+        shards = testhistory.shard(['b', 'a'], {'a': 1., 'b': 1.}, 3)
+        self.assertEqual(shards, [['a'], ['b'], []])
+
+class LoadRuntimesTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._database = os.path.join(self._dir, 'history.db')
+        db = sqlite3.connect(self._database)
+        db.execute("CREATE TABLE TestRuns (testID INTEGER PRIMARY KEY, name VARCHAR(60), "
+                   "type VARCHAR(20), runtime DOUBLE, success BOOL, status VARCHAR(50))")
+        rows = [('SystemTests.Quick', 'performance', 1., 1, 'success'),
+                ('SystemTests.Quick', 'performance', 3., 1, 'success'),
+                ('SystemTests.Quick', 'performance', 2., 1, 'success'),
+                # A failure that gave up early
+                ('SystemTests.Quick', 'performance', 0.1, 0, 'failed'),
+                ('SystemTests.Skipped', 'performance', 0., 1, 'skipped'),
+                ('SystemTests.Quick.runTest', 'phase', 1.5, 1, 'success'),
+                ('SystemTests.Quick.load', 'region', 0.5, 1, 'success')]
+        db.executemany("INSERT INTO TestRuns (name, type, runtime, success, status) VALUES (?, ?, ?, ?, ?)", rows)
+        db.commit()
+        db.close()
+        # loadRuntimes() points sqlresults at the database
+        self._default = sqlresults.get_database_filename()
+
+    def tearDown(self):
+        sqlresults.set_database_filename(self._default)
+        shutil.rmtree(self._dir)
+
+    def test_only_the_runs_of_tests_that_passed_are_used(self):
+        self.assertEqual(testhistory.loadRuntimes(self._database), {'Quick': 2.})
+
+    def test_latest_runs_are_used(self):
+        self.assertEqual(testhistory.loadRuntimes(self._database, samples=2), {'Quick': 2.5})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+
+class TimingStatisticsTest(unittest.TestCase):
+
+    def test_percentile_interpolates_between_ranks(self):
+        values = [1., 2., 3., 4.]
+        self.assertEqual(stresstesting._percentile(values, 0.), 1.)
+        self.assertEqual(stresstesting._percentile(values, 50.), 2.5)
+        self.assertAlmostEqual(stresstesting._percentile(values, 95.), 3.85)
+        self.assertEqual(stresstesting._percentile(values, 100.), 4.)
+        self.assertEqual(stresstesting._percentile([7.], 95.), 7.)
+
+    def test_statistics(self):
+        # In any order
+        stats = stresstesting.timingStatistics([9., 1., 8., 2., 7., 3., 6., 4., 5.])
+        self.assertEqual(stats['count'], 9)
+        self.assertEqual(stats['median'], 5.)
+        self.assertEqual(stats['mad'], 2.)
+        self.assertEqual(stats['min'], 1.)
+        self.assertAlmostEqual(stats['p95'], 8.6)
+        # Ranks 1 and 9
+        self.assertAlmostEqual(stats['ci_width'], 160.)
+
+    def test_confidence_interval_is_between_order_statistics(self):
+        stats = stresstesting.timingStatistics([float(i) for i in range(1, 101)])
+        self.assertEqual(stats['median'], 50.5)
+        # Ranks 40 and 61
+        self.assertAlmostEqual(stats['ci_width'], 100. * 21. / 50.5)
+
+    def test_confidence_interval_narrows_with_more_times(self):
+        rand = random.Random(1)
+        times = [1. + rand.gauss(0., 0.05) for i in range(400)]
+        few = stresstesting.timingStatistics(times[:10])
+        many = stresstesting.timingStatistics(times)
+        self.assertTrue(many['ci_width'] < few['ci_width'])
+        self.assertAlmostEqual(many['median'], 1., delta=0.02)
+
+    def test_outlier_does_not_move_the_median(self):
+        stats = stresstesting.timingStatistics([1., 1., 1., 1., 100.])
+        self.assertEqual(stats['median'], 1.)
+        self.assertEqual(stats['mad'], 0.)
+
+    def test_zero_times(self):
+        stats = stresstesting.timingStatistics([0., 0., 0.])
+        self.assertEqual(stats['ci_width'], 0.)
+
+if __name__ == '__main__':
+    unittest.main()
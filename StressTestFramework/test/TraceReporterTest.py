@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+import tracereporter
+
+def _result(name, start, duration, metrics=(), spans=(), memoryTimeline=(), usage=None):
+    result = stresstesting.TestResult()
+    result.name = name
+    result.status = 'success'
+    result.start_time = start
+    result.wall_time = duration
+    result.metrics = list(metrics)
+    result.spans = list(spans)
+    result.memoryTimeline = list(memoryTimeline)
+    result.usage = usage
+    return result
+
+class TraceReporterTest(unittest.TestCase):
+
+    def _events(self, results):
+        reporter = tracereporter.TraceEventReporter()
+        for result in results:
+            reporter.dispatchResults(result)
+        return json.loads(reporter.getResults())['traceEvents']
+
+    def _lanes(self, results):
+        return dict([(event['name'], event['tid']) for event in self._events(results)
+                     if event.get('cat') == 'test'])
+
+    def test_serial_run_has_one_lane(self):
+        lanes = self._lanes([_result('b', 101., 2.), _result('a', 100., 1.), _result('c', 103., 1.)])
+        self.assertEqual(lanes, {'a': 1, 'b': 1, 'c': 1})
+
+    def test_each_test_goes_on_the_lowest_free_lane(self):
+        lanes = self._lanes([_result('a', 0., 10.), _result('b', 1., 2.), _result('c', 2., 5.),
+                             # Lane 2 is free again, lane 3 is not
+                             _result('d', 4., 1.),
+                             # All three are busy
+                             _result('e', 4.5, 1.)])
+        self.assertEqual(lanes, {'a': 1, 'b': 2, 'c': 3, 'd': 2, 'e': 4})
+
+    def test_lanes_are_named(self):
+        events = self._events([_result('a', 0., 2.), _result('b', 1., 2.)])
+        names = [event['args']['name'] for event in events if event['name'] == 'thread_name']
+        self.assertEqual(names, ['Worker 1', 'Worker 2'])
+
+    def test_tests_that_were_not_run_are_left_out(self):
+        events = self._events([_result('a', None, None)])
+        self.assertEqual([event['name'] for event in events], ['process_name'])
+
+    def test_phases_and_regions_are_on_the_lane_of_their_test(self):
+        phase = {'name': stresstesting.PHASE_PREFIX + 'runTest', 'value': 1.5, 'time': 12.}
+        span = {'name': 'load', 'start': 11., 'duration': 0.5}
+        events = self._events([_result('a', 10., 3.), _result('b', 10.5, 3., [phase], [span])])
+        inner = dict([(event['name'], event) for event in events if event.get('cat') in ('phase', 'region')])
+        self.assertEqual(inner['runTest']['tid'], 2)
+        self.assertEqual(inner['runTest']['ts'], 500000)
+        self.assertEqual(inner['runTest']['dur'], 1500000)
+        self.assertEqual(inner['load']['tid'], 2)
+        self.assertEqual(inner['load']['ts'], 1000000)
+
+    def test_memory_of_the_lanes_is_stacked(self):
+        events = self._events([_result('a', 0., 2., memoryTimeline=[(0.5, 100., None)]),
+                               _result('b', 1., 2., memoryTimeline=[(0.5, 50., None)])])
+        memory = [(event['ts'], event['args']) for event in events if event['name'] == 'Memory (MB)']
+        self.assertEqual(memory, [(500000, {'worker 1': 100.}),
+                                  (1500000, {'worker 1': 100., 'worker 2': 50.}),
+                                  (2000000, {'worker 1': 0., 'worker 2': 50.}),
+                                  (3000000, {'worker 1': 0., 'worker 2': 0.})])
+
+if __name__ == '__main__':
+    unittest.main()
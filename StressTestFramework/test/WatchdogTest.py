@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import signal
+import unittest
+import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stresstesting
+
+class _Watchdog(stresstesting.Watchdog):
+    GRACE_PERIOD = 0.1
+
+class _ShellRunner(stresstesting.PythonTestRunner):
+    '''Runs a shell command in place of the test'''
+
+    def __init__(self, command):
+        stresstesting.PythonTestRunner.__init__(self)
+        self._command = command
+
+    def start(self, pycode, timeout=None, capture=None):
+        return self.spawnSubProcess(self._command, timeout, capture)
+
+class WatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self._signals = []
+
+    def _kill(self, signum):
+        self._signals.append(signum)
+
+    def _waitForSignals(self, count, timeout=5.):
+        end = time.time() + timeout
+        while len(self._signals) < count and time.time() < end:
+            time.sleep(0.01)
+
+    def test_process_is_terminated_then_killed(self):
+        watchdog = _Watchdog(0.05, self._kill)
+        self._waitForSignals(2)
+        self.assertTrue(watchdog.expired)
+        self.assertEqual(self._signals, [signal.SIGTERM, signal.SIGKILL])
+
+    def test_process_that_stops_when_terminated_is_not_killed(self):
+        watchdog = _Watchdog(0.05, self._kill)
+        self._waitForSignals(1)
+        watchdog.stop()
+        time.sleep(0.2)
+        self.assertEqual(self._signals, [signal.SIGTERM])
+
+    def test_stopped_watchdog_does_nothing(self):
+        watchdog = _Watchdog(0.05, self._kill)
+        watchdog.stop()
+        time.sleep(0.2)
+        self.assertFalse(watchdog.expired)
+        self.assertEqual(self._signals, [])
+
+class ExitStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self._stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+
+    def _status(self, command, timeout=None):
+        suite = stresstesting.TestSuite('Shell', 'Test')
+        suite.execute(_ShellRunner(command), echo=False, timeout=timeout)
+        return suite.status
+
+    def test_exit_codes(self):
+        self.assertEqual(self._status('exit 0'), 'success')
+        self.assertEqual(self._status('exit 1'), 'algorithm failure')
+        self.assertEqual(self._status('exit 99'), 'failed validation')
+        self.assertEqual(self._status('exit 97'), 'skipped')
+        self.assertEqual(self._status('exit 5'), 'unknown')
+
+    def test_killed_by_a_signal(self):
+        self.assertEqual(self._status('kill -TERM $$'), 'signal')
+
+    def test_signal_reported_by_a_shell(self):
+        # The shell exits with 128 + the signal number of the process it ran
+        self.assertEqual(self._status("/bin/sh -c 'kill -TERM $$'; exit $?"), 'signal')
+        self.assertEqual(self._status("/bin/sh -c 'kill -SEGV $$'; exit $?"), 'crashed')
+
+    def test_timeout(self):
+        start = time.time()
+        self.assertEqual(self._status('sleep 10', timeout=0.2), 'timeout')
+        self.assertTrue(time.time() - start < 5.)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import workspaceinventory
+
+def _entry(memory, type='Workspace2D'):
+    return {'type': type, 'memory_mb': memory}
+
+class WorkspaceInventoryTest(unittest.TestCase):
+
+    def test_changes_are_sorted_by_memory(self):
+        before = {'kept': _entry(1.), 'grown': _entry(2.), 'dropped': _entry(3.)}
+        after = {'kept': _entry(1.), 'grown': _entry(7.), 'new': _entry(10.)}
+        self.assertEqual(workspaceinventory.diffInventories(before, after),
+                         [('new', 'added', 10.), ('grown', 'changed', 5.), ('dropped', 'removed', -3.)])
+
+    def test_shrunk_workspace_is_changed(self):
+        changes = workspaceinventory.diffInventories({'ws': _entry(4.)}, {'ws': _entry(1.)})
+        self.assertEqual(changes, [('ws', 'changed', -3.)])
+
+    def test_no_changes(self):
+        inventory = {'ws': _entry(4.)}
+        self.assertEqual(workspaceinventory.diffInventories(inventory, dict(inventory)), [])
+        self.assertEqual(workspaceinventory.diffInventories({}, {}), [])
+
+    def test_format_totals(self):
+        inventory = {'a': _entry(1.5), 'b': _entry(2.)}
+        self.assertEqual(workspaceinventory.formatInventory('after iteration 1', inventory),
+                         "Workspaces after iteration 1: 2 using 3.5 MB")
+
+    def test_format_lists_the_changes(self):
+        previous = {'events': _entry(2., 'EventWorkspace'), 'old': _entry(1.)}
+        inventory = {'events': _entry(6., 'EventWorkspace'), 'new': _entry(0.5, 'TableWorkspace')}
+        text = workspaceinventory.formatInventory('after iteration 2', inventory, previous)
+        self.assertEqual(text.split('\n'),
+                         ["Workspaces after iteration 2: 2 using 6.5 MB",
+                          "  changed        +4.0 MB  events (EventWorkspace)",
+                          "  added          +0.5 MB  new (TableWorkspace)",
+                          "  removed        -1.0 MB  old (Workspace2D)"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+'''
+Remembers the tests that passed and what they depended on, so that a test is
+not run again while nothing it depends on has changed. Its fingerprint covers
+the Mantid revision, the version of Python, the source of this framework, the
+source of the test module and of the helper modules in
+the test directory that it imported, the size and modification time of the data
+files it required and of the reference file it was validated against, and the
+options it was run with.
+
+The test process reports what it imported and which files it used once it has
+passed, see stresstesting.executeInChild(), so the inputs are those of the last
+run rather than a guess from the source. The modules are hashed as they are
+small; the data files are not, as reading every data file each run would cost
+as much as some of the tests.
+'''
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import datetime
+import subprocess
+
+# The name of the record sent by a test giving its inputs
+RECORD_NAME = 'inputs'
+
+# Bump when the fingerprint or the content of the cache file changes
+CACHE_VERSION = 4
+
+def mantidRevision(mantidDir):
+    '''
+    The revision of the Mantid build in the directory, as printed by
+    MantidPlot -r, or None if MantidPlot cannot be run
+    '''
+    for name in ('MantidPlot', 'MantidPlot.exe'):
+        executable = os.path.join(mantidDir, name)
+        if not os.path.exists(executable):
+            continue
+        try:
+            process = subprocess.Popen([executable, '-r'], stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+            output = process.communicate()[0]
+        except OSError:
+            continue
+        lines = [line.strip() for line in output.splitlines() if line.strip() != '']
+        if process.returncode == 0 and len(lines) > 0:
+            return lines[-1]
+    return None
+
+def _sourceHash(filename):
+    try:
+        handle = open(filename, 'rb')
+    except IOError:
+        return None
+    try:
+        return hashlib.sha1(handle.read()).hexdigest()
+    finally:
+        handle.close()
+
+def _frameworkHash():
+    '''
+    The SHA-1 of the source of the modules of this framework, which run each
+    test and decide whether it passed
+    '''
+    sha1 = hashlib.sha1()
+    for filename in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        sha1.update(os.path.basename(filename))
+        sha1.update(_sourceHash(filename) or '')
+    return sha1.hexdigest()
+
+class TestCache(object):
+    '''
+    The passes recorded by earlier runs, read from and saved to filename. An entry
+    older than expirySeconds, if given, is not used. dataFiles is the index of the
+    data directories, see datafileindex, if there is one. It is used to find the
+    data files again so that a file put earlier in the search path is noticed.
+    '''
+
+    def __init__(self, filename, revision, expirySeconds=None, dataFiles=None):
+        self._filename = filename
+        self._revision = revision
+        self._expiry = expirySeconds
+        self._dataFiles = dataFiles
+        # The tests are run by the same Python as the framework, see PythonConsoleRunner
+        self._framework = [sys.version, _frameworkHash()]
+        self._changed = False
+        # Test name -> {'fingerprint', 'inputs', 'time'}
+        self._tests = {}
+        if os.path.exists(filename):
+            try:
+                stored = json.load(open(filename, 'r'))
+                if stored.get('version') == CACHE_VERSION:
+                    self._tests = stored['tests']
+            except (IOError, ValueError, KeyError):
+                # A corrupt cache is simply started again
+                self._tests = {}
+
+    def fingerprint(self, inputs, options):
+        '''
+        The fingerprint of a test with the given inputs, as reported by the test,
+        run with the given options, or None if one of its inputs has gone
+        '''
+        modules = []
+        for filename in sorted(inputs['modules']):
+            sha1 = _sourceHash(filename)
+            if sha1 is None:
+                return None
+            modules.append([filename, sha1])
+        files = []
+        for name, path in sorted(inputs['files'].items()):
+            if self._dataFiles is not None:
+                path = self._dataFiles.find(name) or path
+            if path is None:
+                return None
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            # Not the path, which changes when the file is staged, see datastaging,
+            # while the size and time are kept. The time only to the millisecond,
+            # as os.utime() sets it to the microsecond at best.
+            files.append([name, stat.st_size, int(stat.st_mtime * 1000)])
+        description = json.dumps([self._revision, self._framework, modules, files, options], sort_keys=True)
+        return hashlib.sha1(description).hexdigest()
+
+    def lookup(self, name, options):
+        '''
+        Returns the time of the pass of the named test if it is still valid for
+        the given options, else None
+        '''
+        entry = self._tests.get(name)
+        if entry is None:
+            return None
+        if self._expiry is not None and time.time() - entry['time'] > self._expiry:
+            return None
+        if self.fingerprint(entry['inputs'], options) != entry['fingerprint']:
+            return None
+        return entry['time']
+
+    def record(self, name, inputs, options):
+        '''Remember a pass of the named test with the given inputs'''
+        fingerprint = self.fingerprint(inputs, options)
+        if fingerprint is None:
+            self.forget(name)
+            return
+        self._tests[name] = {'fingerprint': fingerprint, 'inputs': inputs, 'time': time.time()}
+        self._changed = True
+
+    def forget(self, name):
+        '''Drop the pass of the named test, e.g. because it has failed'''
+        if self._tests.pop(name, None) is not None:
+            self._changed = True
+
+    def save(self):
+        '''Write the cache if anything has changed'''
+        if not self._changed:
+            return
+        try:
+            handle = open(self._filename, 'w')
+            try:
+                json.dump({'version': CACHE_VERSION, 'tests': self._tests}, handle)
+            finally:
+                handle.close()
+            self._changed = False
+        except IOError, exc:
+            print "Failed to save the test result cache '%s': %s" % (self._filename, str(exc))
+
+def describePass(passed):
+    '''The message given for a test that is not run because it passed at the time passed'''
+    when = datetime.datetime.fromtimestamp(passed).strftime('%Y-%m-%d %H:%M:%S')
+    return "Not run: passed at %s and nothing it depends on has changed since\n" % when
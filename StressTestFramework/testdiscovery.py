@@ -0,0 +1,322 @@
+'''
+Finds the test classes in a directory of test modules by parsing them rather
+than importing them, so that Mantid does not have to be loaded just to list
+the tests. The parse of each module is kept in an index file and only redone
+when the module changes.
+
+A class is a test if it derives, possibly through classes in other modules of
+the same directory, from MantidStressTest and is not an abstract class, i.e. it
+does not have an ABCMeta metaclass with abstract methods left unimplemented.
+'''
+import os
+import ast
+import json
+import hashlib
+
+# Bump when the content of an entry changes so that old index files are ignored
+INDEX_VERSION = 4
+
+# Methods whose return value is recorded if it is a constant
+REQUIREMENT_METHODS = ['requiredMemoryMB', 'timeoutSeconds', 'requiredFiles', 'validate']
+
+# Class attributes whose value is recorded if it is a constant
+REQUIREMENT_ATTRIBUTES = ['skipOnPlatforms', 'requiredModules']
+
+BASE_CLASS = 'MantidStressTest'
+
+class DiscoveryIndex(object):
+    '''
+    Holds the parse of each module, keyed by filename. If filename is given the
+    index is read from and saved to that file.
+    '''
+
+    def __init__(self, filename=None):
+        self._filename = filename
+        self._modules = {}
+        self._changed = False
+        if filename is not None and os.path.exists(filename):
+            try:
+                stored = json.load(open(filename, 'r'))
+                if stored.get('version') == INDEX_VERSION:
+                    self._modules = stored['modules']
+            except (IOError, ValueError, KeyError):
+                # A corrupt index is simply rebuilt
+                self._modules = {}
+
+    def save(self):
+        '''Write the index if anything has changed'''
+        if self._filename is None or not self._changed:
+            return
+        try:
+            handle = open(self._filename, 'w')
+            try:
+                json.dump({'version': INDEX_VERSION, 'modules': self._modules}, handle)
+            finally:
+                handle.close()
+            self._changed = False
+        except IOError, exc:
+            print "Failed to save the test discovery index '%s': %s" % (self._filename, str(exc))
+
+    def module(self, filename):
+        '''
+        Returns the entry for the given module, parsing it if it is not in the
+        index or has changed since it was indexed.
+        '''
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        entry = self._modules.get(filename)
+        if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry
+        source = open(filename, 'r').read()
+        sha1 = hashlib.sha1(source).hexdigest()
+        if entry is None or entry['sha1'] != sha1:
+            entry = parseModule(source, filename)
+            entry['sha1'] = sha1
+        entry['mtime'] = stat.st_mtime
+        entry['size'] = stat.st_size
+        self._modules[filename] = entry
+        self._changed = True
+        return entry
+
+    def update(self, directory):
+        '''
+        Bring the index up to date with the modules in the directory and return
+        their names, in sorted order
+        '''
+        names = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.lower().endswith('.py'):
+                self.module(os.path.join(directory, filename))
+                names.append(os.path.splitext(filename)[0])
+        return names
+
+    def findTests(self, filename):
+        '''
+        Returns a list of (class name, requirements) for the tests defined in the
+        module, or None if the module could not be parsed. Modules in the same
+        directory must be in the index, see update().
+        '''
+        entry = self.module(filename)
+        if entry['error'] is not None:
+            return None
+        resolver = _Resolver(self, os.path.dirname(os.path.abspath(filename)))
+        modname = os.path.splitext(os.path.basename(filename))[0]
+        tests = {}
+        for cls in entry['classes']:
+            if cls['name'] == BASE_CLASS:
+                continue
+            info = resolver.info((modname, cls['name']))
+            if info['test'] and not (info['abc'] and len(info['abstract']) > 0):
+                tests[cls['name']] = info['requirements']
+            else:
+                # A later definition replaces an earlier one
+                tests.pop(cls['name'], None)
+        # Sorted, as dir() would list them
+        return sorted(tests.items())
+
+#==============================================================================
+def parseModule(source, filename):
+    '''Returns a dictionary describing the classes and imports in the source'''
+    entry = {'error': None, 'classes': [], 'imports': {}, 'star': [], 'from': {}}
+    try:
+        tree = ast.parse(source, filename)
+    except (SyntaxError, TypeError), exc:
+        entry['error'] = str(exc)
+        return entry
+
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname is not None:
+                    entry['imports'][alias.asname] = alias.name
+                else:
+                    entry['imports'][alias.name] = alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module is not None:
+            for alias in node.names:
+                if alias.name == '*':
+                    entry['star'].append(node.module)
+                else:
+                    entry['from'][alias.asname or alias.name] = (node.module, alias.name)
+        elif isinstance(node, ast.ClassDef):
+            entry['classes'].append(_parseClass(node))
+    return entry
+
+def _dottedName(node):
+    '''Returns "a.b.C" for a Name/Attribute node or None for anything else'''
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        prefix = _dottedName(node.value)
+        if prefix is not None:
+            return prefix + '.' + node.attr
+    return None
+
+def _isAbstract(function):
+    for decorator in function.decorator_list:
+        name = _dottedName(decorator)
+        if name is not None and name.split('.')[-1] == 'abstractmethod':
+            return True
+    return False
+
+def _returnedConstant(function):
+    '''The value returned by a function that only returns a constant, else None'''
+    body = function.body
+    if len(body) > 0 and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Str):
+        body = body[1:] # docstring
+    if len(body) != 1 or not isinstance(body[0], ast.Return) or body[0].value is None:
+        return None
+    try:
+        return constantValue(body[0].value)
+    except ValueError:
+        return None
+
+def constantValue(node):
+    '''
+    Evaluate an expression made only of literals and arithmetic on them.
+    Raises ValueError for anything else.
+    '''
+    if isinstance(node, ast.Num):
+        return node.n
+    if isinstance(node, ast.Str):
+        return node.s
+    if isinstance(node, ast.Name) and node.id in ('True', 'False', 'None'):
+        return {'True': True, 'False': False, 'None': None}[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [constantValue(item) for item in node.elts]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -constantValue(node.operand)
+    if isinstance(node, ast.BinOp):
+        left, right = constantValue(node.left), constantValue(node.right)
+        try:
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            if isinstance(node.op, ast.Div):
+                return left / right
+        except (TypeError, ZeroDivisionError):
+            pass
+    raise ValueError("Not a constant expression")
+
+def _parseClass(node):
+    cls = {'name': node.name,
+           'bases': [_dottedName(base) for base in node.bases],
+           'metaclass': None,
+           'defined': [],
+           'abstract': [],
+           'requirements': {}}
+    for item in node.body:
+        if isinstance(item, ast.FunctionDef):
+            cls['defined'].append(item.name)
+            if _isAbstract(item):
+                cls['abstract'].append(item.name)
+            if item.name in REQUIREMENT_METHODS:
+                value = _returnedConstant(item)
+                if value is not None:
+                    cls['requirements'][item.name] = value
+        elif isinstance(item, ast.Assign):
+            for target in item.targets:
+                if isinstance(target, ast.Name):
+                    cls['defined'].append(target.id)
+                    if target.id == '__metaclass__':
+                        cls['metaclass'] = _dottedName(item.value)
+                    elif target.id in REQUIREMENT_ATTRIBUTES:
+                        try:
+                            cls['requirements'][target.id] = constantValue(item.value)
+                        except ValueError:
+                            pass
+    return cls
+
+#==============================================================================
+class _Resolver(object):
+    '''Follows base classes across the modules of a test directory'''
+
+    def __init__(self, index, directory):
+        self._index = index
+        self._directory = directory
+        self._info = {}
+
+    def _entry(self, modname):
+        filename = os.path.join(self._directory, modname + '.py')
+        if not os.path.exists(filename):
+            return None
+        return self._index.module(filename)
+
+    def _classes(self, modname):
+        entry = self._entry(modname)
+        if entry is None:
+            return {}
+        # The last definition of a name wins
+        return dict([(cls['name'], cls) for cls in entry['classes']])
+
+    def lookup(self, modname, name, seen=None):
+        '''Returns the (module, class) key a name refers to in a module, or None'''
+        if seen is None:
+            seen = set()
+        if modname in seen:
+            return None
+        seen.add(modname)
+        if name in self._classes(modname):
+            return (modname, name)
+        entry = self._entry(modname)
+        if entry is None:
+            return None
+        if name in entry['from']:
+            origin, original = entry['from'][name]
+            return self.lookup(origin, original, seen)
+        for origin in entry['star']:
+            key = self.lookup(origin, name, seen)
+            if key is not None:
+                return key
+        return None
+
+    def resolve(self, modname, dotted):
+        '''Returns the key of a base class, BASE_CLASS or None if it is unknown'''
+        if dotted is None:
+            return None
+        parts = dotted.split('.')
+        if parts[-1] == BASE_CLASS:
+            return BASE_CLASS
+        if len(parts) == 1:
+            return self.lookup(modname, parts[0])
+        entry = self._entry(modname)
+        origin = entry['imports'].get('.'.join(parts[:-1]))
+        if origin is None:
+            return None
+        return self.lookup(origin, parts[-1])
+
+    def info(self, key):
+        '''
+        Returns a dictionary saying whether the class is a test, whether it is an
+        ABCMeta class, its abstract methods and its requirements
+        '''
+        if key in self._info:
+            return self._info[key]
+        # Guards against cycles, which would be an error in the source
+        self._info[key] = {'test': False, 'abc': False, 'abstract': set(), 'requirements': {}}
+        cls = self._classes(key[0])[key[1]]
+        info = {'test': False,
+                'abc': cls['metaclass'] is not None and cls['metaclass'].split('.')[-1] == 'ABCMeta',
+                'abstract': set(cls['abstract']),
+                'requirements': {}}
+        concrete = set(cls['defined']) - set(cls['abstract'])
+        # Walk the bases in reverse so the first base wins, as in the MRO
+        for dotted in reversed(cls['bases']):
+            base = self.resolve(key[0], dotted)
+            if base == BASE_CLASS:
+                info['test'] = True
+            elif base is not None:
+                base_info = self.info(base)
+                info['test'] = info['test'] or base_info['test']
+                info['abc'] = info['abc'] or base_info['abc']
+                info['abstract'] |= (base_info['abstract'] - concrete)
+                info['requirements'].update(base_info['requirements'])
+        info['requirements'].update(cls['requirements'])
+        for name in REQUIREMENT_METHODS + REQUIREMENT_ATTRIBUTES:
+            # Overridden by something that is not a constant
+            if name in cls['defined'] and name not in cls['requirements']:
+                info['requirements'].pop(name, None)
+        self._info[key] = info
+        return info
@@ -0,0 +1,81 @@
+'''
+Predicts how long each test will take from the runtimes recorded for it in the
+performance database, see PerformanceMonitoring/sqlresults.py, so that a
+parallel run can start the longest tests first and finish without a long tail
+of one slow test running on its own.
+'''
+import os
+import sys
+import heapq
+
+# Used for every test when there is no history at all
+DEFAULT_ESTIMATE = 60.
+
+# The names in the database are those written by xunit_to_sql.py from the XML report
+DATABASE_PREFIX = 'SystemTests.'
+
+def loadRuntimes(database, samples=5):
+    '''
+    Returns a dictionary of test name -> median runtime, in seconds, of the latest
+    successful runs recorded in the given database
+    '''
+    performance_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PerformanceMonitoring')
+    if performance_dir not in sys.path:
+        sys.path.append(performance_dir)
+    import sqlresults
+    sqlresults.set_database_filename(database)
+    runtimes = {}
+    # Leave out the rows for the phases and timed regions of a test, which
+    # xunit_to_sql.py stores with their own names
+    runs = sqlresults.get_runtime_history(where_clause=sqlresults.TESTS_ONLY, limit=samples)
+    for name, history in runs.iteritems():
+        if name.startswith(DATABASE_PREFIX):
+            name = name[len(DATABASE_PREFIX):]
+        if len(history) > 0:
+            runtimes[name] = median(history)
+    return runtimes
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2 == 1:
+        return values[middle]
+    return 0.5 * (values[middle - 1] + values[middle])
+
+def predictRuntimes(names, runtimes):
+    '''
+    Returns a dictionary of test name -> predicted runtime for the given tests.
+    A test that has no history is predicted to take the median time of those that
+    do, so that it is neither started first nor left until last.
+    '''
+    known = [runtimes[name] for name in names if name in runtimes]
+    if len(known) > 0:
+        estimate = median(known)
+    else:
+        estimate = DEFAULT_ESTIMATE
+    return dict([(name, runtimes.get(name, estimate)) for name in names])
+
+def makespan(durations, jobs):
+    '''
+    The time to run tasks with the given durations, in the given order, when each
+    is started as soon as one of the jobs slots is free
+    '''
+    slots = [0.] * max(1, jobs)
+    for duration in durations:
+        heapq.heapreplace(slots, slots[0] + duration)
+    return max(slots)
+
+def shard(names, predicted, count):
+    '''
+    Split the names into count lists with roughly equal total predicted runtime,
+    placing the longest remaining test in the list with the least time so far. The
+    split depends only on the arguments so each machine can compute its own share.
+    '''
+    shards = [[] for i in range(count)]
+    # (total time, shard index) so that ties go to the lowest index
+    totals = [(0., i) for i in range(count)]
+    for name in sorted(names, key=lambda name: (-predicted[name], name)):
+        total, i = heapq.heappop(totals)
+        shards[i].append(name)
+        heapq.heappush(totals, (total + predicted[name], i))
+    return shards
@@ -0,0 +1,104 @@
+'''
+Writes the timeline of a whole run in the Trace Event format read by Chrome's
+chrome://tracing and by Perfetto. Each test is a span on the lane of the worker
+that ran it, with the phases of running it, see stresstesting.PHASE_PREFIX, and
+the regions it timed, see MantidStressTest.timed(), as spans inside it. Counter
+tracks show the memory, when sampled, see processusage.MemorySampler, and the
+CPU used by the tests running at each moment, stacked by lane.
+
+The lanes are worked out from the start and end times of the tests: each test
+goes on the lowest lane that is free when it starts. A serial run has one lane.
+'''
+import json
+import stresstesting
+
+# The name of the records giving a region timed by a test, see MantidStressTest.timed()
+RECORD_NAME = 'span'
+
+# The most regions of a test to record
+MAX_SPANS = 1000
+
+def _microseconds(seconds):
+    return int(round(seconds * 1e6))
+
+class TraceEventReporter(stresstesting.ResultReporter):
+    '''
+    Collects the timings of the tests. getResults() returns the trace as JSON.
+    Tests that were not run are left out.
+    '''
+
+    def __init__(self):
+        self._results = []
+
+    def dispatchResults(self, result):
+        if result.start_time is not None:
+            self._results.append(result)
+
+    def getResults(self):
+        '''The trace of the run, in JSON'''
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'System tests'}}]
+        if len(self._results) == 0:
+            return json.dumps({'traceEvents': events})
+        results = sorted(self._results, key=lambda result: result.start_time)
+        origin = results[0].start_time
+        ts = lambda when: _microseconds(when - origin)
+
+        # The time each lane becomes free
+        lanes = []
+        memory = []
+        cpu = []
+        for result in results:
+            end = result.start_time + result.wall_time
+            free = [lane for lane in range(len(lanes)) if lanes[lane] <= result.start_time]
+            if len(free) > 0:
+                lane = free[0]
+                lanes[lane] = end
+            else:
+                lane = len(lanes)
+                lanes.append(end)
+            series = 'worker %d' % (lane + 1)
+            args = {'status': result.status}
+            if result.logfile is not None:
+                args['log'] = result.logfile
+            events.append({'name': result.name, 'cat': 'test', 'ph': 'X', 'pid': 1, 'tid': lane + 1,
+                           'ts': ts(result.start_time), 'dur': _microseconds(result.wall_time),
+                           'args': args})
+            for record in result.metrics:
+                if record['name'].startswith(stresstesting.PHASE_PREFIX):
+                    # Reported at the end of the phase. Startup is timed from just
+                    # before the test, which would stop it nesting inside.
+                    begin = max(record['time'] - record['value'], result.start_time)
+                    events.append({'name': record['name'][len(stresstesting.PHASE_PREFIX):],
+                                   'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': lane + 1,
+                                   'ts': ts(begin), 'dur': _microseconds(record['time'] - begin)})
+            for span in result.spans:
+                events.append({'name': span['name'], 'cat': 'region', 'ph': 'X', 'pid': 1,
+                               'tid': lane + 1, 'ts': ts(span['start']),
+                               'dur': _microseconds(span['duration'])})
+            for sample in result.memoryTimeline:
+                memory.append((result.start_time + sample[0], series, sample[1]))
+            if len(result.memoryTimeline) > 0:
+                memory.append((end, series, 0.))
+            if result.usage is not None and 'cpu_fraction' in result.usage:
+                # Only the average over the test is known
+                cpu.append((result.start_time, series, result.usage['cpu_fraction']))
+                cpu.append((end, series, 0.))
+
+        for lane in range(len(lanes)):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane + 1,
+                           'args': {'name': 'Worker %d' % (lane + 1)}})
+        events.extend(self.__counter('Memory (MB)', memory, ts))
+        events.extend(self.__counter('CPU (cores)', cpu, ts))
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def __counter(self, name, samples, ts):
+        '''
+        Counter events for a list of (time, series, value), each giving the value
+        of every series so that the lanes stack up
+        '''
+        current = {}
+        events = []
+        for when, series, value in sorted(samples):
+            current[series] = value
+            events.append({'name': name, 'ph': 'C', 'pid': 1, 'ts': ts(when), 'args': dict(current)})
+        return events
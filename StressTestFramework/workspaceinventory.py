@@ -0,0 +1,68 @@
+'''
+An opt-in inventory of the workspaces a test leaves in the AnalysisDataService.
+The inventory is taken after each timed iteration of the test and once more
+after validation, just before FrameworkManager.clear(), and the change from the
+previous inventory is printed to the output of the test. Growth in memory from
+one iteration to the next can then be put down to the workspaces that were
+added, or grew, rather than to the test as a whole.
+
+Each inventory is also sent through the metrics channel, see
+stresstesting.MetricsChannel, and ends up in TestResult.workspaces.
+'''
+
+# The name of the records sent through the metrics channel
+RECORD_NAME = 'workspaces'
+
+def takeInventory():
+    '''
+    Returns a dictionary of workspace name -> dictionary of the type, the memory
+    in MB and, where the workspace has them, the numbers of histograms and events
+    of each workspace in the AnalysisDataService
+    '''
+    from mantid.api import AnalysisDataService
+    inventory = {}
+    for name in AnalysisDataService.getObjectNames():
+        try:
+            workspace = AnalysisDataService[name]
+        except KeyError:
+            # Removed in the meantime by another thread
+            continue
+        entry = {'type': workspace.id(),
+                 'memory_mb': workspace.getMemorySize() / (1024. * 1024.)}
+        if hasattr(workspace, 'getNumberHistograms'):
+            entry['histograms'] = workspace.getNumberHistograms()
+        if hasattr(workspace, 'getNumberEvents'):
+            entry['events'] = workspace.getNumberEvents()
+        inventory[name] = entry
+    return inventory
+
+def diffInventories(before, after):
+    '''
+    Returns a list of (workspace name, change, memory change in MB) sorted by the
+    change in memory, largest first, where change is 'added', 'removed' or
+    'changed'. Workspaces whose memory did not change are left out.
+    '''
+    changes = []
+    for name, entry in after.iteritems():
+        if name not in before:
+            changes.append((name, 'added', entry['memory_mb']))
+        elif entry['memory_mb'] != before[name]['memory_mb']:
+            changes.append((name, 'changed', entry['memory_mb'] - before[name]['memory_mb']))
+    for name, entry in before.iteritems():
+        if name not in after:
+            changes.append((name, 'removed', -entry['memory_mb']))
+    changes.sort(key=lambda change: -change[2])
+    return changes
+
+def formatInventory(label, inventory, previous=None):
+    '''
+    A description of the inventory for the output of the test: the number of
+    workspaces and their memory, and the changes since previous, if given
+    '''
+    total = sum([entry['memory_mb'] for entry in inventory.itervalues()])
+    lines = ["Workspaces %s: %d using %.1f MB" % (label, len(inventory), total)]
+    if previous is not None:
+        for name, change, memory in diffInventories(previous, inventory):
+            entry = inventory.get(name, previous.get(name))
+            lines.append("  %-8s %+10.1f MB  %s (%s)" % (change, memory, name, entry['type']))
+    return '\n'.join(lines)
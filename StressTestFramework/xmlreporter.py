@@ -2,12 +2,20 @@ import os
 import sys
 from xml.dom.minidom import getDOMImplementation
 import stresstesting
+import algorithmledger
+import workspaceinventory
 
 class XmlResultReporter(stresstesting.ResultReporter):
 
 	_time_taken = 0.0
 	_failures = []
 	_skipped = []
+	# Result name -> testcase attribute
+	_benchmark_attributes = {'time_median': 'medianTime', 'time_mad': 'MADTime',
+	                         'time_min': 'minTime', 'time_p95': 'p95Time',
+	                         'time_ci_width': 'CIWidthPercent', 'time_count': 'iterations'}
+	# Soak mode, see MantidStressTest.soakIterations(), whether the test passed or not
+	_soak_attributes = {'soak_time_slope': 'soakTimeSlopePercent', 'soak_memory_slope': 'soakMemorySlopeMB'}
 	
 	def __init__(self, showSkipped=True):
 		self._doc = getDOMImplementation().createDocument(None,'testsuite',None)
@@ -61,7 +69,7 @@ class XmlResultReporter(stresstesting.ResultReporter):
 					skipEl.setAttribute('message', result.output)
 				skipEl.appendChild(self._doc.createTextNode(result.output))
 			elem.appendChild(skipEl)
-		elif result.status != 'success':
+		elif result.status not in ('success', 'cached-pass'):
 			self._failures.append(result)
 			failEl = self._doc.createElement('failure')
 			failEl.setAttribute('file',result.filename)
@@ -73,14 +81,100 @@ class XmlResultReporter(stresstesting.ResultReporter):
 			elem.appendChild(failEl)
 		else:
 			time_taken = 0.0
+			total_time = 0.0
+			median = None
 			for t in result.resultLogs():
 				if t[0] == 'iteration time_taken':
 					time_taken = float(t[1].split(' ')[1])
+					total_time += time_taken
 					self._time_taken += time_taken
 				if t[0] == 'memory footprint increase':
 					memEl = self._doc.createElement('memory')
 					memEl.appendChild(self._doc.createTextNode(t[1]))
 					elem.appendChild(memEl)
-			elem.setAttribute('time',str(time_taken))
-			elem.setAttribute('totalTime',str(time_taken))
+				if t[0] in self._benchmark_attributes:
+					# Benchmark mode, see MantidStressTest.benchmarkPrecision()
+					elem.setAttribute(self._benchmark_attributes[t[0]], t[1])
+					if t[0] == 'time_median':
+						median = t[1]
+			if median is not None:
+				# The median rather than the last iteration for a benchmark
+				elem.setAttribute('time',median)
+				elem.setAttribute('totalTime',str(total_time))
+			else:
+				elem.setAttribute('time',str(time_taken))
+				elem.setAttribute('totalTime',str(time_taken))
+			if result.usage is not None and 'cpu_fraction' in result.usage:
+				elem.setAttribute('CPUFraction',str(result.usage['cpu_fraction']))
+			if result.status == 'cached-pass':
+				# Not run, see testcache, so there is no time to record
+				elem.setAttribute('cached', 'true')
+		for t in result.resultLogs():
+			if t[0] in self._soak_attributes:
+				elem.setAttribute(self._soak_attributes[t[0]], t[1])
+		phases = [t for t in result.resultLogs() if t[0].startswith(stresstesting.PHASE_PREFIX)]
+		if len(phases) > 0:
+			# The time taken by each phase of running the test
+			phasesEl = self._doc.createElement('phases')
+			for t in phases:
+				phasesEl.setAttribute(t[0][len(stresstesting.PHASE_PREFIX):], t[1])
+			elem.appendChild(phasesEl)
+		regions = {}
+		for record in result.metrics:
+			if record['name'].startswith(stresstesting.REGION_PREFIX):
+				regions.setdefault(record['name'][len(stresstesting.REGION_PREFIX):], []).append(record['value'])
+		if len(regions) > 0:
+			# The regions timed by the test, the median time per iteration, see MantidStressTest.timed()
+			regionsEl = self._doc.createElement('regions')
+			for name, times in sorted(regions.iteritems()):
+				regionEl = self._doc.createElement('region')
+				regionEl.setAttribute('name', name)
+				regionEl.setAttribute('time', str(stresstesting.timingStatistics(times)['median']))
+				regionEl.setAttribute('totalTime', str(sum(times)))
+				regionEl.setAttribute('iterations', str(len(times)))
+				regionsEl.appendChild(regionEl)
+			elem.appendChild(regionsEl)
+		if len(result.algorithms) > 0:
+			# The algorithms run by the test, see algorithmledger
+			algsEl = self._doc.createElement('algorithms')
+			for name, totals in sorted(algorithmledger.summarize(result.algorithms).iteritems()):
+				algEl = self._doc.createElement('algorithm')
+				algEl.setAttribute('name', name)
+				for key in sorted(totals.keys()):
+					algEl.setAttribute(key, str(totals[key]))
+				algsEl.appendChild(algEl)
+			elem.appendChild(algsEl)
+		if len(result.workspaces) > 0:
+			# The workspaces left at the end, before they were cleared, and how much each has
+			# grown since the first inventory, see workspaceinventory
+			first = result.workspaces[0]['workspaces']
+			last = result.workspaces[-1]['workspaces']
+			growth = dict([(name, memory) for name, change, memory in workspaceinventory.diffInventories(first, last)])
+			workspacesEl = self._doc.createElement('workspaces')
+			workspacesEl.setAttribute('label', result.workspaces[-1]['label'])
+			for name, entry in sorted(last.iteritems()):
+				workspaceEl = self._doc.createElement('workspace')
+				workspaceEl.setAttribute('name', name)
+				workspaceEl.setAttribute('growthMB', str(growth.get(name, 0.)))
+				for key in sorted(entry.keys()):
+					workspaceEl.setAttribute(key, str(entry[key]))
+				workspacesEl.appendChild(workspaceEl)
+			elem.appendChild(workspacesEl)
+		if result.usage is not None:
+			# The resources used by the test process
+			usageEl = self._doc.createElement('usage')
+			for key in sorted(result.usage.keys()):
+				usageEl.setAttribute(key, str(result.usage[key]))
+			elem.appendChild(usageEl)
+		if len(result.memoryTimeline) > 0:
+			# One "seconds RSS PSS" line per sample, in MB, PSS left out if unknown
+			timelineEl = self._doc.createElement('memoryTimeline')
+			lines = []
+			for sample in result.memoryTimeline:
+				line = '%.3f %.1f' % sample[:2]
+				if sample[2] is not None:
+					line += ' %.1f' % sample[2]
+				lines.append(line)
+			timelineEl.appendChild(self._doc.createTextNode('\n'.join(lines)))
+			elem.appendChild(timelineEl)
 		self._doc.documentElement.appendChild(elem)
@@ -1,17 +1,12 @@
 import stresstesting
-import sys
 import os
 
 class UserAlgorithmsBuild(stresstesting.MantidStressTest):
 
     build_success = False
 
-    def skipTests(self):
-        " We skip this test if the system is not Windows."
-        if sys.platform.startswith('win'):
-          return False
-        else:
-          return True
+    # The build script only exists on Windows
+    skipOnPlatforms = ['Linux', 'Darwin']
 
     def runTest(self):
         """
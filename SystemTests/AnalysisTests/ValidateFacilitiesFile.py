@@ -9,14 +9,8 @@ EXPECTED_EXT = '.expected'
 
 class ValidateFacilitiesFile(stresstesting.MantidStressTest):
     
-    def skipTests(self):
-        try:
-            import genxmlif
-            import minixsv
-        except ImportError:
-            return True
-        return False    
-         
+    # Used to validate the files against their schema
+    requiredModules = ('genxmlif', 'minixsv')
 
     def runTest(self):
         """Main entry point for the test suite"""
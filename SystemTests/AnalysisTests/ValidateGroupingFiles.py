@@ -8,14 +8,9 @@ EXPECTED_EXT = '.expected'
 
 class ValidateGroupingFiles(stresstesting.MantidStressTest):
     
-    def skipTests(self):
-        try:
-            import genxmlif
-            import minixsv
-        except ImportError:
-            return True
-        return False    
-         
+    # Used to validate the files against their schema
+    requiredModules = ('genxmlif', 'minixsv')
+
     def __getDataFileList__(self):
         # get a list of directories to look in
         direc = config['instrumentDefinition.directory']
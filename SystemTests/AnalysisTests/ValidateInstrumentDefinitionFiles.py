@@ -9,14 +9,9 @@ EXPECTED_EXT = '.expected'
 
 class ValidateInstrumentDefinitionFiles(stresstesting.MantidStressTest):
     
-    def skipTests(self):
-        try:
-            import genxmlif
-            import minixsv
-        except ImportError:
-            return True
-        return False    
-         
+    # Used to validate the files against their schema
+    requiredModules = ('genxmlif', 'minixsv')
+
     def __getDataFileList__(self):
         # get a list of directories to look in
         direc = config['instrumentDefinition.directory']